@@ -1,40 +1,258 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from datetime import date as Date
+import asyncio
+import numpy as np
 import pandas as pd
 import json
-import boto3
-import os
-from pathlib import Path
-from io import StringIO
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from src.utils.risk_store import read_history, read_tail, load_manifest
+from src.utils.metrics import (
+    REGISTRY, CONTENT_TYPE, HTTP_REQUESTS, HTTP_LATENCY, Gauge, record_cache,
+)
+from src.risk.compute_risk import RISK_LEVELS
+from src.utils.config import read_demand_data, demand_data_version, read_cursor, DEFAULT_SERIES_ID
+from src.data.validate import validate_demand
+from src.forecasting.forecast_service import build_panel, forecast_panel, MAX_HORIZON
+from src.data.aggregation_cube import AggregationCube, LEVELS, GRAINS, saved_last_date
+from src.anomaly import anomaly_index
+from src.anomaly.rolling_stats import latest_stats, WINDOWS, Z_COLUMNS
+from src.utils.storage import get_bytes, object_version
+from src.utils.tenants import TENANT_ID, TENANT_INDEX_KEY, current_tenant, list_tenants, tenant_scope
+from src.utils.schema import apply_schema, compact_demand, to_records
+from src.ingestion.micro_batch import IngestProcessor, MicroBatcher
+from api.stream import Broadcaster, event_stream
+from api.fast_json import dumps_array, dumps_frame, dumps_object, FORMATS
+from api.export import HistoryExport, EXPORT_FORMATS, parse_range
+from api.releases import ReleaseWatcher
 
 app = FastAPI(title="Financial Risk Monitor API")
 
-# ── Storage config ─────────────────────────────────────────────
-S3_BUCKET = os.environ.get("S3_BUCKET")
-USE_S3 = os.environ.get("USE_S3", "false").lower() == "true"
+UNMATCHED_ROUTE = "<unmatched>"
 
-LATEST_RISK_PATH = Path("artifacts/latest_risk.csv")
-FULL_RISK_PATH = Path("artifacts/daily_risk_output.csv")
+
+# ── Request metrics ────────────────────────────────────────────
+class MetricsMiddleware:
+    """Counts requests and times each one to its response headers (so
+    streams are timed to their first byte), labelled by route template
+    so path and query values never multiply the series."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                route = scope.get("route")
+                HTTP_LATENCY.labels(route.path if route else UNMATCHED_ROUTE).observe(time.perf_counter() - start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUESTS.labels(route.path if route else UNMATCHED_ROUTE, scope["method"], status).inc()
+
+
+# ── Tenants ────────────────────────────────────────────────────
+# /tenants/<id>/<route> serves <route> against that tenant's data: the
+# path is rewritten and the handler runs inside tenant_scope, so every
+# storage read below is the tenant's. Only read routes over a tenant's
+# own outputs are exposed; /stream and /ingest stay single-tenant.
+TENANT_PATH_PREFIX = "/tenants/"
+TENANT_ROUTES = frozenset([
+    "/", "/latest-risk", "/risk-history", "/export", "/risk-by-level",
+    "/anomalies", "/anomalies/counts", "/forecast", "/rolling-stats",
+])
+
+# Registered ids, reread only when the tenant index changes
+_tenant_ids = (None, frozenset())
+
+
+def known_tenants():
+    global _tenant_ids
+    with tenant_scope(None):
+        version = object_version(TENANT_INDEX_KEY)
+    if _tenant_ids[0] != version:
+        _tenant_ids = (version, frozenset(list_tenants()))
+    return _tenant_ids[1]
+
+
+class TenantMiddleware:
+    """Routes /tenants/<id>/... to the tenant-scoped routes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(TENANT_PATH_PREFIX):
+            return await self.app(scope, receive, send)
+        tenant_id, _, path = scope["path"][len(TENANT_PATH_PREFIX):].partition("/")
+        path = "/" + path
+        if not TENANT_ID.match(tenant_id) or path not in TENANT_ROUTES or tenant_id not in known_tenants():
+            await send({"type": "http.response.start", "status": 404,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": b'{"detail":"Not Found"}'})
+            return
+        scope = {**scope, "path": path, "raw_path": path.encode("utf-8")}
+        with tenant_scope(tenant_id):
+            await self.app(scope, receive, send)
+
+
+# Metrics outermost, so rejected tenant requests are counted too
+app.add_middleware(TenantMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 # ── Data loading ───────────────────────────────────────────────
-def load_csv(s3_key, local_path):
-    if USE_S3:
-        s3 = boto3.client("s3")
-        obj = s3.get_object(Bucket=S3_BUCKET, Key=s3_key)
-        return pd.read_csv(StringIO(obj["Body"].read().decode("utf-8")))
-    else:
-        if not local_path.exists():
-            return None
-        return pd.read_csv(local_path)
+def load_csv(key):
+    body = get_bytes(key)
+    return None if body is None else apply_schema(pd.read_csv(BytesIO(body)))
+
+
+# Risk outputs come from the current release, held in memory and
+# swapped by a background watcher when the pipeline publishes a new one
+# (see api.releases). Stores without a release are read directly.
+_releases = ReleaseWatcher()
 
 
 def load_latest():
-    return load_csv("latest_risk.csv", LATEST_RISK_PATH)
+    release = _releases.current()
+    if release is None:
+        return load_csv("latest_risk.csv")
+    return release.latest.copy()
+
+
+def latest_risk_version():
+    """Cheap change marker for the latest reading (release version, or
+    ETag or mtime of latest_risk.csv), or None."""
+    release = _releases.current()
+    if release is None:
+        return object_version("latest_risk.csv")
+    return release.version
+
+
+def load_history(start=None, end=None):
+    release = _releases.current()
+    if release is None:
+        # Reads only the history partitions overlapping [start, end]
+        return read_history(start, end)
+    df = release.history
+    if df is None:
+        return None
+    if start is not None:
+        df = df[df["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["date"] <= pd.Timestamp(end)]
+    return df.reset_index(drop=True)
+
+
+def load_tail(n):
+    """The last n scored rows."""
+    release = _releases.current()
+    if release is None:
+        return read_tail(n)
+    return None if release.history is None else release.history.tail(n).reset_index(drop=True)
+
+
+class TenantCache:
+    """One cached value per tenant, keeping the MAX_CACHED_TENANTS most
+    recently used so a worker serving many tenants stays bounded."""
+
+    MAX_CACHED_TENANTS = 64
+
+    def __init__(self):
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
 
+    def get(self, default=None):
+        tenant_id = current_tenant()
+        with self._lock:
+            if tenant_id not in self._values:
+                return default
+            self._values.move_to_end(tenant_id)
+            return self._values[tenant_id]
 
-def load_history():
-    return load_csv("daily_risk_output.csv", FULL_RISK_PATH)
+    def set(self, value):
+        with self._lock:
+            self._values[current_tenant()] = value
+            while len(self._values) > self.MAX_CACHED_TENANTS:
+                self._values.popitem(last=False)
+
+
+# The forecast panel is rebuilt only when the demand input has changed
+# (its version is also part of every cached forecast's key).
+_demand_panel = TenantCache()
+
+
+def load_demand_panel():
+    version = demand_data_version()
+    panel = _demand_panel.get()
+    fresh = panel is not None and panel["version"] == version
+    record_cache("demand_panel", fresh)
+    if not fresh:
+        # The validated view the pipeline scores: gaps and blank demand
+        # imputed, so the panel has no missing days
+        demand, _ = validate_demand(read_demand_data())
+        panel = build_panel(demand, version)
+        _demand_panel.set(panel)
+    return panel
+
+
+# The aggregation cube is reloaded only when the daily job has saved a
+# newer one.
+_cube = TenantCache()
+
+
+def load_cube():
+    last_date = saved_last_date()
+    if last_date is None:
+        return None
+    cube = _cube.get()
+    stale = cube is None or cube.last_date != pd.Timestamp(last_date)
+    record_cache("cube", not stale)
+    if stale:
+        cube = AggregationCube.load()
+        _cube.set(cube)
+    return cube
+
+
+# The anomaly index is reloaded only when a pipeline run or ingest batch
+# has changed it.
+_anomaly_index = TenantCache()
+
+
+def load_anomaly_index():
+    version = anomaly_index.anomaly_index_version()
+    if version is None:
+        return None
+    cached_version, index = _anomaly_index.get((None, None))
+    record_cache("anomaly_index", cached_version == version)
+    if cached_version != version:
+        index = anomaly_index.load_anomaly_index()
+        _anomaly_index.set((version, index))
+    return index
+
+
+def json_response(body):
+    """Return pre-serialized JSON bytes as they are."""
+    return Response(content=body, media_type="application/json")
+
+
+def check_format(format):
+    if format not in FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(FORMATS)}.")
 
 
 # ── Risk colors ────────────────────────────────────────────────
@@ -66,20 +284,17 @@ def render_dashboard(latest, history):
     risk_color = RISK_COLORS.get(risk, "#666")
     risk_bg = RISK_BG.get(risk, "rgba(100,100,100,0.1)")
 
-    # --- Prepare data for Chart.js (plain Python → JSON) ---
-    dates = history["date"].tolist()
-    demands = history["demand"].tolist()
-    forecasts = [round(float(f), 1) for f in history["forecast"].tolist()]
-    zscores = [round(float(z), 4) for z in history["z_score"].tolist()]
+    # --- Prepare data for Chart.js (columns straight to JSON) ---
+    dates = dumps_array(history["date"]).decode()
+    demands = dumps_array(history["demand"]).decode()
+    forecasts = dumps_array(history["forecast"].round(1)).decode()
+    zscores = dumps_array(history["z_score"].round(4)).decode()
 
     # Anomaly points — null for non-anomaly days so Chart.js skips them
-    anomaly_points = [
-        int(row["demand"]) if row["anomaly_flag"] == 1 else "null"
-        for _, row in history.iterrows()
-    ]
+    anomaly_points = dumps_array(history["demand"].where(history["anomaly_flag"] == 1)).decode()
 
-    # Risk distribution for doughnut
-    risk_counts = history["risk_level"].value_counts().to_dict()
+    # Risk distribution for doughnut (levels that occurred)
+    risk_counts = history["risk_level"].value_counts().loc[lambda c: c > 0].to_dict()
     dist_labels = list(risk_counts.keys())
     dist_values = list(risk_counts.values())
     dist_colors = [RISK_COLORS.get(l, "#666") for l in dist_labels]
@@ -357,11 +572,11 @@ def render_dashboard(latest, history):
 </div>
 
 <script>
-const DATES     = {json.dumps(dates)};
-const DEMANDS   = {json.dumps(demands)};
-const FORECASTS = {json.dumps(forecasts)};
-const ZSCORES   = {json.dumps(zscores)};
-const ANOMALIES = [{','.join(str(v) for v in anomaly_points)}];
+const DATES     = {dates};
+const DEMANDS   = {demands};
+const FORECASTS = {forecasts};
+const ZSCORES   = {zscores};
+const ANOMALIES = {anomaly_points};
 const DIST_LABELS = {json.dumps(dist_labels)};
 const DIST_VALUES = {json.dumps(dist_values)};
 const DIST_COLORS = {json.dumps(dist_colors)};
@@ -550,8 +765,6 @@ def dashboard():
     history = load_history()
     if latest is None or history is None:
         return HTMLResponse("<h2 style='font-family:monospace;padding:2rem;color:#e8453c'>Pipeline has not run yet.</h2>")
-    latest["date"] = pd.to_datetime(latest["date"]).dt.strftime("%Y-%m-%d")
-    history["date"] = pd.to_datetime(history["date"]).dt.strftime("%Y-%m-%d")
     return render_dashboard(latest, history)
 
 
@@ -560,32 +773,359 @@ def health_check():
     return {"status": "healthy"}
 
 
+# ── Metrics ────────────────────────────────────────────────────
+# Read from storage at scrape time, like the pipeline run gauges in
+# src.utils.metrics.
+def _history_rows():
+    manifest = load_manifest()
+    if manifest is not None:
+        yield (), sum(p["rows"] for p in manifest["partitions"])
+
+
+def _latest_by_series():
+    latest = load_latest()
+    if latest is None:
+        return
+    series = latest["series_id"] if "series_id" in latest else [DEFAULT_SERIES_ID] * len(latest)
+    yield from zip(series, latest["risk_level"], latest["z_score"])
+
+
+def _risk_levels():
+    for series_id, level, _ in _latest_by_series():
+        yield (series_id,), list(RISK_LEVELS).index(level)
+
+
+def _z_scores():
+    for series_id, _, z in _latest_by_series():
+        yield (series_id,), z
+
+
+Gauge("risk_history_rows", "Rows in the published risk history.", collect=_history_rows)
+Gauge("series_risk_level", "Current risk level per series (" +
+      ", ".join(f"{i} = {level}" for i, level in enumerate(RISK_LEVELS)) + ").",
+      ("series_id",), collect=_risk_levels)
+Gauge("series_z_score", "Current z-score per series.", ("series_id",), collect=_z_scores)
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/latest-risk")
 def get_latest_risk():
     df = load_latest()
     if df is None or df.empty:
         raise HTTPException(status_code=404, detail="No risk data found.")
-    return df.iloc[0].to_dict()
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    return to_records(df)[0]
 
 
 @app.get("/risk-history")
-def get_risk_history(limit: int = 30):
-    df = load_history()
+def get_risk_history(limit: int = 30, format: str = "records"):
+    """The last `limit` readings, newest first. format=columns returns
+    one array per field instead of one object per reading."""
+    check_format(format)
+    df = load_tail(limit)
+    # An empty tail is only missing history when rows were asked for
+    if df is None or (df.empty and limit > 0):
+        raise HTTPException(status_code=404, detail="No risk history found.")
+    df = df.iloc[::-1]
+    # Rows scored before the multi-window z-scores or tail
+    # probabilities have them as null
+    columns = ["date", "demand", "forecast", "z_score", "risk_level", "anomaly_flag",
+               *Z_COLUMNS, "tail_probability"]
+    return json_response(dumps_frame(df.reindex(columns=columns), format))
+
+
+MAX_STATS_WINDOW = 365
+
+
+@app.get("/rolling-stats")
+def get_rolling_stats(windows: str = None, date: Date = None):
+    """Mean, std, min, max, quantiles and z-score of the residuals over
+    each trailing window (comma-separated days, default 7,30,90) ending
+    on `date` (default: the latest reading)."""
+    try:
+        sizes = [int(w) for w in windows.split(",")] if windows else list(WINDOWS)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="windows must be comma-separated days.")
+    if not all(2 <= w <= MAX_STATS_WINDOW for w in sizes):
+        raise HTTPException(status_code=422, detail=f"windows must be between 2 and {MAX_STATS_WINDOW} days.")
+
+    if date is None:
+        df = load_tail(max(sizes))
+    else:
+        df = load_history(start=pd.Timestamp(date) - pd.Timedelta(days=max(sizes) - 1), end=date)
     if df is None or df.empty:
         raise HTTPException(status_code=404, detail="No risk history found.")
-    df = df.tail(limit).iloc[::-1]
-    return df[["date", "demand", "forecast", "z_score", "risk_level", "anomaly_flag"]].to_dict(orient="records")
+    return {
+        "date": df["date"].iloc[-1].strftime("%Y-%m-%d"),
+        "windows": latest_stats(df["residual"], sizes),
+    }
+
+
+@app.get("/export")
+def export_history(request: Request, format: str = "csv", start: str = None, end: str = None,
+                   series: str = None):
+    """Stream the scored history between start and end as csv, ndjson or
+    arrow (IPC stream), optionally only some `series` (comma-separated).
+    Honors a single `Range` (with `If-Range`) so broken downloads can
+    resume."""
+    try:
+        export = HistoryExport(format, start, end, series.split(",") if series else None)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not export.partitions:
+        raise HTTPException(status_code=404, detail="No risk history found.")
+
+    headers = {
+        "ETag": export.etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="risk_history.{format}"',
+    }
+    byte_range = parse_range(request.headers.get("range", ""))
+    if byte_range is None or request.headers.get("if-range", export.etag) != export.etag:
+        return StreamingResponse(export.iter_bytes(), media_type=EXPORT_FORMATS[format], headers=headers)
+
+    total = export.size()
+    first, last = byte_range
+    if first is None:
+        first, last = max(total - last, 0), total - 1
+    last = total - 1 if last is None else min(last, total - 1)
+    if first >= total:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{total}"})
+    headers["Content-Range"] = f"bytes {first}-{last}/{total}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(export.iter_bytes(first, last), status_code=206,
+                             media_type=EXPORT_FORMATS[format], headers=headers)
+
+
+@app.get("/risk-by-level")
+def get_risk_by_level(level: str = "store", grain: str = "W", risk: str = "HIGH,CRITICAL",
+                      period: str = None, format: str = "records"):
+    """Members of a hierarchy level (total, store, item, store_item) in the
+    given risk levels for one period. `grain` is D, W or M; `period` is
+    any date inside the period (default: the latest)."""
+    check_format(format)
+    if level not in LEVELS:
+        raise HTTPException(status_code=422, detail=f"level must be one of {', '.join(LEVELS)}.")
+    if grain not in GRAINS:
+        raise HTTPException(status_code=422, detail=f"grain must be one of {', '.join(GRAINS)}.")
+    risk_levels = risk.upper().split(",")
+    if not set(risk_levels) <= set(RISK_COLORS):
+        raise HTTPException(status_code=422, detail=f"risk must be among {', '.join(RISK_COLORS)}.")
+
+    cube = load_cube()
+    if cube is None:
+        raise HTTPException(status_code=404, detail="No aggregation cube found.")
+    try:
+        df = cube.at_risk(level, grain, risk_levels, period)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return json_response(dumps_object(
+        {
+            "level": level,
+            "grain": grain,
+            "period": cube.period_label(level, grain, period),
+            "count": len(df),
+        },
+        members=dumps_frame(df[["key", "demand", "z_score", "risk_level"]], format),
+    ))
 
 
 @app.get("/anomalies")
-def get_anomalies(limit: int = 10):
-    df = load_history()
-    if df is None or df.empty:
+def get_anomalies(limit: int = 10, sort: str = "date", start: str = None, end: str = None,
+                  series: str = None, risk: str = None, format: str = "records"):
+    """Anomalies from the anomaly index. sort=date gives the latest
+    `limit` (optionally only some `risk` levels); sort=severity gives the
+    `limit` largest |z| between `start` and `end`. `series` narrows
+    either to one series."""
+    check_format(format)
+    if sort not in ("date", "severity"):
+        raise HTTPException(status_code=422, detail="sort must be 'date' or 'severity'.")
+    if sort == "severity" and risk:
+        raise HTTPException(status_code=422, detail="risk only applies to sort=date.")
+    if limit < 1:
+        raise HTTPException(status_code=422, detail="limit must be positive.")
+    risk_levels = risk.upper().split(",") if risk else None
+    if risk_levels and not set(risk_levels) <= set(RISK_COLORS):
+        raise HTTPException(status_code=422, detail=f"risk must be among {', '.join(RISK_COLORS)}.")
+
+    index = load_anomaly_index()
+    if index is None:
         raise HTTPException(status_code=404, detail="No risk history found.")
-    anomalies = df[df["anomaly_flag"] == 1].tail(limit).iloc[::-1]
+    try:
+        if sort == "severity":
+            anomalies = index.top_k(limit, start, end, series)
+        else:
+            anomalies = index.latest(limit, risk_levels, series)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     if anomalies.empty:
         return {"message": "No anomalies detected so far.", "anomalies": []}
+    # The index keeps demand as float64; serve it as /risk-history does
+    anomalies = compact_demand(anomalies)
+    return json_response(dumps_object(
+        {"total_anomalies": len(anomalies)},
+        anomalies=dumps_frame(anomalies[["series_id", "date", "demand", "forecast", "z_score", "risk_level"]], format),
+    ))
+
+
+@app.get("/anomalies/counts")
+def get_anomaly_counts(start: str = None, end: str = None):
+    """Anomaly count per series between start and end (inclusive)."""
+    index = load_anomaly_index()
+    if index is None:
+        raise HTTPException(status_code=404, detail="No risk history found.")
+    try:
+        counts = index.counts(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"start": start, "end": end, "series": counts.to_dict(orient="records")}
+
+
+@app.get("/forecast")
+def get_forecast(horizon: int = 28, series: str = None, as_of: str = None, level: float = 0.95):
+    """Seasonal-naive forecast for the next `horizon` days with prediction
+    intervals. `series` is a comma-separated list (default: all series);
+    `as_of` defaults to the last date the pipeline has processed."""
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise HTTPException(status_code=422, detail=f"horizon must be between 1 and {MAX_HORIZON}.")
+    if not 0 < level < 1:
+        raise HTTPException(status_code=422, detail="level must be between 0 and 1.")
+
+    panel = load_demand_panel()
+    series_ids = series.split(",") if series else None
+    as_of = as_of or read_cursor()
+    try:
+        result = forecast_panel(panel, series_ids, as_of, horizon, level)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return {
+        "as_of": result["as_of"],
+        "horizon": horizon,
+        "level": level,
+        "dates": result["dates"].strftime("%Y-%m-%d").tolist(),
+        "series": [
+            {
+                "series_id": sid,
+                "forecast": _finite_list(result["forecast"][i]),
+                "lower": _finite_list(result["lower"][i]),
+                "upper": _finite_list(result["upper"][i]),
+            }
+            for i, sid in enumerate(result["series_ids"])
+        ],
+    }
+
+
+def _finite_list(values):
+    """Values rounded to 0.1, with None where there is no forecast (a
+    series that hadn't started a season before as_of)."""
+    return [v if np.isfinite(v) else None for v in values.round(1).tolist()]
+
+
+# ── Push channel ───────────────────────────────────────────────
+def poll_latest_risk(state):
+    """Return (new_state, events) for every reading published since the
+    last poll; state is (latest_risk version, last date sent)."""
+    last_version, last_date = state or (None, None)
+    version = latest_risk_version()
+    if version is None or version == last_version:
+        return state, []
+
+    if last_date is None:
+        rows = load_latest()
+    else:
+        # Several runs may land between polls; send every new day
+        rows = load_history(start=pd.Timestamp(last_date) + pd.Timedelta(days=1))
+    if rows is None or rows.empty:
+        return (version, last_date), []
+
+    events = []
+    for reading in to_records(rows):
+        reading["date"] = str(reading["date"])[:10]
+        events.append(("risk", reading))
+        if reading.get("anomaly_flag") == 1:
+            events.append(("anomaly", reading))
+    return (version, events[-1][1]["date"]), events
+
+
+risk_broadcaster = Broadcaster(poll_latest_risk)
+
+
+@app.get("/stream")
+async def stream_risk(request: Request):
+    """Server-sent events: a `risk` event for each new latest reading and
+    an `anomaly` event when it is flagged. One watcher polls the output
+    store and fans each reading out to all connected clients."""
+    queue = risk_broadcaster.subscribe()
+
+    async def events():
+        try:
+            async for message in event_stream(queue):
+                if await request.is_disconnected():
+                    break
+                yield message
+        finally:
+            risk_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ── Ingestion ──────────────────────────────────────────────────
+class DemandPoint(BaseModel):
+    series_id: str = DEFAULT_SERIES_ID
+    date: Date
+    demand: float
+
+
+class IngestRequest(BaseModel):
+    points: list[DemandPoint]
+
+
+_ingest_batcher = None
+
+
+def get_ingest_batcher():
+    global _ingest_batcher
+    if _ingest_batcher is None:
+        _ingest_batcher = MicroBatcher(IngestProcessor().process)
+    return _ingest_batcher
+
+
+@app.post("/ingest")
+async def ingest(request: IngestRequest, wait: bool = False):
+    """Accept demand points for one or many series. They are scored in
+    micro-batches; with wait=true the response carries their scores."""
+    if not request.points:
+        raise HTTPException(status_code=422, detail="No points supplied.")
+    points = pd.DataFrame([p.model_dump() for p in request.points])
+    future = get_ingest_batcher().submit(points)
+    if not wait:
+        return {"accepted": len(points)}
+
+    scored, rejected = await asyncio.wrap_future(future)
+    # The scorer accepts one point per (series_id, date), so the keys of
+    # this request's accepted points match one scored row each, even when
+    # the request or another in its batch repeats them
+    accepted = points.drop(index=rejected.index)
+    keys = accepted[["series_id", "date"]].assign(date=pd.to_datetime(accepted["date"]))
+    mine = scored.merge(keys, on=["series_id", "date"])
+    mine["date"] = mine["date"].dt.strftime("%Y-%m-%d")
     return {
-        "total_anomalies": len(anomalies),
-        "anomalies": anomalies[["date", "demand", "forecast", "z_score", "risk_level"]].to_dict(orient="records")
+        "accepted": len(mine),
+        "rejected": len(rejected),
+        "scores": to_records(mine),
     }
@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.fast_json import dumps_columns, dumps_records
+from src.risk.compute_risk import assign_risk_array
+from src.utils.schema import apply_schema
+
+# ── JSON response serialization ───────────────────────────────
+# Times building a /risk-history style response body from a canonical
+# frame the old way (to_dict records through FastAPI's encoder and
+# JSONResponse) against the direct bytes serializer, as records and as
+# columns, and checks that all three carry the same values.
+
+ROW_COUNTS = [1_000, 100_000, 1_000_000]
+COLUMNS = ["date", "demand", "forecast", "z_score", "risk_level", "anomaly_flag"]
+
+
+def make_history(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    z = rng.standard_t(5, num_rows)
+    demand = rng.integers(10_000, 40_000, num_rows)
+    return apply_schema(pd.DataFrame({
+        "date": pd.Timestamp("2013-01-01") + pd.to_timedelta(np.arange(num_rows) % 1826, unit="D"),
+        "demand": demand,
+        "forecast": demand - z * 1500,
+        "z_score": z,
+        "risk_level": assign_risk_array(z),
+        "anomaly_flag": (np.abs(z) >= 2).astype(int),
+    }))
+
+
+def dict_response(df):
+    df = df.assign(date=df["date"].dt.strftime("%Y-%m-%d"))
+    return JSONResponse(jsonable_encoder(df.to_dict(orient="records"))).body
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    print(f"{'Rows':>10} {'to_dict':>10} {'records':>10} {'columns':>10} {'Speedup':>8} {'Size':>9}")
+    for num_rows in ROW_COUNTS:
+        df = make_history(num_rows)[COLUMNS]
+        repeats = 1 if num_rows >= 1_000_000 else 5
+
+        old, old_ms = timed(lambda: dict_response(df), repeats)
+        records, records_ms = timed(lambda: dumps_records(df), repeats)
+        columns, columns_ms = timed(lambda: dumps_columns(df), repeats)
+
+        expected = pd.DataFrame(orjson.loads(old))
+        for got in (pd.DataFrame(orjson.loads(records)), pd.DataFrame(orjson.loads(columns))):
+            for column in COLUMNS:
+                if column in ("date", "risk_level"):
+                    assert (got[column] == expected[column]).all(), column
+                else:
+                    assert np.allclose(got[column], expected[column], rtol=1e-6), column
+
+        print(f"{num_rows:>10,} {old_ms:>7.1f} ms {records_ms:>7.1f} ms {columns_ms:>7.1f} ms "
+              f"{old_ms / records_ms:>7.1f}x {len(records) / 1e6:>6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from api.app import app, MetricsMiddleware
+from src.risk.compute_risk import assign_risk_array
+from src.utils import storage
+from src.utils.metrics import REGISTRY
+from src.utils.risk_store import write_partition, publish_partition
+
+# ── Metrics overhead ──────────────────────────────────────────
+# Calls the API in-process (straight into its ASGI stack, so network
+# noise doesn't hide the difference) with and without MetricsMiddleware,
+# alternating request by request for SECONDS_PER_ROUTE, and checks the
+# median request latency grows by less than MAX_OVERHEAD on each route.
+# Also times the middleware alone around a no-op app, and a scrape of
+# /metrics.
+
+ROUTES = ["/health", "/latest-risk", "/risk-history?limit=7"]
+HISTORY_DAYS = 60
+SECONDS_PER_ROUTE = 10
+MAX_OVERHEAD = 0.05
+
+
+def write_history(root):
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2024-01-01", periods=HISTORY_DAYS, freq="D")
+    z = rng.standard_t(5, HISTORY_DAYS)
+    df = pd.DataFrame({
+        "date": dates, "demand": rng.integers(10_000, 40_000, HISTORY_DAYS),
+        "forecast": rng.normal(25_000, 2000, HISTORY_DAYS), "residual": rng.normal(0, 2000, HISTORY_DAYS),
+        "rolling_mean": rng.normal(0, 500, HISTORY_DAYS), "rolling_std": rng.uniform(500, 3000, HISTORY_DAYS),
+        "z_score": z, "risk_level": assign_risk_array(z), "anomaly_flag": (np.abs(z) >= 2).astype(int),
+    })
+    for i, date in enumerate(dates.strftime("%Y-%m-%d")):
+        write_partition(df.iloc[i:i + 1], date)
+        publish_partition(date)
+    df.iloc[-1:].to_csv(root / "latest_risk.csv", index=False)
+
+
+def middleware_stack(with_metrics):
+    saved = app.user_middleware
+    app.user_middleware = [m for m in saved if with_metrics or m.cls is not MetricsMiddleware]
+    try:
+        return app.build_middleware_stack()
+    finally:
+        app.user_middleware = saved
+
+
+async def call(stack, url):
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "headers": [], "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80), "app": app,
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await stack(scope, receive, send)
+    return status[0]
+
+
+async def latencies(stacks, url):
+    """Per-request seconds for each stack, alternating between them."""
+    times = {name: [] for name in stacks}
+    for stack in stacks.values():  # warm up
+        assert await call(stack, url) == 200, url
+    deadline = time.perf_counter() + SECONDS_PER_ROUTE
+    while time.perf_counter() < deadline:
+        for name, stack in stacks.items():
+            start = time.perf_counter()
+            await call(stack, url)
+            times[name].append(time.perf_counter() - start)
+    return times
+
+
+async def middleware_cost(n=100_000):
+    """Seconds the middleware adds around an app that does nothing."""
+    class Route:
+        path = "/noop"
+
+    async def noop(scope, receive, send):
+        scope["route"] = Route
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    timings = []
+    for app_ in (noop, MetricsMiddleware(noop)):
+        start = time.perf_counter()
+        for _ in range(n):
+            await app_({"type": "http", "method": "GET"}, None, send)
+        timings.append((time.perf_counter() - start) / n)
+    return timings[1] - timings[0]
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        storage.LOCAL_ROOT = root
+        write_history(root)
+
+        stacks = {"without": middleware_stack(False), "with": middleware_stack(True)}
+        print(f"{'Route':<24} {'Requests':>9} {'Without':>10} {'With':>10} {'Overhead':>9}")
+        failures = []
+        for url in ROUTES:
+            times = await latencies(stacks, url)
+            without, with_metrics = np.median(times["without"]), np.median(times["with"])
+            overhead = with_metrics / without - 1
+            print(f"{url:<24} {len(times['with']):>9,} {without * 1e6:>7.0f} us {with_metrics * 1e6:>7.0f} us {overhead:>8.1%}")
+            if overhead > MAX_OVERHEAD:
+                failures.append(url)
+
+        print(f"\nMiddleware alone: {await middleware_cost() * 1e6:.1f} us per request")
+        start = time.perf_counter()
+        body = REGISTRY.render()
+        print(f"Scrape: {len(body.splitlines())} lines in {(time.perf_counter() - start) * 1000:.2f} ms")
+        assert not failures, f"metrics overhead above {MAX_OVERHEAD:.0%} on {', '.join(failures)}"
+        print(f"Overhead below {MAX_OVERHEAD:.0%} on every route.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
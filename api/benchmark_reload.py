@@ -0,0 +1,131 @@
+import multiprocessing
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+from api.benchmark_export import start_server
+from src.utils import config, storage
+
+# ── Hot reload under load ─────────────────────────────────────
+# Fills a temporary local store with WARMUP_DAYS of pipeline runs and
+# serves the API with uvicorn, then keeps CLIENTS clients requesting the
+# risk routes while a separate process runs (and so publishes) one day
+# every PUBLISH_INTERVAL. Request latency is reported for requests that
+# overlapped a publish and for the rest, with releases served from
+# memory by the watcher and with every request reading storage directly
+# (the way the API worked before releases). No request may fail, and
+# the latest date a client sees may never go backwards.
+
+WARMUP_DAYS = 365
+CLIENTS = 4
+DURATION = 20.0
+PUBLISH_INTERVAL = 0.5
+ROUTES = ["/latest-risk", "/risk-history?limit=30", "/rolling-stats", "/"]
+
+
+def use_store(root):
+    storage.LOCAL_ROOT = Path(root)
+    config.CURSOR_PATH = Path(root) / "cursor.json"
+    config.CURSOR_LOCK_PATH = Path(root) / "cursor.lock"
+
+
+def publish_days(root, days, interval, publishes):
+    """Run the pipeline `days` times, `interval` apart, putting each
+    run's (start, end) wall-clock times on `publishes`."""
+    use_store(root)
+    from src.pipeline import daily_pipeline
+    for _ in range(days):
+        start = time.time()
+        daily_pipeline.run(None, log=lambda *args: None)
+        publishes.put((start, time.time()))
+        time.sleep(max(0.0, interval - (time.time() - start)))
+
+
+def client(base, stop, results):
+    """Request ROUTES in turn until stopped, appending (start, seconds,
+    status, latest date or None) per request."""
+    i = 0
+    while not stop.is_set():
+        route = ROUTES[i % len(ROUTES)]
+        i += 1
+        start = time.time()
+        try:
+            with urllib.request.urlopen(f"{base}{route}") as response:
+                body, status = response.read(), response.status
+        except urllib.error.HTTPError as e:
+            body, status = b"", e.code
+        date = None
+        if route == "/latest-risk" and status == 200:
+            date = body.split(b'"date":"', 1)[1][:10]
+        results.append((start, time.time() - start, status, date))
+
+
+def measure(base, root):
+    context = multiprocessing.get_context("spawn")
+    publishes = context.Queue()
+    days = int(DURATION / PUBLISH_INTERVAL)
+    publisher = context.Process(target=publish_days, args=(root, days, PUBLISH_INTERVAL, publishes))
+    stop = threading.Event()
+    results = [[] for _ in range(CLIENTS)]
+    clients = [threading.Thread(target=client, args=(base, stop, r)) for r in results]
+    publisher.start()
+    for thread in clients:
+        thread.start()
+    windows = [publishes.get() for _ in range(days)]
+    publisher.join()
+    stop.set()
+    for thread in clients:
+        thread.join()
+
+    for requests in results:
+        dates = [date for _, _, _, date in requests if date is not None]
+        assert dates == sorted(dates), "a client's latest reading went backwards"
+    requests = [request for requests in results for request in requests]
+    assert all(status == 200 for _, _, status, _ in requests), "a request failed"
+    during = np.array([
+        any(start < end and start + seconds > begin for begin, end in windows)
+        for start, seconds, _, _ in requests
+    ])
+    latency = np.array([seconds for _, seconds, _, _ in requests]) * 1000
+    return latency[during], latency[~during]
+
+
+def summary(label, latency):
+    p50, p99 = np.percentile(latency, [50, 99])
+    return f"{label:<32} {len(latency):>8,} {p50:>7.1f} ms {p99:>7.1f} ms {latency.max():>7.1f} ms"
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        use_store(root)
+        from api import app as api
+        from src.pipeline import daily_pipeline
+        start = time.perf_counter()
+        for _ in range(WARMUP_DAYS):
+            daily_pipeline.run(None, log=lambda *args: None)
+        print(f"Warm-up: {WARMUP_DAYS} days in {time.perf_counter() - start:.0f} s")
+
+        server, thread, base = start_server(api.app)
+        for route in ROUTES:
+            urllib.request.urlopen(f"{base}{route}").read()
+
+        print(f"{CLIENTS} clients, one publish every {PUBLISH_INTERVAL} s for {DURATION:.0f} s\n")
+        print(f"{'':<32} {'Requests':>8} {'p50':>10} {'p99':>10} {'Max':>10}")
+        watched = api._releases.current
+        for mode in ("direct reads", "hot reload"):
+            api._releases.current = (lambda: None) if mode == "direct reads" else watched
+            during, idle = measure(base, root)
+            print(summary(f"{mode}, during a publish", during))
+            print(summary(f"{mode}, between publishes", idle))
+        server.should_exit = True
+        thread.join()
+        print("\nNo failed requests; latest dates never went backwards.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import asyncio
+import time
+import tracemalloc
+
+import numpy as np
+
+from api.stream import Broadcaster, event_stream
+
+# ── Push channel fan-out ──────────────────────────────────────
+# Connects hundreds of simulated SSE clients to one Broadcaster, then
+# publishes readings and measures how long each takes to reach every
+# client, plus the memory each connection holds.
+
+SUBSCRIBER_COUNTS = [100, 500, 1000]
+EVENTS = 50
+PUBLISH_INTERVAL = 0.01
+
+
+async def client(queue, received, ready):
+    ready.set()
+    async for message in event_stream(queue):
+        received.append((message, time.perf_counter()))
+
+
+async def run(num_subscribers):
+    broadcaster = Broadcaster(lambda state: (state, []), interval=3600)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    clients, inboxes = [], []
+    for _ in range(num_subscribers):
+        received, ready = [], asyncio.Event()
+        clients.append(asyncio.create_task(
+            client(broadcaster.subscribe(), received, ready)
+        ))
+        inboxes.append(received)
+        await ready.wait()
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    per_connection = sum(
+        s.size_diff for s in after.compare_to(before, "filename")
+    ) / num_subscribers
+
+    sent = {}
+    for i in range(EVENTS):
+        reading = {"seq": i, "date": "2017-12-31", "z_score": 2.5, "risk_level": "HIGH"}
+        sent[i] = time.perf_counter()
+        broadcaster.publish("risk", reading)
+        await asyncio.sleep(PUBLISH_INTERVAL)
+
+    for task in clients:
+        task.cancel()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    latencies = []
+    for received in inboxes:
+        for seq, (_, at) in enumerate(received):
+            latencies.append((at - sent[seq]) * 1000)
+    latencies = np.array(latencies)
+    delivered = len(latencies) / (num_subscribers * EVENTS)
+
+    return per_connection, delivered, latencies
+
+
+def main():
+    print(f"{'Clients':>8} {'KB/conn':>8} {'Delivered':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for n in SUBSCRIBER_COUNTS:
+        per_connection, delivered, latencies = asyncio.run(run(n))
+        print(f"{n:>8} {per_connection / 1024:>8.2f} {delivered:>10.1%} "
+              f"{np.percentile(latencies, 50):>8.2f} "
+              f"{np.percentile(latencies, 99):>8.2f} {latencies.max():>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import numpy as np
+import orjson
+import pandas as pd
+
+# ── Fast JSON ─────────────────────────────────────────────────
+# Serializes DataFrames straight to JSON bytes without building a
+# Python object per row. Each column is first rendered to one byte
+# buffer of value tokens plus the length of every token:
+#
+#   numbers      - orjson over the whole numpy array, split on commas
+#   dates        - numpy's datetime_as_string, as a fixed-width matrix
+#   strings and  - each distinct value encoded once, then gathered by
+#   categoricals   its integer code
+#
+# Rows or arrays are then assembled by computing where every token
+# lands in the output and scattering the bytes there with numpy.
+#
+#   dumps_records(df) -> [{"date":"2017-12-31","z_score":1.2},...]
+#   dumps_columns(df) -> {"date":["2017-12-31",...],"z_score":[1.2,...]}
+#   dumps_ndjson(df)  -> {"date":"2017-12-31","z_score":1.2}\n...
+
+COMMA, QUOTE = ord(","), ord('"')
+NULL = b"null"
+
+FORMATS = ("records", "columns")
+
+
+def _from_matrix(matrix, lens):
+    """Token buffer from a (rows x width) byte matrix and token lengths."""
+    return matrix[np.arange(matrix.shape[1]) < lens[:, None]], lens
+
+
+def _number_tokens(values):
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64)
+    raw = np.frombuffer(
+        orjson.dumps(np.ascontiguousarray(values), option=orjson.OPT_SERIALIZE_NUMPY),
+        dtype=np.uint8,
+    )[1:-1]
+    commas = np.flatnonzero(raw == COMMA)
+    lens = np.diff(np.r_[-1, commas, len(raw)]) - 1
+    return raw[raw != COMMA], lens
+
+
+def _date_tokens(values):
+    values = values.astype("datetime64[s]")
+    midnight = (values.astype("datetime64[D]") == values) | np.isnat(values)
+    # 2017-12-31 for whole days, else 2017-12-31T08:30:00
+    unit, width = ("D", 10) if midnight.all() else ("s", 19)
+    text = np.datetime_as_string(values.astype(f"datetime64[{unit}]")).astype(f"S{width}")
+    matrix = np.full((len(values), width + 2), QUOTE, dtype=np.uint8)
+    matrix[:, 1:-1] = text.view(np.uint8).reshape(len(values), width)
+    lens = np.full(len(values), width + 2)
+
+    missing = np.isnat(values)
+    matrix[missing, :len(NULL)] = np.frombuffer(NULL, dtype=np.uint8)
+    lens[missing] = len(NULL)
+    return _from_matrix(matrix, lens)
+
+
+def _coded_tokens(codes, uniques):
+    """Tokens for values given as codes into uniques (-1 = missing)."""
+    encoded = [orjson.dumps(u) for u in uniques] + [NULL]
+    width = max(len(e) for e in encoded)
+    matrix = np.zeros((len(encoded), width), dtype=np.uint8)
+    for i, e in enumerate(encoded):
+        matrix[i, :len(e)] = np.frombuffer(e, dtype=np.uint8)
+    unique_lens = np.array([len(e) for e in encoded])
+
+    codes = np.where(codes < 0, len(encoded) - 1, codes)
+    lens = unique_lens[codes]
+    starts = np.cumsum(lens) - lens
+    offsets = np.arange(lens.sum()) - np.repeat(starts, lens)
+    return matrix[np.repeat(codes, lens), offsets], lens
+
+
+def column_tokens(column):
+    """(token bytes, token lengths) for one Series."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return _coded_tokens(column.cat.codes.to_numpy(), column.cat.categories.tolist())
+    values = column.to_numpy()
+    if np.issubdtype(values.dtype, np.datetime64):
+        return _date_tokens(values)
+    if np.issubdtype(values.dtype, np.number) or values.dtype == np.bool_:
+        return _number_tokens(values)
+    codes, uniques = pd.factorize(column)
+    return _coded_tokens(codes, uniques.tolist())
+
+
+def _scatter(out, starts, buf, lens):
+    """Copy each token of buf to out at its start position."""
+    src_starts = np.cumsum(lens) - lens
+    out[np.repeat(starts - src_starts, lens) + np.arange(len(buf))] = buf
+
+
+def _key(name):
+    return np.frombuffer(orjson.dumps(str(name)) + b":", dtype=np.uint8)
+
+
+def dumps_array(column):
+    """A Series as a JSON array."""
+    buf, lens = column_tokens(column)
+    n = len(lens)
+    out = np.full(len(buf) + max(n - 1, 0) + 2, COMMA, dtype=np.uint8)
+    out[0], out[-1] = ord("["), ord("]")
+    # Token i is preceded by the bracket and i commas
+    starts = np.cumsum(lens) - lens + np.arange(n) + 1
+    _scatter(out, starts, buf, lens)
+    return out.tobytes()
+
+
+def dumps_columns(df):
+    """{"column": [values, ...], ...}"""
+    parts = [orjson.dumps(str(c)) + b":" + dumps_array(df[c]) for c in df.columns]
+    return b"{" + b",".join(parts) + b"}"
+
+
+def _dump_rows(df):
+    """Every row of df as a JSON object, each followed by one spare
+    byte. Returns (bytes array, position of each row's spare byte)."""
+    keys = [_key(c) for c in df.columns]
+    tokens = [column_tokens(df[c]) for c in df.columns]
+
+    # Each row is "{" + key:token + ("," or "}") per column
+    row_lens = 1 + sum(len(k) + lens + 1 for k, (_, lens) in zip(keys, tokens))
+    row_starts = np.cumsum(row_lens + 1) - (row_lens + 1)
+    out = np.full(int(row_lens.sum()) + len(df), COMMA, dtype=np.uint8)
+    out[row_starts] = ord("{")
+
+    position = row_starts + 1
+    for i, (key, (buf, lens)) in enumerate(zip(keys, tokens)):
+        out[position[:, None] + np.arange(len(key))] = key
+        position = position + len(key)
+        _scatter(out, position, buf, lens)
+        position = position + lens
+        if i == len(keys) - 1:
+            out[position] = ord("}")
+        position = position + 1
+    return out, position
+
+
+def dumps_records(df):
+    """[{"column": value, ...}, ...], one object per row."""
+    if len(df) == 0:
+        return b"[]"
+    out, _ = _dump_rows(df)
+    # Rows are already comma separated; the last spare byte closes the list
+    out[-1] = ord("]")
+    return b"[" + out.tobytes()
+
+
+def dumps_ndjson(df):
+    """One JSON object per line, each line ending in a newline."""
+    if len(df) == 0:
+        return b""
+    out, row_ends = _dump_rows(df)
+    out[row_ends] = ord("\n")
+    return out.tobytes()
+
+
+def dumps_frame(df, format="records"):
+    """df in one of FORMATS."""
+    return dumps_columns(df) if format == "columns" else dumps_records(df)
+
+
+def dumps_object(fields, **frames):
+    """A JSON object of plain `fields` plus already-serialized frames."""
+    parts = [orjson.dumps(str(k)) + b":" + orjson.dumps(v) for k, v in fields.items()]
+    parts += [orjson.dumps(k) + b":" + body for k, body in frames.items()]
+    return b"{" + b",".join(parts) + b"}"
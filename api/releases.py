@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+from src.utils.metrics import record_cache
+from src.utils.risk_release import current_release_version, load_release
+from src.utils.tenants import current_tenant, tenant_scope
+
+# ── Hot reload ────────────────────────────────────────────────
+# Each API worker keeps the current risk release (src.utils.risk_release)
+# of every tenant it serves in memory. One watcher thread per worker
+# checks the release pointers and, when one moves, loads the new release
+# (reading only the partitions it doesn't already hold) and swaps it in
+# with a single assignment. Requests read whichever release is in place,
+# so they never wait on a reload or see a half-published one; only a
+# tenant's first request loads it itself. The thread starts on first
+# use, so each forked uvicorn worker runs its own.
+
+POLL_INTERVAL = 1.0  # seconds between checks of the release pointers
+
+
+class ReleaseWatcher:
+    MAX_TENANTS = 64
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        # tenant -> (pointer version, Release or None)
+        self._releases = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def current(self):
+        """The active tenant's release, or None before its first one is
+        published."""
+        tenant_id = current_tenant()
+        with self._lock:
+            entry = self._releases.get(tenant_id)
+            if entry is not None:
+                self._releases.move_to_end(tenant_id)
+        record_cache("release", entry is not None)
+        if entry is None:
+            entry = self._load(None)
+            self._store(tenant_id, entry)
+            self._start()
+        return entry[1]
+
+    def _load(self, previous):
+        version = current_release_version()
+        return version, None if version is None else load_release(previous)
+
+    def _store(self, tenant_id, entry):
+        with self._lock:
+            self._releases[tenant_id] = entry
+            self._releases.move_to_end(tenant_id)
+            while len(self._releases) > self.MAX_TENANTS:
+                self._releases.popitem(last=False)
+
+    def refresh(self):
+        """Load and swap in every watched tenant's newer release."""
+        with self._lock:
+            watched = list(self._releases.items())
+        for tenant_id, (version, release) in watched:
+            with tenant_scope(tenant_id):
+                if current_release_version() == version:
+                    continue
+                entry = self._load(release)
+            with self._lock:
+                # Unless it stopped being watched or was swapped meanwhile
+                if tenant_id in self._releases and self._releases[tenant_id][0] == version:
+                    self._releases[tenant_id] = entry
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="release-watcher", daemon=True)
+                self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Release watcher refresh failed: {e}")
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+# ── Push channel ──────────────────────────────────────────────
+# One watcher task polls the output store and hands each new reading
+# to a Broadcaster, which encodes it once as a server-sent event and
+# fans the same bytes out to every connected client's queue. The
+# watcher only runs while at least one client is connected.
+
+POLL_INTERVAL = 2.0       # seconds between checks of the output store
+HEARTBEAT_INTERVAL = 15.0  # keeps proxies from closing idle streams
+QUEUE_SIZE = 100           # per client; slow clients drop oldest events
+
+
+def format_event(event, data):
+    """Encode one server-sent event."""
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class Broadcaster:
+    def __init__(self, poll, interval=POLL_INTERVAL, queue_size=QUEUE_SIZE):
+        # poll(state) -> (new_state, [(event, data), ...]); it does
+        # blocking I/O, so it runs in a worker thread.
+        self._poll = poll
+        self._interval = interval
+        self._queue_size = queue_size
+        self._subscribers = set()
+        self._last_risk = None
+        self._poll_state = None
+        self._watcher = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self._queue_size)
+        if self._last_risk is not None:
+            # New clients get the current reading straight away
+            queue.put_nowait(self._last_risk)
+        self._subscribers.add(queue)
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.get_running_loop().create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event, data):
+        message = format_event(event, data)
+        if event == "risk":
+            self._last_risk = message
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    async def _watch(self):
+        while self._subscribers:
+            try:
+                state, events = await asyncio.to_thread(self._poll, self._poll_state)
+            except Exception as e:
+                print(f"Risk watcher poll failed: {e}")
+            else:
+                self._poll_state = state
+                for event, data in events:
+                    self.publish(event, data)
+            await asyncio.sleep(self._interval)
+
+
+async def event_stream(queue, heartbeat=HEARTBEAT_INTERVAL):
+    """Yield SSE bytes from a subscriber queue, with keep-alive comments."""
+    while True:
+        try:
+            yield await asyncio.wait_for(queue.get(), timeout=heartbeat)
+        except asyncio.TimeoutError:
+            yield b": keep-alive\n\n"
@@ -1,8 +1,16 @@
 import json
 from src.pipeline.daily_pipeline import main
+from src.pipeline.portfolio import run_portfolio
+from src.utils.tenants import list_tenants
 
 
 def handler(event, context):
+    # Once tenants are registered every run is a portfolio run; an event
+    # with "tenants": [...] runs just those
+    tenant_ids = (event or {}).get("tenants") or list_tenants()
+    if tenant_ids:
+        return portfolio_handler(tenant_ids)
+
     try:
         main()
         return {
@@ -16,3 +24,26 @@ def handler(event, context):
             "statusCode": 500,
             "body": json.dumps(f"Pipeline failed: {str(e)}")
         }
+
+
+def portfolio_handler(tenant_ids):
+    """One daily step for each tenant; 500 if any of them failed."""
+    try:
+        results = run_portfolio(tenant_ids)
+    except Exception as e:
+        print(f"Portfolio failed: {str(e)}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps(f"Portfolio failed: {str(e)}")
+        }
+
+    failed = [r for r in results if r["error"]]
+    for r in failed:
+        print(f"{r['tenant']}: {r['error']}")
+    return {
+        "statusCode": 500 if failed else 200,
+        "body": json.dumps([
+            {"tenant": r["tenant"], "status": r["status"], "processed_date": r["processed_date"], "error": r["error"]}
+            for r in results
+        ], default=str)
+    }
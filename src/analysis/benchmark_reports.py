@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.visualize_results import render_reports, render_report, report_name
+from src.anomaly.residual_anomaly import rolling_z_score_array
+
+# ── Batch report rendering ────────────────────────────────────
+# Renders reports for NUM_SERIES synthetic five-year daily series three
+# times: from scratch, again with nothing changed (every series is
+# skipped by its content hash), and after a new reading changes a few
+# series. A handful of series is also rendered through go.Figure, the
+# way the single-series plots are built, for comparison.
+
+NUM_SERIES = 1000
+NUM_DAYS = 1826
+CHANGED_SERIES = 10
+GO_FIGURE_SAMPLE = 20
+
+
+def make_matrices(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2013-01-01", periods=NUM_DAYS, freq="D").to_numpy().astype("datetime64[D]")
+    weekly = np.where(pd.DatetimeIndex(dates).weekday < 5, 1.05, 0.9)
+    level = rng.uniform(20, 200, size=(NUM_SERIES, 1))
+    demand = (level * weekly * (1 + rng.normal(0, 0.1, (NUM_SERIES, NUM_DAYS)))).round()
+    forecast = np.full(demand.shape, np.nan)
+    forecast[:, 7:] = demand[:, :-7]
+    z = rolling_z_score_array(demand - forecast)
+    series_ids = np.array([f"store-{i:04d}" for i in range(NUM_SERIES)])
+    return series_ids, dates, demand, forecast, z
+
+
+def go_figure_report(path, series_id, dates, demand, forecast, z):
+    import plotly.graph_objects as go
+    demand_figure = go.Figure()
+    demand_figure.add_trace(go.Scatter(x=dates, y=demand, mode="lines", name="Actual Demand"))
+    demand_figure.add_trace(go.Scatter(x=dates, y=forecast, mode="lines", name="Forecast"))
+    flagged = np.abs(np.nan_to_num(z)) >= 2
+    demand_figure.add_trace(go.Scatter(x=dates[flagged], y=demand[flagged], mode="markers",
+                                       name="Anomalies", marker=dict(size=8)))
+    demand_figure.update_layout(title=f"{series_id}: Demand vs Forecast", template="plotly_white")
+    z_figure = go.Figure(go.Scatter(x=dates, y=z, mode="lines", name="Z-Score"))
+    z_figure.add_hline(y=2, line_dash="dash")
+    z_figure.add_hline(y=-2, line_dash="dash")
+    z_figure.update_layout(title=f"{series_id}: Rolling Z-Score", template="plotly_white")
+    path.write_text(demand_figure.to_html(full_html=False, include_plotlyjs=False)
+                    + z_figure.to_html(full_html=False, include_plotlyjs=False))
+
+
+def main():
+    series_ids, dates, demand, forecast, z = make_matrices()
+    report_dir = Path(tempfile.mkdtemp())
+    try:
+        print(f"{NUM_SERIES} series x {NUM_DAYS} days\n")
+        print(f"{'Run':<22} {'Rendered':>9} {'Skipped':>8} {'Seconds':>8} {'Figures/s':>10}")
+
+        def run(name):
+            stats = render_reports(series_ids, dates, demand, forecast, z, report_dir=report_dir)
+            print(f"{name:<22} {stats['rendered']:>9} {stats['skipped']:>8} "
+                  f"{stats['seconds']:>8.2f} {stats['figures_per_second']:>10.0f}")
+            return stats
+
+        first = run("from scratch")
+        assert first["rendered"] == NUM_SERIES
+        assert run("unchanged")["rendered"] == 0
+
+        demand[:CHANGED_SERIES, -1] += 50
+        z[:CHANGED_SERIES] = rolling_z_score_array(demand[:CHANGED_SERIES] - forecast[:CHANGED_SERIES])
+        assert run(f"{CHANGED_SERIES} series changed")["rendered"] == CHANGED_SERIES
+
+        size = sum(p.stat().st_size for p in (report_dir / "series").iterdir()) / NUM_SERIES
+        print(f"\nAverage page size: {size / 1e3:.0f} KB")
+
+        # Single process, no downsampling, dict figures vs go.Figure
+        sample = [(series_ids[i], dates, demand[i], forecast[i], z[i]) for i in range(GO_FIGURE_SAMPLE)]
+        start = time.perf_counter()
+        for args in sample:
+            render_report(report_dir / "sample.html", *args, max_points=NUM_DAYS)
+        dict_seconds = (time.perf_counter() - start) / GO_FIGURE_SAMPLE
+        start = time.perf_counter()
+        for args in sample:
+            go_figure_report(report_dir / "sample.html", *args)
+        go_seconds = (time.perf_counter() - start) / GO_FIGURE_SAMPLE
+        print(f"Per series, one process: dict figures {dict_seconds * 1000:.0f} ms, "
+              f"go.Figure {go_seconds * 1000:.0f} ms ({go_seconds / dict_seconds:.0f}x)")
+        assert (report_dir / "series" / report_name(series_ids[0])).exists()
+    finally:
+        shutil.rmtree(report_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.anomaly.residual_anomaly import rolling_z_score_array
+from src.risk.compute_risk import RISK_LEVELS
+from src.utils.config import REAL_DATA_PATH
+
+# ── Monte Carlo stress test ───────────────────────────────────
+# How often would the pipeline raise HIGH/CRITICAL over the next year
+# under plausible demand? Each path repeats the last 52 weeks of
+# history scaled by a year-over-year log ratio series, drawn either by
+# a moving-block bootstrap of the historical ratios ("bootstrap") or
+# from an AR(1) fitted to them ("parametric"). Every path is prefixed
+# with the last weeks of real history and scored by the pipeline's
+# detector (t-7 seasonal naive + 30-day rolling z-score) as one
+# paths x days array.
+#
+# Paths are generated in fixed-size chunks, each from its own child of
+# one SeedSequence, so results depend only on the seed and the number
+# of paths, never on how many workers ran the chunks.
+
+OUTPUT_DIR = Path("artifacts/stress_test")
+
+NUM_PATHS = 10_000
+HORIZON = 364
+CHUNK_PATHS = 500
+BLOCK_LENGTH = 28
+SEASON_LENGTH = 7
+WINDOW = 30
+YEAR = 364  # whole weeks, so day t and t - YEAR share a weekday
+SEED = 2024
+MAX_WORKERS = os.cpu_count()
+METHODS = ("bootstrap", "parametric")
+
+
+def load_history(path=REAL_DATA_PATH):
+    df = pd.read_csv(path, parse_dates=["date"]).sort_values("date")
+    return df["demand"].to_numpy(dtype=np.float64)
+
+
+def fit_scenarios(demand):
+    """What path generation needs from the history: the last year as a
+    template, the warm-up tail and the year-over-year log ratios."""
+    log_ratios = np.log(demand[YEAR:] / demand[:-YEAR])
+    centered = log_ratios - log_ratios.mean()
+    phi = float(np.corrcoef(centered[1:], centered[:-1])[0, 1])
+    return {
+        "template": demand[-YEAR:],
+        "warmup": demand[-(SEASON_LENGTH + WINDOW - 1):],
+        "log_ratios": log_ratios,
+        "mu": float(log_ratios.mean()),
+        "phi": phi,
+        "sigma": float(centered.std() * np.sqrt(1 - phi * phi)),
+    }
+
+
+# ── Path generation ───────────────────────────────────────────
+def bootstrap_log_ratios(rng, log_ratios, num_paths, horizon, block_length=BLOCK_LENGTH):
+    """Moving-block bootstrap: each path is a run of randomly placed
+    historical blocks, which keeps the ratios' autocorrelation."""
+    num_blocks = -(-horizon // block_length)
+    starts = rng.integers(0, len(log_ratios) - block_length + 1, size=(num_paths, num_blocks))
+    index = (starts[:, :, None] + np.arange(block_length)).reshape(num_paths, -1)
+    return log_ratios[index[:, :horizon]]
+
+
+def ar1_log_ratios(rng, mu, phi, sigma, num_paths, horizon):
+    """AR(1) around mu, started from its stationary distribution."""
+    shocks = rng.normal(0.0, sigma, size=(num_paths, horizon))
+    x = np.empty((num_paths, horizon))
+    x[:, 0] = rng.normal(0.0, sigma / np.sqrt(1 - phi * phi), size=num_paths)
+    for t in range(1, horizon):
+        x[:, t] = phi * x[:, t - 1] + shocks[:, t]
+    return mu + x
+
+
+def simulate_paths(rng, scenarios, method, num_paths, horizon):
+    """(num_paths, horizon) future daily demand."""
+    if method == "bootstrap":
+        log_ratios = bootstrap_log_ratios(rng, scenarios["log_ratios"], num_paths, horizon)
+    else:
+        log_ratios = ar1_log_ratios(rng, scenarios["mu"], scenarios["phi"], scenarios["sigma"],
+                                    num_paths, horizon)
+    template = scenarios["template"][np.arange(horizon) % YEAR]
+    return np.maximum(template * np.exp(log_ratios), 0.0).round()
+
+
+# ── Detector ──────────────────────────────────────────────────
+def risk_codes(paths, warmup):
+    """Risk level code (index into RISK_LEVELS) for every path and day."""
+    demand = np.concatenate([np.broadcast_to(warmup, (len(paths), len(warmup))), paths], axis=1)
+    residuals = demand[:, SEASON_LENGTH:] - demand[:, :-SEASON_LENGTH]
+    z = rolling_z_score_array(residuals, WINDOW)[:, -paths.shape[1]:]
+    return np.searchsorted([1, 2, 3], np.abs(z), side="right")
+
+
+def summarize_paths(codes):
+    """Per path: days at each risk level and the first CRITICAL day
+    (-1 if the path never reaches it)."""
+    counts = np.stack([(codes == k).sum(axis=1) for k in range(len(RISK_LEVELS))], axis=1)
+    critical = codes == len(RISK_LEVELS) - 1
+    first = np.where(critical.any(axis=1), critical.argmax(axis=1), -1)
+    return counts, first
+
+
+def run_chunk(seed_sequence, scenarios, method, num_paths, horizon):
+    """Worker entry point: simulate and score one chunk of paths."""
+    rng = np.random.default_rng(seed_sequence)
+    paths = simulate_paths(rng, scenarios, method, num_paths, horizon)
+    return summarize_paths(risk_codes(paths, scenarios["warmup"]))
+
+
+# ── Runner ────────────────────────────────────────────────────
+def run_stress_test(demand, method="bootstrap", num_paths=NUM_PATHS, horizon=HORIZON,
+                    seed=SEED, chunk_paths=CHUNK_PATHS, max_workers=MAX_WORKERS):
+    """One row per path: days at each risk level and first_critical_day
+    (NaN when the path never reaches CRITICAL)."""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}.")
+    scenarios = fit_scenarios(demand)
+    sizes = [min(chunk_paths, num_paths - i) for i in range(0, num_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(run_chunk, seeds, [scenarios] * len(sizes),
+                                [method] * len(sizes), sizes, [horizon] * len(sizes)))
+
+    counts = np.concatenate([c for c, _ in results])
+    first = np.concatenate([f for _, f in results]).astype(np.float64)
+    paths = pd.DataFrame(counts, columns=[level.lower() for level in RISK_LEVELS])
+    paths["first_critical_day"] = np.where(first < 0, np.nan, first + 1)
+    return paths
+
+
+def summarize(paths, horizon=HORIZON):
+    """Distribution of risk-level days per path and of time to first
+    CRITICAL."""
+    quantiles = [0.05, 0.5, 0.95]
+    rows = []
+    for level in RISK_LEVELS:
+        days = paths[level.lower()]
+        rows.append({"metric": f"{level} days", "mean": days.mean(),
+                     **{f"p{int(q * 100)}": days.quantile(q) for q in quantiles}})
+    first = paths["first_critical_day"]
+    rows.append({"metric": "days to first CRITICAL", "mean": first.mean(),
+                 **{f"p{int(q * 100)}": first.quantile(q) for q in quantiles}})
+    summary = pd.DataFrame(rows)
+    return summary, {
+        "p_any_high_or_critical": float(((paths["high"] + paths["critical"]) > 0).mean()),
+        "p_any_critical": float(first.notna().mean()),
+        "p_critical_within_30d": float((first <= 30).mean()),
+    }
+
+
+def main():
+    demand = load_history()
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    for method in METHODS:
+        start = time.perf_counter()
+        paths = run_stress_test(demand, method)
+        elapsed = time.perf_counter() - start
+        paths.to_parquet(OUTPUT_DIR / f"{method}_paths.parquet", index=False)
+
+        summary, probabilities = summarize(paths)
+        print(f"===== {method}: {len(paths):,} paths x {HORIZON} days "
+              f"({elapsed:.1f} s, {MAX_WORKERS} workers) =====")
+        print(summary.round(1).to_string(index=False))
+        for name, value in probabilities.items():
+            print(f"{name:<26}: {value:.3f}")
+        print()
+
+    # Same seed, different worker counts: results must not change
+    small = dict(num_paths=2 * CHUNK_PATHS + 7, horizon=90)
+    one = run_stress_test(demand, "bootstrap", max_workers=1, **small)
+    many = run_stress_test(demand, "bootstrap", max_workers=4, **small)
+    assert one.equals(many), "results depend on the worker count"
+    print("Reproducible across worker counts: yes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,27 @@
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
 from pathlib import Path
+from src.data.aggregation_cube import AggregationCube, GRAINS, saved_last_date
+from src.risk.compute_risk import assign_risk_array
+from src.utils.risk_store import load_manifest, read_history
 
 
-DATA_PATH = "artifacts/daily_risk_output.csv"
 PLOTS_DIR = Path("artifacts/plots")
 
 
-def load_data():
-    df = pd.read_csv(DATA_PATH)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
+def load_data(start=None, end=None):
+    return read_history(start, end)
 
 
 def plot_demand_vs_forecast(df):
@@ -75,9 +86,210 @@ def plot_zscore(df):
     fig.write_html(PLOTS_DIR / "zscore_over_time.html")
 
 
+# ── Batch reports ─────────────────────────────────────────────
+# Static reports for many series at once (e.g. one per store). Series
+# arrive as key x day matrices and are rendered in chunks by a process
+# pool. Figures are built as plain dicts and serialized without
+# plotly's validation, which is most of the cost of go.Figure. A series
+# is only re-rendered when the hash of its data differs from the one
+# recorded at its last render, and series longer than max_points are
+# min/max downsampled (anomaly markers are always kept). plotly.js is
+# written once and shared by every page.
+#
+#   artifacts/reports/index.html
+#   artifacts/reports/hashes.json
+#   artifacts/reports/plotly.min.js
+#   artifacts/reports/series/<series_id>.html
+
+REPORTS_DIR = Path("artifacts/reports")
+REPORT_VERSION = 1  # bump when the page layout changes to re-render everything
+MAX_POINTS = 1000
+CHUNK_SIZE = 50
+MAX_WORKERS = os.cpu_count()
+ANOMALY_THRESHOLD = 2
+
+_TEMPLATE = pio.templates["plotly_white"].to_plotly_json()
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<script src="../plotly.min.js"></script></head>
+<body style="font-family:sans-serif">
+<p><a href="../index.html">All series</a></p>
+{figures}
+</body></html>"""
+
+
+def report_name(series_id):
+    return re.sub(r"[^\w.-]", "_", str(series_id)) + ".html"
+
+
+def downsample(values, max_points=MAX_POINTS):
+    """Indices keeping the smallest and largest value of each of
+    max_points / 2 equal buckets, so peaks survive the thinning."""
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max_points // 2
+    bucket = np.arange(n) * buckets // n
+    missing = np.isnan(values)
+    # Within each bucket, sort ascending for the min and descending for the max
+    lowest = np.lexsort((np.where(missing, np.inf, values), bucket))
+    highest = np.lexsort((np.where(missing, np.inf, -values), bucket))
+    starts = np.searchsorted(bucket, np.arange(buckets))
+    return np.union1d(lowest[starts], highest[starts])
+
+
+def _figure_html(div_id, data, layout):
+    figure = {"data": data, "layout": {"template": _TEMPLATE, "height": 420, **layout}}
+    return pio.to_html(figure, full_html=False, include_plotlyjs=False,
+                       validate=False, div_id=div_id)
+
+
+def render_report(path, series_id, dates, demand, forecast, z, max_points=MAX_POINTS):
+    """Write one series' page: demand vs forecast with anomalies, and
+    the rolling z-score."""
+    keep = downsample(demand, max_points)
+    z_keep = downsample(z, max_points)
+    anomalies = np.flatnonzero(np.abs(np.nan_to_num(z)) >= ANOMALY_THRESHOLD)
+    slug = path.stem
+
+    demand_figure = _figure_html(f"{slug}-demand", [
+        {"type": "scatter", "mode": "lines", "name": "Actual Demand",
+         "x": dates[keep], "y": demand[keep]},
+        {"type": "scatter", "mode": "lines", "name": "Forecast",
+         "x": dates[keep], "y": forecast[keep]},
+        {"type": "scatter", "mode": "markers", "name": "Anomalies", "marker": {"size": 8},
+         "x": dates[anomalies], "y": demand[anomalies]},
+    ], {"title": {"text": f"{series_id}: Demand vs Forecast"},
+        "xaxis": {"title": {"text": "Date"}}, "yaxis": {"title": {"text": "Demand"}}})
+
+    threshold = {"type": "line", "xref": "paper", "x0": 0, "x1": 1,
+                 "line": {"dash": "dash"}}
+    z_figure = _figure_html(f"{slug}-z", [
+        {"type": "scatter", "mode": "lines", "name": "Z-Score",
+         "x": dates[z_keep], "y": z[z_keep]},
+    ], {"title": {"text": f"{series_id}: Rolling Z-Score"},
+        "xaxis": {"title": {"text": "Date"}}, "yaxis": {"title": {"text": "Z-Score"}},
+        "shapes": [{**threshold, "y0": y, "y1": y}
+                   for y in (ANOMALY_THRESHOLD, -ANOMALY_THRESHOLD)]})
+
+    page = PAGE.format(title=html.escape(str(series_id)), figures=demand_figure + z_figure)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(page, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _render_chunk(chunk, series_dir, max_points):
+    """Worker entry point: render every series in one chunk."""
+    for series_id, dates, demand, forecast, z in chunk:
+        render_report(series_dir / report_name(series_id), series_id, dates,
+                      demand, forecast, z, max_points)
+    return len(chunk)
+
+
+def series_hashes(series_ids, dates, demand, forecast, z):
+    """Content hash per series (row) of the input matrices."""
+    header = f"{REPORT_VERSION}|{dates[0]}|{dates[-1]}|".encode("utf-8")
+    return {
+        str(sid): hashlib.blake2b(
+            header + demand[i].tobytes() + forecast[i].tobytes() + z[i].tobytes(),
+            digest_size=16,
+        ).hexdigest()
+        for i, sid in enumerate(series_ids)
+    }
+
+
+def write_index(report_dir, series_ids, dates, z):
+    """index.html: every series with its latest reading, most extreme first."""
+    latest = z[:, -1]
+    anomalies = (np.abs(np.nan_to_num(z)) >= ANOMALY_THRESHOLD).sum(axis=1)
+    risk = np.where(np.isnan(latest), "-", assign_risk_array(latest))
+    order = np.argsort(-np.abs(np.nan_to_num(latest)), kind="stable")
+
+    rows = "\n".join(
+        f'<tr><td><a href="series/{report_name(series_ids[i])}">{html.escape(str(series_ids[i]))}</a></td>'
+        f"<td>{risk[i]}</td><td>{latest[i]:.2f}</td><td>{anomalies[i]}</td></tr>"
+        for i in order
+    )
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Risk reports</title></head>
+<body style="font-family:sans-serif">
+<h2>Risk reports: {len(series_ids)} series, {pd.Timestamp(dates[0]).date()} to {pd.Timestamp(dates[-1]).date()}</h2>
+<table cellpadding="4">
+<tr><th>Series</th><th>Latest risk</th><th>Latest z</th><th>Anomalies</th></tr>
+{rows}
+</table>
+</body></html>"""
+    (report_dir / "index.html").write_text(page, encoding="utf-8")
+
+
+def render_reports(series_ids, dates, demand, forecast, z, report_dir=REPORTS_DIR,
+                   max_points=MAX_POINTS, chunk_size=CHUNK_SIZE, max_workers=MAX_WORKERS):
+    """Render a report per row of the (series x day) demand, forecast
+    and z matrices, skipping series whose data hasn't changed.
+
+    Returns run statistics.
+    """
+    series_dir = report_dir / "series"
+    series_dir.mkdir(parents=True, exist_ok=True)
+    plotly_js = report_dir / "plotly.min.js"
+    if not plotly_js.exists():
+        plotly_js.write_text(get_plotlyjs(), encoding="utf-8")
+
+    hashes_path = report_dir / "hashes.json"
+    previous = json.loads(hashes_path.read_text()) if hashes_path.exists() else {}
+    hashes = series_hashes(series_ids, dates, demand, forecast, z)
+    todo = [
+        i for i, sid in enumerate(series_ids)
+        if previous.get(str(sid)) != hashes[str(sid)]
+        or not (series_dir / report_name(sid)).exists()
+    ]
+
+    start = time.perf_counter()
+    chunks = [
+        [(series_ids[i], dates, demand[i], forecast[i], z[i]) for i in todo[k:k + chunk_size]]
+        for k in range(0, len(todo), chunk_size)
+    ]
+    rendered = 0
+    if chunks:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            futures = [pool.submit(_render_chunk, chunk, series_dir, max_points) for chunk in chunks]
+            for future in as_completed(futures):
+                rendered += future.result()
+
+    write_index(report_dir, series_ids, dates, z)
+    hashes_path.write_text(json.dumps(hashes, indent=0), encoding="utf-8")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "series": len(series_ids),
+        "rendered": rendered,
+        "skipped": len(series_ids) - rendered,
+        "figures": 2 * rendered,
+        "seconds": elapsed,
+        "figures_per_second": 2 * rendered / elapsed if elapsed else 0.0,
+    }
+
+
+def build_level_reports(level="store", report_dir=None, **kwargs):
+    """Daily reports for every member of a hierarchy level, from the
+    saved aggregation cube."""
+    cube = AggregationCube.load()
+    table = cube.tables[(level, "D")]
+    n = table.num_periods
+    dates = pd.period_range(
+        start=pd.Period(ordinal=table.first_ordinal, freq=GRAINS["D"][0]), periods=n,
+    ).to_timestamp().to_numpy().astype("datetime64[D]")
+    demand = table.demand[:, :n]
+    return render_reports(
+        np.array(table.keys), dates, demand, demand - table.residual[:, :n], table.z[:, :n],
+        report_dir=report_dir or REPORTS_DIR / level, **kwargs,
+    )
+
+
 def main():
-    if not Path(DATA_PATH).exists():
-        raise FileNotFoundError("daily_risk_output.csv not found.")
+    if load_manifest() is None:
+        raise FileNotFoundError("Risk history not found. Run the pipeline first.")
 
     PLOTS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -88,6 +300,11 @@ def main():
 
     print("Visualization files generated successfully.")
 
+    if saved_last_date() is not None:
+        stats = build_level_reports("store")
+        print(f"Store reports: {stats['rendered']} rendered, {stats['skipped']} unchanged "
+              f"({REPORTS_DIR / 'store' / 'index.html'})")
+
 
 if __name__ == "__main__":
     main()
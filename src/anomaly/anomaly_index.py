@@ -0,0 +1,424 @@
+import heapq
+import json
+import time
+import uuid
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from src.risk.compute_risk import RISK_LEVELS
+from src.utils.config import DEFAULT_SERIES_ID
+from src.utils.schema import apply_schema, SCORED_SCHEMA
+from src.utils.risk_store import read_history, READ_ATTEMPTS
+from src.utils.storage import get_bytes, put_bytes, update_bytes, delete_key, list_keys, object_version
+
+# ── Anomaly index ─────────────────────────────────────────────
+# Every anomaly (|z| >= 2) across all series, kept so the API never
+# filters the full history. Rows are stored in arrival order and
+# referenced by row id from three sorted orders:
+#
+#   by date           - a max segment tree over |z| in this order gives
+#                       the top-K most severe anomalies in a date range
+#   by (series, date) - per-series counts and ranges by binary search
+#   by (risk, date)   - latest N per risk level
+#
+# New rows are merged into each order with sorted inserts, and only the
+# part of the segment tree after the first inserted position is rebuilt,
+# so the daily append is cheap.
+#
+# In storage the index is a base snapshot plus one small delta per run
+# or ingest batch that found anomalies. The base lists the delta keys it
+# has absorbed, and loading applies every other delta; a delta's key
+# says nothing about whether it is in the base, since a writer's put can
+# land after a compaction that started later. Once COMPACT_DELTAS pile
+# up they are folded into a new base and only the deltas it lists are
+# deleted, so the full index is rewritten about monthly rather than
+# every day. Each delta also rewrites a small marker object, so readers
+# notice a change with two HEAD requests instead of a listing.
+#
+#   anomalies/index.npz
+#   anomalies/latest_delta.json
+#   anomalies/deltas/01700000000000000000-1a2b3c4d.parquet
+
+ANOMALY_INDEX_KEY = "anomalies/index.npz"
+DELTA_MARKER_KEY = "anomalies/latest_delta.json"
+DELTA_PREFIX = "anomalies/deltas/"
+COMPACT_DELTAS = 30
+
+EPOCH = pd.Timestamp("1970-01-01")
+COLUMNS = ("day", "series", "z_score", "risk", "demand", "forecast")
+
+
+def _composite(group, day):
+    """Sort key for (group, day): group in the high 32 bits."""
+    return (np.asarray(group, dtype=np.int64) << 32) | np.asarray(day, dtype=np.int64)
+
+
+class _SortedKeys:
+    """Row ids kept sorted by an int64 key; ties keep insertion order."""
+
+    def __init__(self, keys=None, ids=None):
+        self.keys = np.zeros(0, dtype=np.int64) if keys is None else keys
+        self.ids = np.zeros(0, dtype=np.int64) if ids is None else ids
+
+    def insert(self, keys, ids):
+        """Insert a batch; returns the first position that changed."""
+        order = np.argsort(keys, kind="stable")
+        keys, ids = keys[order], ids[order]
+        pos = np.searchsorted(self.keys, keys, side="right")
+        self.keys = np.insert(self.keys, pos, keys)
+        self.ids = np.insert(self.ids, pos, ids)
+        return int(pos[0]) if len(pos) else len(self.keys)
+
+    def span(self, lo_key, hi_key):
+        """Positions [start, stop) of keys in [lo_key, hi_key]."""
+        return (int(np.searchsorted(self.keys, lo_key, side="left")),
+                int(np.searchsorted(self.keys, hi_key, side="right")))
+
+
+class AnomalyIndex:
+    def __init__(self):
+        self.series_ids = []
+        self.series_index = {}
+        self.day = np.zeros(0, dtype=np.int64)
+        self.series = np.zeros(0, dtype=np.int64)
+        self.z_score = np.zeros(0)
+        self.risk = np.zeros(0, dtype=np.int64)
+        self.demand = np.zeros(0)
+        self.forecast = np.zeros(0)
+        self.by_date = _SortedKeys()
+        self.by_series = _SortedKeys()
+        self.by_risk = _SortedKeys()
+        self._capacity = 0
+        # Delta keys folded into this index (its stored base's, once saved)
+        self.applied = set()
+        self._build_tree()
+
+    def __len__(self):
+        return len(self.day)
+
+    # ── Segment tree over |z| in date order ───────────────────
+    def _build_tree(self):
+        capacity = 1
+        while capacity < len(self):
+            capacity *= 2
+        self._capacity = capacity
+        # Nodes hold date-order positions; -1 (empty) reads values[-1] = -inf
+        self._tree = np.full(2 * capacity, -1, dtype=np.int64)
+        self._values = np.full(capacity + 1, -np.inf)
+        self._update_tree(0)
+
+    def _update_tree(self, first):
+        n = len(self)
+        if n > self._capacity:
+            return self._build_tree()
+        if first >= n:
+            return
+        cap = self._capacity
+        self._values[first:n] = np.abs(self.z_score[self.by_date.ids[first:n]])
+        self._tree[cap + first:cap + n] = np.arange(first, n)
+
+        lo, hi = (cap + first) // 2, (cap + n - 1) // 2 + 1
+        while lo >= 1:
+            left, right = self._tree[2 * lo:2 * hi:2], self._tree[2 * lo + 1:2 * hi:2]
+            self._tree[lo:hi] = np.where(self._values[left] >= self._values[right], left, right)
+            lo, hi = lo // 2, (hi - 1) // 2 + 1
+
+    def _range_argmax(self, lo, hi):
+        """Date-order position of the largest |z| in [lo, hi), or -1."""
+        best = -1
+        lo += self._capacity
+        hi += self._capacity
+        while lo < hi:
+            if lo & 1:
+                if self._values[self._tree[lo]] > self._values[best]:
+                    best = self._tree[lo]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                if self._values[self._tree[hi]] > self._values[best]:
+                    best = self._tree[hi]
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    # ── Maintenance ───────────────────────────────────────────
+    def extend(self, scored):
+        """Add the anomalies in a frame of scored rows.
+
+        Needs date, z_score, risk_level, demand and forecast, and
+        optionally series_id and anomaly_flag. Rows already indexed (same
+        series and date) are skipped, so re-running a day is harmless.
+        Returns the number of anomalies added.
+        """
+        if "anomaly_flag" in scored:
+            scored = scored[scored["anomaly_flag"] == 1]
+        else:
+            scored = scored[scored["z_score"].abs() >= 2]
+        if scored.empty:
+            return 0
+
+        if "series_id" in scored:
+            series_ids = scored["series_id"].astype(str).to_numpy()
+        else:
+            series_ids = np.full(len(scored), DEFAULT_SERIES_ID)
+        for sid in pd.unique(series_ids):
+            if sid not in self.series_index:
+                self.series_index[sid] = len(self.series_ids)
+                self.series_ids.append(sid)
+        series = np.array([self.series_index[sid] for sid in series_ids], dtype=np.int64)
+        day = pd.to_datetime(scored["date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+        # Skip (series, date) pairs already indexed or repeated in the batch
+        key = _composite(series, day)
+        new = np.zeros(len(key), dtype=bool)
+        new[np.unique(key, return_index=True)[1]] = True
+        existing = self.by_series.keys
+        if len(existing):
+            pos = np.minimum(np.searchsorted(existing, key), len(existing) - 1)
+            new &= existing[pos] != key
+        if not new.any():
+            return 0
+
+        risk = pd.Categorical(scored["risk_level"], categories=RISK_LEVELS).codes
+        columns = {
+            "day": day,
+            "series": series,
+            "z_score": scored["z_score"].to_numpy(dtype=np.float64),
+            "risk": risk.astype(np.int64),
+            "demand": scored["demand"].to_numpy(dtype=np.float64),
+            "forecast": scored["forecast"].to_numpy(dtype=np.float64),
+        }
+        ids = np.arange(len(self), len(self) + int(new.sum()))
+        for name, values in columns.items():
+            setattr(self, name, np.concatenate([getattr(self, name), values[new]]))
+
+        first_changed = self.by_date.insert(self.day[ids], ids)
+        self.by_series.insert(_composite(self.series[ids], self.day[ids]), ids)
+        self.by_risk.insert(_composite(self.risk[ids], self.day[ids]), ids)
+        self._update_tree(first_changed)
+        return len(ids)
+
+    # ── Queries ───────────────────────────────────────────────
+    def _series_code(self, series_id):
+        if series_id not in self.series_index:
+            raise KeyError(f"No anomalies for series '{series_id}'.")
+        return self.series_index[series_id]
+
+    @staticmethod
+    def _day_bounds(start, end):
+        """Inclusive day numbers for a date range (open ends allowed)."""
+        lo = 0 if start is None else (pd.Timestamp(start) - EPOCH).days
+        hi = (1 << 31) - 1 if end is None else (pd.Timestamp(end) - EPOCH).days
+        return lo, hi
+
+    def top_k(self, k=10, start=None, end=None, series_id=None):
+        """The k most severe anomalies (largest |z|) with start <= date <= end."""
+        lo_day, hi_day = self._day_bounds(start, end)
+        if series_id is not None:
+            code = self._series_code(series_id)
+            lo, hi = self.by_series.span(_composite(code, lo_day), _composite(code, hi_day))
+            ids = self.by_series.ids[lo:hi]
+            if len(ids) > k:
+                ids = ids[np.argpartition(-np.abs(self.z_score[ids]), k - 1)[:k]]
+            return self._frame(ids[np.argsort(-np.abs(self.z_score[ids]), kind="stable")])
+
+        lo, hi = self.by_date.span(lo_day, hi_day)
+        # Best-first search: pop the range holding the largest |z|, then
+        # split it around that position
+        heap = []
+
+        def push(lo, hi):
+            if lo < hi:
+                best = self._range_argmax(lo, hi)
+                heapq.heappush(heap, (-self._values[best], best, lo, hi))
+
+        push(lo, hi)
+        positions = []
+        while heap and len(positions) < k:
+            _, best, lo, hi = heapq.heappop(heap)
+            positions.append(best)
+            push(lo, best)
+            push(best + 1, hi)
+        return self._frame(self.by_date.ids[np.array(positions, dtype=np.int64)])
+
+    def latest(self, n=10, risk_levels=None, series_id=None):
+        """The n most recent anomalies, optionally only some risk levels
+        and/or one series."""
+        if series_id is not None:
+            code = self._series_code(series_id)
+            lo, hi = self.by_series.span(_composite(code, 0), _composite(code + 1, 0) - 1)
+            ids = self.by_series.ids[lo:hi]
+            if risk_levels is not None:
+                ids = ids[np.isin(RISK_LEVELS[self.risk[ids]], risk_levels)]
+            ids = ids[-n:]
+        elif risk_levels is None:
+            ids = self.by_date.ids[-n:] if n else self.by_date.ids[:0]
+        else:
+            # Latest n of each level, then the latest n of those
+            tails = []
+            for level in risk_levels:
+                code = int(np.flatnonzero(RISK_LEVELS == level)[0])
+                lo, hi = self.by_risk.span(_composite(code, 0), _composite(code + 1, 0) - 1)
+                tails.append(self.by_risk.ids[max(lo, hi - n):hi])
+            ids = np.concatenate(tails) if tails else np.zeros(0, dtype=np.int64)
+            ids = ids[np.argsort(self.day[ids], kind="stable")][-n:] if n else ids[:0]
+        return self._frame(ids[::-1])
+
+    def counts(self, start=None, end=None, series_ids=None):
+        """Anomaly count per series with start <= date <= end."""
+        lo_day, hi_day = self._day_bounds(start, end)
+        if series_ids is None:
+            series_ids = self.series_ids
+        codes = np.array([self._series_code(sid) for sid in series_ids], dtype=np.int64)
+        lo = np.searchsorted(self.by_series.keys, _composite(codes, lo_day), side="left")
+        hi = np.searchsorted(self.by_series.keys, _composite(codes, hi_day), side="right")
+        return pd.DataFrame({"series_id": list(series_ids), "anomalies": hi - lo})
+
+    def frame(self):
+        """Every indexed anomaly in date order, as a delta is stored."""
+        df = self._frame(self.by_date.ids)
+        df["anomaly_flag"] = 1
+        return df
+
+    def _frame(self, ids):
+        return apply_schema(pd.DataFrame({
+            "series_id": np.array(self.series_ids, dtype=object)[self.series[ids]]
+            if len(self.series_ids) else np.array([], dtype=object),
+            "date": self.day[ids].astype("datetime64[D]").astype("datetime64[ns]"),
+            "demand": self.demand[ids],
+            "forecast": self.forecast[ids],
+            "z_score": self.z_score[ids],
+            "risk_level": RISK_LEVELS[self.risk[ids]],
+        }), SCORED_SCHEMA)
+
+    # ── Persistence ───────────────────────────────────────────
+    def to_bytes(self):
+        buffer = BytesIO()
+        np.savez(
+            buffer,
+            series_ids=np.array(self.series_ids, dtype=str),
+            applied=np.array(sorted(self.applied), dtype=str),
+            **{name: getattr(self, name) for name in COLUMNS},
+            **{f"{name}_{part}": getattr(getattr(self, name), part)
+               for name in ("by_date", "by_series", "by_risk") for part in ("keys", "ids")},
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, body):
+        data = np.load(BytesIO(body))
+        index = cls()
+        index.series_ids = data["series_ids"].tolist()
+        index.series_index = {sid: i for i, sid in enumerate(index.series_ids)}
+        if "applied" in data:
+            index.applied = set(data["applied"].tolist())
+        for name in COLUMNS:
+            setattr(index, name, data[name])
+        for name in ("by_date", "by_series", "by_risk"):
+            setattr(index, name, _SortedKeys(data[f"{name}_keys"], data[f"{name}_ids"]))
+        index._build_tree()
+        return index
+
+
+# ── Storage ───────────────────────────────────────────────────
+def _read_delta(body):
+    return pd.read_parquet(BytesIO(body))
+
+
+def _apply_deltas(index, keys):
+    """Extend index with the deltas in keys it hasn't absorbed. Returns
+    False if one of them has been deleted. Applying a delta twice is
+    harmless (extend skips indexed rows)."""
+    for key in sorted(keys):
+        if key in index.applied:
+            continue
+        body = get_bytes(key)
+        if body is None:
+            return False
+        index.extend(_read_delta(body))
+        index.applied.add(key)
+    return True
+
+
+def anomaly_index_version():
+    """Cheap change marker for the stored index, or None if there is
+    nothing stored."""
+    base, marker = object_version(ANOMALY_INDEX_KEY), object_version(DELTA_MARKER_KEY)
+    return None if base is None and marker is None else (base, marker)
+
+
+def load_anomaly_index():
+    """The stored base with its outstanding deltas applied.
+
+    If a compaction swaps the base while the deltas are being read (and
+    so may delete some of them), the read starts over.
+    """
+    for _ in range(READ_ATTEMPTS):
+        version = object_version(ANOMALY_INDEX_KEY)
+        body = get_bytes(ANOMALY_INDEX_KEY)
+        index = AnomalyIndex() if body is None else AnomalyIndex.from_bytes(body)
+        if _apply_deltas(index, list_keys(DELTA_PREFIX)) and object_version(ANOMALY_INDEX_KEY) == version:
+            return index
+    raise RuntimeError("Anomaly index was compacted on every read attempt.")
+
+
+def compact_anomaly_index():
+    """Fold the outstanding deltas into the base, then delete the ones
+    it lists."""
+    def fold(body):
+        index = AnomalyIndex() if body is None else AnomalyIndex.from_bytes(body)
+        keys = set(list_keys(DELTA_PREFIX))
+        # Deleted deltas need no tracking; a delta is never rewritten
+        index.applied &= keys
+        if not keys - index.applied:
+            return None
+        # A delta deleted meanwhile was folded by another compaction,
+        # which leaves nothing to do
+        if not _apply_deltas(index, keys):
+            return None
+        return index.to_bytes()
+
+    body = update_bytes(ANOMALY_INDEX_KEY, fold)
+    applied = AnomalyIndex.from_bytes(body).applied if body else set()
+    # Only delete deltas once the base holds them
+    for key in list_keys(DELTA_PREFIX):
+        if key in applied:
+            delete_key(key)
+
+
+def update_anomaly_index(scored):
+    """Store scored rows' anomalies as a new delta (safe to run
+    concurrently and to repeat), compacting once enough have piled up."""
+    delta = AnomalyIndex()
+    if not delta.extend(scored):
+        return
+    buffer = BytesIO()
+    delta.frame().to_parquet(buffer, index=False)
+    # Zero-padded nanoseconds keep delta keys roughly in arrival order;
+    # the suffix keeps writers on different hosts apart
+    key = f"{DELTA_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+    put_bytes(key, buffer.getvalue())
+    put_bytes(DELTA_MARKER_KEY, json.dumps({"key": key}))
+    if len(list_keys(DELTA_PREFIX)) >= COMPACT_DELTAS:
+        compact_anomaly_index()
+
+
+def main():
+    """Rebuild the index from the stored risk history, folding in any
+    outstanding deltas (ingested anomalies aren't in the history)."""
+    index = AnomalyIndex()
+    history = read_history()
+    if history is not None:
+        index.extend(history)
+    keys = list_keys(DELTA_PREFIX)
+    _apply_deltas(index, keys)
+    put_bytes(ANOMALY_INDEX_KEY, index.to_bytes())
+    for key in index.applied:
+        delete_key(key)
+    print(f"Anomaly index rebuilt: {len(index)} anomalies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.anomaly.anomaly_index import AnomalyIndex
+from src.risk.compute_risk import assign_risk_array
+
+# ── Anomaly index vs full-history filtering ───────────────────
+# NUM_SERIES x NUM_DAYS scored rows (10M). Each query is answered from
+# the index and by filtering the scored frame the way /anomalies used
+# to, and the answers are checked to match.
+
+NUM_SERIES = 5000
+NUM_DAYS = 2000
+REPEATS = 20
+
+
+def make_scored(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2012-01-01", periods=NUM_DAYS, freq="D")
+    z = rng.standard_t(5, size=NUM_SERIES * NUM_DAYS)
+    demand = rng.uniform(50, 150, size=len(z)).round()
+    scored = pd.DataFrame({
+        "series_id": np.repeat([f"s{i:05d}" for i in range(NUM_SERIES)], NUM_DAYS),
+        "date": np.tile(dates, NUM_SERIES),
+        "demand": demand,
+        "forecast": demand - z * 10,
+        "z_score": z,
+        "risk_level": assign_risk_array(z),
+    })
+    scored["anomaly_flag"] = (scored["z_score"].abs() >= 2).astype(int)
+    return scored
+
+
+def timed(fn, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    scored = make_scored()
+    print(f"Scored rows: {len(scored):,}")
+
+    last_day = scored["date"].max()
+    index = AnomalyIndex()
+    start = time.perf_counter()
+    index.extend(scored[scored["date"] < last_day])
+    print(f"Index build        : {time.perf_counter() - start:.1f} s ({len(index):,} anomalies)")
+    start = time.perf_counter()
+    index.extend(scored[scored["date"] == last_day])
+    print(f"Daily append       : {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start_date, end_date = last_day - pd.Timedelta(days=89), last_day
+
+    # The old way: filter the full scored history on every request
+    def anomalies(start=None, end=None):
+        a = scored[scored["anomaly_flag"] == 1]
+        if start is not None:
+            a = a[(a["date"] >= start) & (a["date"] <= end)]
+        return a
+
+    def most_severe(a, k):
+        return a.loc[a["z_score"].abs().nlargest(k).index]
+
+    queries = {
+        "top-10 in 90 days": (
+            lambda: index.top_k(10, start_date, end_date),
+            lambda: most_severe(anomalies(start_date, end_date), 10),
+        ),
+        "latest 20 CRITICAL": (
+            lambda: index.latest(20, ["CRITICAL"]),
+            lambda: anomalies().loc[lambda a: a["risk_level"] == "CRITICAL"]
+            .sort_values("date", kind="stable").tail(20),
+        ),
+        "top-10 for a series": (
+            lambda: index.top_k(10, series_id="s01234"),
+            lambda: most_severe(anomalies().loc[lambda a: a["series_id"] == "s01234"], 10),
+        ),
+        "counts, all series": (
+            lambda: index.counts(start_date, end_date),
+            lambda: anomalies(start_date, end_date).groupby("series_id").size(),
+        ),
+    }
+
+    print(f"\n{'Query':<22} {'Index':>10} {'Filter':>10} {'Speedup':>9}")
+    for name, (from_index, from_frame) in queries.items():
+        indexed, index_ms = timed(from_index)
+        filtered, filter_ms = timed(from_frame, repeats=3)
+        if name.startswith("counts"):
+            expected = filtered.reindex(indexed["series_id"], fill_value=0).to_numpy()
+            assert (indexed["anomalies"].to_numpy() == expected).all()
+        else:
+            assert np.allclose(np.sort(np.abs(indexed["z_score"])), np.sort(np.abs(filtered["z_score"])))
+        print(f"{name:<22} {index_ms:>8.2f} ms {filter_ms:>7.0f} ms {filter_ms / index_ms:>8,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import bisect
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from src.anomaly.quantile_sketch import TailDigest
+from src.risk.compute_risk import assign_tail_risk_array
+
+# ── Quantile sketch ───────────────────────────────────────────
+# Compares the TailDigest against keeping each series' raw window: a
+# deque of the last `window` residuals plus a sorted copy to rank
+# against. Reports memory and persisted state per series at several
+# window sizes, update cost per point, and the digest's accuracy
+# against the exact exponentially weighted tail probability it
+# approximates (max abs error and risk-level agreement). Residuals are
+# skewed and heavy-tailed, like the real ones.
+
+WINDOWS = [365, 1095, 3650]
+ACCURACY_POINTS = 6000
+NUM_SERIES = 1000
+
+
+def residuals(rng, n):
+    noise = rng.standard_t(3, n) * 300
+    spikes = rng.lognormal(6, 1, n) * (rng.random(n) < 0.05)
+    return noise + spikes
+
+
+class RawWindow:
+    """Exact tail probabilities over the last `window` points."""
+
+    def __init__(self, window):
+        self.values = deque(maxlen=window)
+        self.ordered = []
+
+    def update(self, x):
+        n = len(self.ordered)
+        p = np.nan
+        if n:
+            below = bisect.bisect_left(self.ordered, x)
+            below += (bisect.bisect_right(self.ordered, x) - below) / 2
+            p = min(1.0, 2 * min(below + 1, n - below + 1) / (n + 1))
+        if len(self.values) == self.values.maxlen:
+            del self.ordered[bisect.bisect_left(self.ordered, self.values[0])]
+        self.values.append(x)
+        bisect.insort(self.ordered, x)
+        return p
+
+    def nbytes(self):
+        # As float64 arrays: the window and its sorted copy
+        return 16 * len(self.values)
+
+    def state(self):
+        return json.dumps(list(self.values))
+
+
+def exact_tail_probabilities(values, window, min_points):
+    """What TailDigest estimates, computed exactly: each point ranked
+    against every point before it, weighted by decay ** age."""
+    decay = 1 - 1 / window
+    out = np.full(len(values), np.nan)
+    for i in range(min_points, len(values)):
+        weights = decay ** np.arange(i - 1, -1, -1)
+        before = values[:i]
+        below = weights[before < values[i]].sum() + weights[before == values[i]].sum() / 2
+        n = weights.sum()
+        out[i] = min(1.0, 2 * min(below + 1, n - below + 1) / (n + 1))
+    return out
+
+
+def timed_updates(model, values):
+    start = time.perf_counter()
+    for x in values:
+        model.update(x)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'Window':>7} {'Digest':>8} {'Raw':>8} {'Digest state':>13} {'Raw state':>10} "
+          f"{'Digest update':>14} {'Raw update':>11}")
+    for window in WINDOWS:
+        values = residuals(rng, 3 * window)
+        digest, raw = TailDigest(window=window), RawWindow(window)
+        digest_us, raw_us = timed_updates(digest, values), timed_updates(raw, values)
+        digest_state = len(json.dumps(digest.to_dict()))
+        print(f"{window:>7} {digest.nbytes() / 1024:>6.1f} KB {raw.nbytes() / 1024:>5.1f} KB "
+              f"{digest_state / 1024:>10.1f} KB {len(raw.state()) / 1024:>7.1f} KB "
+              f"{digest_us:>11.1f} us {raw_us:>8.1f} us")
+
+    digest = TailDigest()
+    digest.score(residuals(rng, 3 * digest.window))
+    raw = RawWindow(digest.window)
+    for x in residuals(rng, digest.window):
+        raw.update(x)
+    print(f"\n{NUM_SERIES:,} series, window {digest.window}: "
+          f"{NUM_SERIES * digest.nbytes() / 2**20:.1f} MB as digests, "
+          f"{NUM_SERIES * raw.nbytes() / 2**20:.1f} MB as raw windows")
+
+    values = residuals(rng, ACCURACY_POINTS)
+    digest = TailDigest()
+    estimated = digest.score(values)
+    exact = exact_tail_probabilities(values, digest.window, digest.min_points)
+    scored = ~np.isnan(exact)
+    assert np.array_equal(scored, ~np.isnan(estimated))
+    error = np.abs(estimated[scored] - exact[scored])
+    agreement = np.mean(assign_tail_risk_array(estimated[scored]) == assign_tail_risk_array(exact[scored]))
+    print(f"\nAccuracy over {ACCURACY_POINTS:,} points against the exact decayed distribution")
+    print(f"  max abs error of tail probability : {error.max():.4f}")
+    print(f"  mean abs error                    : {error.mean():.5f}")
+    print(f"  risk level agreement              : {agreement:.1%}")
+    assert agreement > 0.99
+
+
+if __name__ == "__main__":
+    main()
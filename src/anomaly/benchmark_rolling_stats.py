@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.anomaly.residual_anomaly import compute_rolling_z_score
+from src.anomaly.rolling_stats import QUANTILES, WINDOWS, quantile_stat, rolling_stats, rolling_stats_array
+
+# ── Multi-window rolling stats ────────────────────────────────
+# Times every stat for WINDOWS in one rolling_stats call against the
+# current way: compute_rolling_z_score once per window (a frame copy and
+# a fresh rolling mean and std each time) plus pandas' rolling min, max
+# and quantiles, for one long series and for a panel of series. Both
+# must give the same values.
+
+SERIES_LENGTHS = [10_000, 1_000_000]
+PANEL_SERIES = 500
+PANEL_DAYS = 1826
+
+
+def per_window(df):
+    """The stats, one window at a time, the way the pipeline would get
+    them today."""
+    out = {}
+    for w in WINDOWS:
+        scored = compute_rolling_z_score(df, window=w)
+        rolling = df["residual"].rolling(w)
+        out[f"mean_{w}"] = scored["rolling_mean"]
+        out[f"std_{w}"] = scored["rolling_std"]
+        out[f"z_{w}"] = scored["z_score"]
+        out[f"min_{w}"] = rolling.min()
+        out[f"max_{w}"] = rolling.max()
+        for q in QUANTILES:
+            out[f"{quantile_stat(q)}_{w}"] = rolling.quantile(q)
+    return out
+
+
+def per_window_panel(df):
+    out = {f"z_{w}": [] for w in WINDOWS}
+    for _, series in df.groupby("series_id", sort=False):
+        for w in WINDOWS:
+            out[f"z_{w}"].append(compute_rolling_z_score(series, window=w)["z_score"])
+    return {name: pd.concat(parts) for name, parts in out.items()}
+
+
+def check(expected, got):
+    for name, values in expected.items():
+        a, b = np.asarray(values, dtype=np.float64), np.asarray(got[name], dtype=np.float64)
+        assert np.array_equal(np.isnan(a), np.isnan(b)), f"{name}: NaNs differ"
+        assert np.allclose(a, b, rtol=1e-7, atol=1e-7, equal_nan=True), f"{name} differs"
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"Windows {', '.join(map(str, WINDOWS))}: mean, std, z, min, max and "
+          f"{len(QUANTILES)} quantiles each\n")
+    print(f"{'Rows':>10} {'Per window':>11} {'One pass':>9} {'Speedup':>8}")
+    for n in SERIES_LENGTHS:
+        df = pd.DataFrame({"residual": rng.normal(0, 500, n)})
+        df.loc[rng.choice(n, n // 1000, replace=False), "residual"] = np.nan
+        expected, old = timed(lambda: per_window(df))
+        got, new = timed(lambda: rolling_stats(df))
+        check(expected, got)
+        print(f"{n:>10,} {old * 1000:>8.0f} ms {new * 1000:>6.0f} ms {old / new:>7.1f}x")
+
+    # z-scores only, for a panel of series
+    panel = pd.DataFrame({
+        "series_id": np.repeat([f"s{i}" for i in range(PANEL_SERIES)], PANEL_DAYS),
+        "residual": rng.normal(0, 500, PANEL_SERIES * PANEL_DAYS),
+    })
+    expected, old = timed(lambda: per_window_panel(panel))
+    got, new = timed(lambda: rolling_stats(panel, stats=("z",), quantiles=()))
+    check(expected, got)
+    print(f"\nz only, {PANEL_SERIES} series x {PANEL_DAYS} days")
+    print(f"  per series and window : {old * 1000:>6.0f} ms")
+    print(f"  rolling_stats         : {new * 1000:>6.0f} ms ({old / new:.1f}x)")
+    matrix = panel["residual"].to_numpy().reshape(PANEL_SERIES, PANEL_DAYS)
+    _, array = timed(lambda: rolling_stats_array(matrix, stats=("z",), quantiles=()))
+    print(f"  rolling_stats_array   : {array * 1000:>6.0f} ms ({old / array:.1f}x, as one 2D array)")
+    print("\nValues match.")
+
+
+if __name__ == "__main__":
+    main()
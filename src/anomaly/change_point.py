@@ -0,0 +1,218 @@
+import json
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from src.utils.storage import put_bytes, get_bytes
+
+# ── Change-point detection ────────────────────────────────────
+# A two-sided CUSUM over residuals, standardized against the rolling
+# baseline that compute_rolling_z_score uses. A level shift pushes the
+# seasonal-naive residuals one way for season_length days (until the
+# forecast catches up with the new level); left alone, that burst sits
+# in the 30-day window and inflates rolling_std for a month, hiding
+# genuine anomalies after the shift.
+#
+# When either CUSUM sum crosses `threshold`, a change point is recorded
+# at the start of the excursion. By default that is all: the z-score
+# stays the plain rolling one and change_point is only a flag. With
+# reset_baseline (CHANGE_POINT_RESET) the residuals since the change
+# are also dropped from the baseline, the rest of the transition
+# (season_length days from the change) is kept out of it too, and no
+# score is given until the baseline holds a full window of post-change
+# residuals again, so a few points can't pass for the new regime's
+# volatility. Scores during the transition are still computed against
+# the pre-change baseline, so the shift's first days are flagged as
+# anomalies as before.
+#
+# Each point is O(1) amortized (every residual enters and leaves the
+# window once), and the state is a small JSON document so the daily
+# pipeline can carry it from one run to the next.
+
+CHANGE_POINT_STATE_KEY = "change_points/state.json"
+
+DRIFT = 1.0       # CUSUM allowance k, in baseline standard deviations
+THRESHOLD = 5.0   # CUSUM decision interval h
+MAX_CHANGE_POINTS = 100  # most recent changes kept in the state
+
+
+class ChangePointDetector:
+    def __init__(self, window=30, season_length=7, drift=DRIFT, threshold=THRESHOLD,
+                 reset_baseline=False):
+        self.window = window
+        self.season_length = season_length
+        self.drift = drift
+        self.threshold = threshold
+        self.reset_baseline = reset_baseline
+        self.residuals = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.upper = 0.0
+        self.lower = 0.0
+        self.upper_start = None
+        self.lower_start = None
+        self.transition_until = -1
+        self.position = 0
+        self.last_date = None
+        self.change_points = []
+
+    # ── Baseline ──────────────────────────────────────────────
+    def _push(self, residual):
+        self.residuals.append(residual)
+        self.total += residual
+        self.total_sq += residual * residual
+        if len(self.residuals) > self.window:
+            old = self.residuals.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+
+    def _pop_recent(self, count):
+        for _ in range(min(count, len(self.residuals))):
+            old = self.residuals.pop()
+            self.total -= old
+            self.total_sq -= old * old
+
+    def _stats(self):
+        """Mean and sample std of the baseline, or NaN until it holds a
+        full window."""
+        n = len(self.residuals)
+        if n < self.window or n < 2:
+            return np.nan, np.nan
+        mean = self.total / n
+        var = max((self.total_sq - n * mean * mean) / (n - 1), 0.0)
+        return mean, np.sqrt(var)
+
+    # ── Updates ───────────────────────────────────────────────
+    def update(self, residual, date=None):
+        """Add one residual. Returns (rolling_mean, rolling_std, z_score,
+        change_point) where change_point is True on the point that
+        confirmed a shift."""
+        t = self.position
+        self.position += 1
+        if date is not None:
+            self.last_date = str(pd.Timestamp(date).date())
+        if np.isnan(residual):
+            return np.nan, np.nan, np.nan, False
+
+        before_mean, before_std = self._stats()
+        in_transition = t < self.transition_until
+        if not in_transition:
+            self._push(residual)
+        mean, std = self._stats()
+        z = (residual - mean) / std if std > 0 else np.nan
+
+        # CUSUM on the residual standardized by the baseline before it
+        changed = False
+        if not in_transition and before_std > 0:
+            u = (residual - before_mean) / before_std
+            if self.upper == 0.0:
+                self.upper_start = t
+            if self.lower == 0.0:
+                self.lower_start = t
+            self.upper = max(0.0, self.upper + u - self.drift)
+            self.lower = max(0.0, self.lower - u - self.drift)
+            if self.upper > self.threshold or self.lower > self.threshold:
+                start = self.upper_start if self.upper > self.threshold else self.lower_start
+                self._reset(start, t)
+                changed = True
+        return mean, std, z, changed
+
+    def _reset(self, start, t):
+        """Record a change at `start` and, with reset_baseline, drop the
+        transition from the baseline."""
+        if self.reset_baseline:
+            self._pop_recent(t - start + 1)
+            self.transition_until = start + self.season_length
+        self.upper = self.lower = 0.0
+        change = {"position": start, "detected_at": t, "date": None}
+        if self.last_date is not None:
+            # Points are daily, so the change is (t - start) days back
+            change["date"] = str((pd.Timestamp(self.last_date) - pd.Timedelta(days=t - start)).date())
+        self.change_points = self.change_points[-(MAX_CHANGE_POINTS - 1):] + [change]
+
+    def score(self, residuals, dates=None):
+        """Run update() over a sequence. Returns a frame of rolling_mean,
+        rolling_std, z_score and change_point, one row per residual."""
+        residuals = np.asarray(residuals, dtype=np.float64)
+        dates = [None] * len(residuals) if dates is None else list(dates)
+        out = np.empty((len(residuals), 4))
+        for i, (r, d) in enumerate(zip(residuals, dates)):
+            out[i] = self.update(r, d)
+        return pd.DataFrame({
+            "rolling_mean": out[:, 0],
+            "rolling_std": out[:, 1],
+            "z_score": out[:, 2],
+            "change_point": out[:, 3].astype(np.uint8),
+        })
+
+    # ── Persistence ───────────────────────────────────────────
+    def to_dict(self):
+        return {
+            "window": self.window,
+            "season_length": self.season_length,
+            "drift": self.drift,
+            "threshold": self.threshold,
+            "reset_baseline": self.reset_baseline,
+            "residuals": list(self.residuals),
+            # Kept as they are so a resumed detector matches a full replay bit for bit
+            "total": self.total,
+            "total_sq": self.total_sq,
+            "upper": self.upper,
+            "lower": self.lower,
+            "upper_start": self.upper_start,
+            "lower_start": self.lower_start,
+            "transition_until": self.transition_until,
+            "position": self.position,
+            "last_date": self.last_date,
+            "change_points": self.change_points,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        # States saved before reset_baseline existed always reset
+        detector = cls(state["window"], state["season_length"], state["drift"],
+                       state["threshold"], state.get("reset_baseline", True))
+        for name in ("total", "total_sq", "upper", "lower", "upper_start", "lower_start",
+                     "transition_until", "position", "last_date", "change_points"):
+            setattr(detector, name, state[name])
+        detector.residuals = deque(state["residuals"])
+        return detector
+
+
+def score_with_change_points(df, window=30, season_length=7, reset_baseline=False):
+    """Rolling baseline and z-scores of df["residual"] from the persisted
+    detector, plus a change_point flag.
+
+    Only rows dated after the detector's last date are fed to it; the
+    whole frame is replayed when there is no state, the state is ahead
+    of df or it was saved with the other reset_baseline setting. Rows
+    not fed get NaN scores. Returns (df, detector); save the detector
+    once the run owns its date.
+    """
+    detector = load_detector()
+    dates = pd.to_datetime(df["date"])
+    if (detector is None or detector.last_date is None
+            or detector.reset_baseline != reset_baseline
+            or pd.Timestamp(detector.last_date) >= dates.iloc[-1]):
+        detector = ChangePointDetector(window, season_length, reset_baseline=reset_baseline)
+        new = np.ones(len(df), dtype=bool)
+    else:
+        new = (dates > pd.Timestamp(detector.last_date)).to_numpy()
+
+    df = df.copy()
+    scores = detector.score(df.loc[new, "residual"], dates[new])
+    for column in scores.columns:
+        df[column] = np.nan
+        df.loc[new, column] = scores[column].to_numpy()
+    return df, detector
+
+
+def load_detector():
+    """The persisted detector, or None."""
+    body = get_bytes(CHANGE_POINT_STATE_KEY)
+    return ChangePointDetector.from_dict(json.loads(body)) if body else None
+
+
+def save_detector(detector):
+    put_bytes(CHANGE_POINT_STATE_KEY, json.dumps(detector.to_dict()))
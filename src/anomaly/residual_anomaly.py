@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def compute_residual(df):
     df = df.copy()
     df["residual"] = df["demand"] - df["forecast"]
@@ -13,3 +16,61 @@ def compute_rolling_z_score(df, window=30):
     df["z_score"] = (df["residual"] - df["rolling_mean"]) / df["rolling_std"]
 
     return df
+
+
+# ── Array scorers ─────────────────────────────────────────────
+# Same maths as compute_rolling_z_score, but on plain numpy arrays
+# (1D for one series, 2D for many series/paths along the last axis)
+# so sweeps and simulations don't pay for a DataFrame per call.
+
+def rolling_z_score_array(residuals, window=30):
+    """Rolling z-score along the last axis using prefix sums.
+
+    Like pandas' rolling, the window includes the current point, the
+    std is the sample std, and any window containing NaN gives NaN.
+    """
+    r = np.asarray(residuals, dtype=np.float64)
+    z = np.full(r.shape, np.nan)
+    n = r.shape[-1]
+    if n < window:
+        return z
+
+    valid = np.isfinite(r)
+    # Centre each series first so the sum of squares doesn't cancel out
+    with np.errstate(invalid="ignore"):
+        offset = np.nanmean(np.where(valid, r, np.nan), axis=-1, keepdims=True)
+    offset = np.nan_to_num(offset)
+    x = np.where(valid, r - offset, 0.0)
+
+    pad = [(0, 0)] * (r.ndim - 1) + [(1, 0)]
+    s1 = np.pad(np.cumsum(x, axis=-1), pad)
+    s2 = np.pad(np.cumsum(x * x, axis=-1), pad)
+    cnt = np.pad(np.cumsum(valid, axis=-1), pad)
+
+    win_s1 = s1[..., window:] - s1[..., :-window]
+    win_s2 = s2[..., window:] - s2[..., :-window]
+    win_cnt = cnt[..., window:] - cnt[..., :-window]
+
+    mean = win_s1 / window
+    var = np.maximum((win_s2 - window * mean * mean) / (window - 1), 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (x[..., window - 1:] - mean) / np.sqrt(var)
+    z[..., window - 1:] = np.where(win_cnt == window, scores, np.nan)
+    return z
+
+
+def rolling_robust_z_score_array(residuals, window=30):
+    """Rolling robust z-score: (x - median) / (1.4826 * MAD)."""
+    r = np.asarray(residuals, dtype=np.float64)
+    z = np.full(r.shape, np.nan)
+    if r.shape[-1] < window:
+        return z
+
+    windows = np.lib.stride_tricks.sliding_window_view(r, window, axis=-1)
+    median = np.median(windows, axis=-1)
+    mad = np.median(np.abs(windows - median[..., None]), axis=-1) * 1.4826
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z[..., window - 1:] = (r[..., window - 1:] - median) / mad
+    return z
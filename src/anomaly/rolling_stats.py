@@ -0,0 +1,164 @@
+import numpy as np
+
+# ── Multi-window rolling statistics ───────────────────────────
+# Mean, std, min, max, quantiles and z-score of a series over several
+# trailing windows at once, e.g. 7, 30 and 90 days for short- against
+# long-term risk. The windows share their work: one set of prefix sums
+# gives every window's mean, std and z-score, and one sparse table of
+# minima and maxima over power-of-two blocks (up to the widest window)
+# gives every window's min and max from two overlapping blocks. Only
+# quantiles need each window's values sorted; the windows are sorted a
+# block at a time and every quantile read from the same sort.
+#
+# Conventions match rolling_z_score_array and pandas' rolling: a window
+# ends at (and includes) its point, std is the sample std, quantiles
+# interpolate linearly, and a window that is not yet full or holds a
+# NaN gives NaN. z_<w> is the plain rolling z-score; the pipeline's
+# z_score also resets its baseline at change points.
+#
+#   mean_30, std_30, min_30, max_30, q05_30, q50_30, q95_30, z_30
+
+WINDOWS = (7, 30, 90)
+STATS = ("mean", "std", "min", "max", "z")
+QUANTILES = (0.05, 0.5, 0.95)
+Z_COLUMNS = [f"z_{window}" for window in WINDOWS]
+# Values sorted at once for quantiles (bounds the memory of a sort)
+SORT_BLOCK = 1 << 22
+
+
+def quantile_stat(q):
+    """Stat name of a quantile: 0.05 -> "q05"."""
+    return f"q{round(q * 100):02d}"
+
+
+def _sparse_tables(r, widest):
+    """Running minima and maxima over blocks of 1, 2, 4, ... points
+    (level k starts at every point and spans 2**k of them)."""
+    lows, highs = [r], [r]
+    size = 1
+    while size * 2 <= widest:
+        lows.append(np.minimum(lows[-1][..., :-size], lows[-1][..., size:]))
+        highs.append(np.maximum(highs[-1][..., :-size], highs[-1][..., size:]))
+        size *= 2
+    return lows, highs
+
+
+def _window_quantiles(r, w, quantiles):
+    """Quantiles of every full window of w points: (len(quantiles),
+    ..., n - w + 1), interpolated linearly like np.quantile."""
+    windowed = np.lib.stride_tricks.sliding_window_view(r, w, axis=-1)
+    count = windowed.shape[-2]
+    out = np.empty((len(quantiles),) + windowed.shape[:-1])
+    position = np.asarray(quantiles) * (w - 1)
+    below = np.floor(position).astype(int)
+    above = np.minimum(below + 1, w - 1)
+    fraction = position - below
+    block = max(SORT_BLOCK // (windowed[..., 0, :].size or 1), 1)
+    for start in range(0, count, block):
+        rows = slice(start, start + block)
+        ordered = np.sort(windowed[..., rows, :], axis=-1)
+        for i in range(len(quantiles)):
+            low, high = ordered[..., below[i]], ordered[..., above[i]]
+            out[i, ..., rows] = low + fraction[i] * (high - low)
+    return out
+
+
+def rolling_stats_array(values, windows=WINDOWS, stats=STATS, quantiles=QUANTILES):
+    """Rolling stats along the last axis (1D for one series, 2D for many).
+
+    Returns {"<stat>_<window>": array shaped like values} for each stat
+    in `stats` and quantile in `quantiles`, for every window.
+    """
+    r = np.asarray(values, dtype=np.float64)
+    n = r.shape[-1]
+    windows = sorted(set(windows))
+    valid = np.isfinite(r)
+    r = np.where(valid, r, np.nan)
+
+    # Centre each series first so the sum of squares doesn't cancel out
+    with np.errstate(invalid="ignore"):
+        offset = np.nanmean(r, axis=-1, keepdims=True) if n else np.zeros(r.shape[:-1] + (1,))
+    offset = np.nan_to_num(offset)
+    x = np.where(valid, r - offset, 0.0)
+    pad = [(0, 0)] * (r.ndim - 1) + [(1, 0)]
+    s1 = np.pad(np.cumsum(x, axis=-1), pad)
+    s2 = np.pad(np.cumsum(x * x, axis=-1), pad)
+    cnt = np.pad(np.cumsum(valid, axis=-1), pad)
+
+    fitting = [w for w in windows if w <= n]
+    if fitting and ("min" in stats or "max" in stats):
+        lows, highs = _sparse_tables(r, max(fitting))
+
+    out = {}
+    for w in windows:
+        columns = {stat: np.full(r.shape, np.nan) for stat in stats}
+        columns.update({quantile_stat(q): np.full(r.shape, np.nan) for q in quantiles})
+        out.update({f"{stat}_{w}": column for stat, column in columns.items()})
+        if w > n:
+            continue
+
+        full = (cnt[..., w:] - cnt[..., :-w]) == w
+        tail = (Ellipsis, slice(w - 1, None))
+        mean = (s1[..., w:] - s1[..., :-w]) / w
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = np.maximum(((s2[..., w:] - s2[..., :-w]) - w * mean * mean) / (w - 1), 0.0)
+            std = np.sqrt(var)
+            z = (x[tail] - mean) / std
+        computed = {"mean": mean + offset, "std": std, "z": z}
+
+        if "min" in stats or "max" in stats:
+            # Two blocks of 2**k points cover the window from both ends
+            k = w.bit_length() - 1
+            last = n - w + 1
+            shift = w - (1 << k)
+            computed["min"] = np.minimum(lows[k][..., :last], lows[k][..., shift:shift + last])
+            computed["max"] = np.maximum(highs[k][..., :last], highs[k][..., shift:shift + last])
+        if quantiles:
+            for q, values_q in zip(quantiles, _window_quantiles(r, w, quantiles)):
+                computed[quantile_stat(q)] = values_q
+
+        for stat, column in columns.items():
+            column[tail] = np.where(full, computed[stat], np.nan)
+    return out
+
+
+def rolling_stats(df, windows=WINDOWS, stats=STATS, quantiles=QUANTILES, column="residual"):
+    """df with the rolling stats of df[column] added as columns.
+
+    Rows are taken in date order; a frame with a series_id column is
+    computed per series.
+    """
+    values = df[column].to_numpy(dtype=np.float64)
+    if "series_id" not in df:
+        return df.assign(**rolling_stats_array(values, windows, stats, quantiles))
+
+    groups = list(df.groupby("series_id", sort=False).indices.values())
+    if len({len(rows) for rows in groups}) == 1:
+        # Series of equal length go through as one 2D array
+        order = np.concatenate(groups)
+        computed = rolling_stats_array(values[order].reshape(len(groups), -1), windows, stats, quantiles)
+        for name, stat in computed.items():
+            computed[name] = np.empty(len(df))
+            computed[name][order] = stat.ravel()
+        return df.assign(**computed)
+
+    computed = {}
+    for rows in groups:
+        for name, stat in rolling_stats_array(values[rows], windows, stats, quantiles).items():
+            computed.setdefault(name, np.full(len(df), np.nan))[rows] = stat
+    return df.assign(**computed)
+
+
+def latest_stats(values, windows=WINDOWS, quantiles=QUANTILES):
+    """The stats of the last point of a 1D series, one dict per window."""
+    values = np.asarray(values, dtype=np.float64)[-max(windows):]
+    computed = rolling_stats_array(values, windows, STATS, quantiles)
+    names = list(STATS) + [quantile_stat(q) for q in quantiles]
+    return [
+        {"window": w, **{name: _value(computed[f"{name}_{w}"][-1]) for name in names}}
+        for w in windows
+    ]
+
+
+def _value(x):
+    return None if np.isnan(x) else float(x)
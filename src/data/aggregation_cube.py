@@ -0,0 +1,327 @@
+import json
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from src.anomaly.residual_anomaly import rolling_z_score_array
+from src.risk.compute_risk import RISK_LEVELS
+from src.utils.storage import put_bytes, get_bytes
+
+# ── Hierarchical aggregation cube ─────────────────────────────
+# Demand and risk stats for every level of the store/item hierarchy at
+# daily, weekly and monthly grain, kept as dense (key x period)
+# matrices. Weekly and monthly risk is scored on mean daily demand so a
+# period still in progress compares fairly with complete ones.
+#
+# For each period the keys are also kept sorted by risk level (then by
+# |z| descending), so "which stores are HIGH risk this week" is a slice
+# of that ordering rather than a scan and re-aggregation of raw rows.
+#
+# The cube is updated incrementally: each new day of raw rows is added
+# to the daily cells and its week/month totals, and only the affected
+# periods are re-scored.
+
+LEVELS = {
+    "total": [],
+    "store": ["store"],
+    "item": ["item"],
+    "store_item": ["store", "item"],
+}
+
+# grain: (pandas period frequency, seasonal lag in periods, rolling window)
+GRAINS = {
+    "D": ("D", 7, 30),
+    "W": ("W-SUN", 1, 13),
+    "M": ("M", 12, 12),
+}
+
+# Risk bucket codes: LOW, MEDIUM, HIGH, CRITICAL, then not yet scored
+UNSCORED = len(RISK_LEVELS)
+
+CUBE_PREFIX = "cube"
+
+
+def _level_members(frame, level):
+    """Integer code per row of `frame`, and the key of each code."""
+    columns = LEVELS[level]
+    if not columns:
+        return np.zeros(len(frame), dtype=np.int64), ["total"]
+    groups = frame.groupby(columns, sort=False)
+    members = groups.size().index.to_frame(index=False).astype(str)
+    return groups.ngroup().to_numpy(), members.agg("-".join, axis=1).tolist()
+
+
+def _risk_codes(z):
+    codes = np.searchsorted([1, 2, 3], np.abs(z), side="right")
+    return np.where(np.isnan(z), UNSCORED, codes)
+
+
+class _Table:
+    """One (level, grain) slice of the cube.
+
+    Arrays are allocated with spare period columns so a daily update
+    appends in place; only the first num_periods columns are live.
+    """
+
+    def __init__(self, freq, season, window, daily=None):
+        self.freq = freq
+        self.season = season
+        self.window = window
+        # Daily table of the same level, for scoring a partial period
+        self.daily = daily
+        self.keys = []
+        self.key_index = {}
+        self.first_ordinal = None
+        self.num_periods = 0
+        self._allocate(0, 0)
+
+    def _allocate(self, num_keys, capacity):
+        self.demand = np.zeros((num_keys, capacity))
+        self.days = np.zeros(capacity, dtype=np.int64)
+        self.residual = np.full((num_keys, capacity), np.nan)
+        self.z = np.full((num_keys, capacity), np.nan)
+        # Per period: key rows sorted by risk bucket, and bucket offsets
+        self.order = np.zeros((num_keys, capacity), dtype=np.int32)
+        self.bounds = np.zeros((UNSCORED + 2, capacity), dtype=np.int32)
+
+    def _resize(self, num_keys, num_periods):
+        old_keys, capacity = self.demand.shape
+        if num_keys > old_keys or num_periods > capacity:
+            old = {
+                name: getattr(self, name)
+                for name in ("demand", "days", "residual", "z", "order", "bounds")
+            }
+            self._allocate(num_keys, max(num_periods, 2 * capacity))
+            for name, array in old.items():
+                getattr(self, name)[tuple(slice(0, d) for d in array.shape)] = array
+        self.num_periods = num_periods
+        if num_keys > old_keys:
+            # Orderings cover every key, so rebuild them for all periods
+            self._index(0)
+
+    def key_rows(self, keys):
+        for key in keys:
+            if key not in self.key_index:
+                self.key_index[key] = len(self.keys)
+                self.keys.append(key)
+        return np.array([self.key_index[k] for k in keys], dtype=np.int64)
+
+    def add(self, codes, keys, ordinals, demand, new_days):
+        """Add demand per (key code, period ordinal) and observed-day counts."""
+        if self.first_ordinal is None:
+            self.first_ordinal = int(ordinals.min())
+        rows = self.key_rows(keys)[codes]
+        cols = ordinals - self.first_ordinal
+        self._resize(len(self.keys), max(self.num_periods, int(cols.max()) + 1))
+
+        # Only the touched columns are accumulated
+        first_col = int(cols.min())
+        width = self.num_periods - first_col
+        flat = np.bincount(
+            rows * width + (cols - first_col), weights=demand,
+            minlength=len(self.keys) * width,
+        )
+        self.demand[:, first_col:self.num_periods] += flat.reshape(len(self.keys), width)
+        new_ordinals, counts = new_days
+        np.add.at(self.days, new_ordinals - self.first_ordinal, counts)
+        self._score(first_col)
+
+    def _score(self, first_col):
+        """Re-score every period from first_col onwards."""
+        n, m = self.num_periods, self.season
+        start = max(first_col, m)
+        if start >= n:
+            self._index(first_col)
+            return
+
+        # Mean daily demand, so a partial period compares with full ones
+        rate = self.demand[:, start - m:n] / np.maximum(self.days[start - m:n], 1)
+        self.residual[:, start:n] = rate[:, m:] - rate[:, :-m]
+        if self.daily is not None:
+            self._like_for_like(n - 1)
+
+        lo = max(0, start - self.window + 1)
+        z = rolling_z_score_array(self.residual[:, lo:n], self.window)
+        self.z[:, start:n] = z[:, start - lo:]
+        self._index(first_col)
+
+    def _like_for_like(self, col):
+        """Score a period still in progress against the same elapsed days
+        of its reference period rather than the whole of it."""
+        period = pd.Period(ordinal=self.first_ordinal + col, freq=self.freq)
+        days = int(self.days[col])
+        if days >= (period.end_time - period.start_time).days + 1:
+            return
+        reference = (period - self.season).start_time.to_period("D").ordinal
+        first_day = reference - self.daily.first_ordinal
+        if first_day < 0:
+            return
+        reference_demand = self.daily.demand[:, first_day:first_day + days].sum(axis=1)
+        self.residual[:, col] = (self.demand[:, col] - reference_demand) / days
+
+    def _index(self, first_col):
+        n = self.num_periods
+        if first_col >= n or not self.keys:
+            return
+        z = self.z[:, first_col:n]
+        codes = _risk_codes(z)
+        # Sort by risk bucket, most severe |z| first inside each bucket
+        sort_key = codes * 1e6 - np.minimum(np.nan_to_num(np.abs(z)), 1e5)
+        self.order[:, first_col:n] = np.argsort(sort_key, axis=0, kind="stable")
+        counts = np.stack([(codes == c).sum(axis=0) for c in range(UNSCORED + 1)])
+        self.bounds[1:, first_col:n] = np.cumsum(counts, axis=0)
+
+    def lookup(self, col, code):
+        lo, hi = self.bounds[code, col], self.bounds[code + 1, col]
+        return self.order[lo:hi, col]
+
+
+class AggregationCube:
+    def __init__(self):
+        self.tables = {}
+        for level in LEVELS:
+            daily = None
+            for grain, (freq, season, window) in GRAINS.items():
+                table = _Table(freq, season, window, daily)
+                self.tables[(level, grain)] = table
+                if daily is None:
+                    daily = table
+        self.last_date = None
+
+    def update(self, raw):
+        """Add raw rows (date, store, item, sales) for dates after last_date."""
+        raw = raw[["date", "store", "item", "sales"]]
+        dates = pd.to_datetime(raw["date"])
+        if self.last_date is not None and dates.min() <= self.last_date:
+            raise ValueError(f"Cube already holds data up to {self.last_date.date()}.")
+
+        raw = raw.assign(date=dates)
+        new_dates = pd.DatetimeIndex(dates.unique())
+        for level, columns in LEVELS.items():
+            # Aggregate to (member, day) once per level, then roll up by grain
+            daily = raw.groupby(columns + ["date"], sort=False)["sales"].sum().reset_index()
+            codes, keys = _level_members(daily, level)
+            demand = daily["sales"].to_numpy(dtype=np.float64)
+
+            for grain, (freq, _, _) in GRAINS.items():
+                ordinals = pd.PeriodIndex(daily["date"], freq=freq).asi8
+                new_days = np.unique(pd.PeriodIndex(new_dates, freq=freq).asi8, return_counts=True)
+                self.tables[(level, grain)].add(codes, keys, ordinals, demand, new_days)
+        self.last_date = dates.max()
+
+    # ── Queries ───────────────────────────────────────────────
+    def _column(self, table, grain, period):
+        freq = GRAINS[grain][0]
+        if period is None:
+            return table.num_periods - 1
+        col = pd.Period(period, freq=freq).ordinal - table.first_ordinal
+        if not 0 <= col < table.num_periods:
+            raise KeyError(f"No {grain} period containing {period} in the cube.")
+        return col
+
+    def period_label(self, level, grain, period=None):
+        table = self.tables[(level, grain)]
+        col = self._column(table, grain, period)
+        return str(pd.Period(ordinal=table.first_ordinal + col, freq=GRAINS[grain][0]))
+
+    def at_risk(self, level, grain="W", risk_levels=("HIGH", "CRITICAL"), period=None):
+        """Keys of `level` in the given risk levels for one period
+        (default: the latest), most severe first."""
+        table = self.tables[(level, grain)]
+        col = self._column(table, grain, period)
+        codes = [int(np.flatnonzero(RISK_LEVELS == r)[0]) for r in risk_levels]
+        rows = np.concatenate([table.lookup(col, c) for c in sorted(codes, reverse=True)])
+
+        return pd.DataFrame({
+            "key": np.array(table.keys, dtype=object)[rows],
+            "period": self.period_label(level, grain, period),
+            "demand": table.demand[rows, col],
+            "days": table.days[col],
+            "z_score": table.z[rows, col],
+            "risk_level": RISK_LEVELS[_risk_codes(table.z[rows, col])],
+        })
+
+    def series(self, level, key, grain="D"):
+        """Demand and risk history of one key."""
+        table = self.tables[(level, grain)]
+        row = table.key_index[key]
+        periods = pd.period_range(
+            start=pd.Period(ordinal=table.first_ordinal, freq=GRAINS[grain][0]),
+            periods=table.num_periods,
+        )
+        n = table.num_periods
+        z = table.z[row, :n]
+        return pd.DataFrame({
+            "period": periods.astype(str),
+            "demand": table.demand[row, :n],
+            "days": table.days[:n],
+            "residual": table.residual[row, :n],
+            "z_score": z,
+            "risk_level": np.where(np.isnan(z), None, RISK_LEVELS[np.minimum(_risk_codes(z), 3)]),
+        })
+
+    # ── Persistence ───────────────────────────────────────────
+    def save(self):
+        for (level, grain), table in self.tables.items():
+            buffer = BytesIO()
+            np.savez(
+                buffer,
+                keys=np.array(table.keys, dtype=str),
+                first_ordinal=table.first_ordinal,
+                demand=table.demand[:, :table.num_periods],
+                days=table.days[:table.num_periods],
+            )
+            put_bytes(f"{CUBE_PREFIX}/{level}_{grain}.npz", buffer.getvalue())
+        put_bytes(f"{CUBE_PREFIX}/meta.json", json.dumps({
+            "last_date": self.last_date.strftime("%Y-%m-%d"),
+        }))
+
+    @classmethod
+    def load(cls):
+        """Load a saved cube (risk stats are re-derived), or None."""
+        last_date = saved_last_date()
+        if last_date is None:
+            return None
+        cube = cls()
+        cube.last_date = pd.Timestamp(last_date)
+        for (level, grain), table in cube.tables.items():
+            data = np.load(BytesIO(get_bytes(f"{CUBE_PREFIX}/{level}_{grain}.npz")))
+            table.key_rows(data["keys"].tolist())
+            table.first_ordinal = int(data["first_ordinal"])
+            table._resize(len(table.keys), len(data["days"]))
+            table.demand[:, :table.num_periods] = data["demand"]
+            table.days[:table.num_periods] = data["days"]
+            table._score(0)
+        return cube
+
+
+# ── Daily job ─────────────────────────────────────────────────
+def saved_last_date():
+    """Last date held by the saved cube, or None (cheap change marker)."""
+    meta = get_bytes(f"{CUBE_PREFIX}/meta.json")
+    return None if meta is None else json.loads(meta)["last_date"]
+
+
+def refresh_cube(raw):
+    """Add any raw rows newer than the saved cube and save it."""
+    cube = AggregationCube.load() or AggregationCube()
+    dates = pd.to_datetime(raw["date"])
+    new = raw[dates > cube.last_date] if cube.last_date is not None else raw
+    if new.empty:
+        return cube
+    cube.update(new)
+    cube.save()
+    return cube
+
+
+def main():
+    from src.data.preprocess_real_data import load_raw_data
+
+    cube = refresh_cube(load_raw_data())
+    print(f"Aggregation cube up to {cube.last_date.date()}")
+    print(cube.at_risk("store", "W"))
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,17 @@ def aggregate_daily_demand(df):
     return daily
 
 
+def build_series_panel(df):
+    """Per store x item demand in long format, one series per pair."""
+    panel = df.rename(columns={"sales": "demand"})
+    panel["series_id"] = panel["store"].astype(str) + "-" + panel["item"].astype(str)
+    return (
+        panel[["series_id", "store", "item", "date", "demand"]]
+        .sort_values(["series_id", "date"])
+        .reset_index(drop=True)
+    )
+
+
 def main():
     df = load_raw_data()
     daily_demand = aggregate_daily_demand(df)
@@ -45,10 +45,13 @@ def add_seasonality(df):
     return df
 
 
-def add_noise(df):
+def add_noise(df, rng=None):
     df = df.copy()
 
-    noise = np.random.normal(
+    # Pass a np.random.Generator to draw an independent, seeded path;
+    # by default we keep using the module-level seed above.
+    rng = np.random if rng is None else rng
+    noise = rng.normal(
         loc=0,
         scale=0.05,  # 5% noise
         size=len(df)
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.config import SERIES_COL
+
+# ── Validation and gap filling ────────────────────────────────
+# Seasonal naive (shift(7)) and the rolling window are positional, so
+# they silently misalign on a missing day, a duplicated day or a bad
+# value. validate_demand repairs demand data before scoring, for any
+# number of series at once and without per-row Python:
+#
+#   1. drop rows without a date or series id; NaN or negative demand
+#      counts as missing
+#   2. keep the last row for each (series, date)
+#   3. reindex every series to a complete daily calendar between its
+#      first and last date
+#   4. impute each missing day with the last observed value on the same
+#      weekday (then the next one, then the series mean) and flag it
+#
+# The loops left run over lags (one step per week of the longest gap),
+# each touching only the still-missing days.
+
+QUALITY_FIELDS = [
+    "rows_in", "rows_out", "series", "unkeyed_rows", "duplicates", "nan_demand",
+    "negative_demand", "missing_days", "imputed_same_weekday", "imputed_series_mean",
+    "longest_gap_days", "empty_series",
+]
+
+
+def _series_codes(df):
+    """Integer code per row (-1 for a missing id) and the ids they index."""
+    if SERIES_COL not in df:
+        return np.zeros(len(df), dtype=np.int32), None
+    ids = df[SERIES_COL]
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        return ids.cat.codes.to_numpy().astype(np.int32, copy=False), ids.cat.categories
+    codes, uniques = pd.factorize(ids, sort=True)
+    return codes.astype(np.int32), uniques
+
+
+def _fill_by_lag(grid, missing, series_first, series_last, step, max_steps):
+    """For each missing grid position, the nearest observed value at
+    position + k * step (k = 1, 2, ...) inside its series. Returns
+    (filled mask over `missing`, values)."""
+    values = np.full(len(missing), np.nan)
+    pending = np.arange(len(missing))
+    for k in range(1, max_steps + 1):
+        if len(pending) == 0:
+            break
+        source = missing[pending] + k * step
+        inside = (source >= series_first[pending]) & (source <= series_last[pending])
+        pending = pending[inside]
+        source = source[inside]
+        found = ~np.isnan(grid[source])
+        values[pending[found]] = grid[source[found]]
+        pending = pending[~found]
+    return ~np.isnan(values), values
+
+
+def validate_demand(df):
+    """Return (repaired frame, quality report) for (date, demand[,
+    series_id]) data. The frame has one row per series and calendar
+    day, sorted by series then date, with an `imputed` flag."""
+    report = dict.fromkeys(QUALITY_FIELDS, 0)
+    report["rows_in"] = len(df)
+
+    codes, uniques = _series_codes(df)
+    day = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]").view(np.int64)
+    demand = df["demand"].to_numpy(dtype=np.float64)
+
+    keyed = (day != np.iinfo(np.int64).min) & (codes >= 0)  # NaT, missing id
+    report["unkeyed_rows"] = int((~keyed).sum())
+    report["nan_demand"] = int((np.isnan(demand) & keyed).sum())
+    negative = demand < 0
+    report["negative_demand"] = int((negative & keyed).sum())
+    demand[negative] = np.nan
+    del negative
+    if report["unkeyed_rows"]:
+        codes, day, demand = codes[keyed], day[keyed], demand[keyed]
+    del keyed
+
+    # Sort by (series, day) unless the input already is; stable, so the
+    # last of several rows for a day stays last
+    key = day - day.min() if len(day) else day.copy()
+    key |= codes.astype(np.int64) << 32
+    if not (key[1:] >= key[:-1]).all():
+        order = np.argsort(key, kind="stable")
+        key, codes, day, demand = key[order], codes[order], day[order], demand[order]
+        del order
+    last_of_day = np.r_[key[1:] != key[:-1], True] if len(key) else np.zeros(0, dtype=bool)
+    del key
+    report["duplicates"] = int((~last_of_day).sum())
+    if report["duplicates"]:
+        codes, day, demand = codes[last_of_day], day[last_of_day], demand[last_of_day]
+    del last_of_day
+
+    # Series with no usable demand at all are dropped
+    usable = np.bincount(codes[~np.isnan(demand)], minlength=1 if uniques is None else len(uniques))
+    has_series = np.bincount(codes, minlength=len(usable)) > 0
+    report["empty_series"] = int((has_series & (usable == 0)).sum())
+    if report["empty_series"]:
+        keep = usable[codes] > 0
+        codes, day, demand = codes[keep], day[keep], demand[keep]
+
+    # Calendar per series: first..last day, laid out series after series.
+    # With no usable rows left every array is empty, and so is the output
+    # (validate_stage reports that)
+    if len(codes):
+        boundaries = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[boundaries[1:], len(day)]
+    else:
+        boundaries = ends = np.zeros(0, dtype=np.int64)
+    present = codes[boundaries]
+    first_day = day[boundaries]
+    last_day = day[ends - 1]
+    span = last_day - first_day + 1
+    offsets = (np.r_[0, np.cumsum(span)[:-1]] if len(span) else span).astype(np.int64)
+
+    s = np.repeat(np.arange(len(present)), np.diff(np.r_[boundaries, len(codes)]))
+    grid = np.full(int(span.sum()), np.nan)
+    grid[offsets[s] + (day - first_day[s])] = demand
+    del s, day, demand
+
+    missing = np.flatnonzero(np.isnan(grid))
+    report["missing_days"] = len(missing)
+    if len(missing):
+        owner = np.searchsorted(offsets, missing, side="right") - 1
+        first_pos, last_pos = offsets[owner], offsets[owner] + span[owner] - 1
+
+        # Longest run of consecutive missing days
+        run_start = np.r_[True, (np.diff(missing) != 1) | (owner[1:] != owner[:-1])]
+        report["longest_gap_days"] = int(np.bincount(np.cumsum(run_start) - 1).max())
+
+        max_steps = int(span.max()) // 7 + 1
+        filled, values = _fill_by_lag(grid, missing, first_pos, last_pos, -7, max_steps)
+        later, later_values = _fill_by_lag(grid, missing, first_pos, last_pos, 7, max_steps)
+        use_later = ~filled & later
+        values[use_later] = later_values[use_later]
+        filled |= later
+        report["imputed_same_weekday"] = int(filled.sum())
+
+        # No observation on that weekday at all: the series mean
+        if not filled.all():
+            observed = ~np.isnan(grid)
+            grid_owner = np.repeat(np.arange(len(span)), span)[observed]
+            means = np.round(np.bincount(grid_owner, weights=grid[observed], minlength=len(span))
+                             / np.bincount(grid_owner, minlength=len(span)))
+            values[~filled] = means[owner[~filled]]
+        report["imputed_series_mean"] = int((~filled).sum())
+        grid[missing] = values
+
+    imputed = np.zeros(len(grid), dtype=np.uint8)
+    imputed[missing] = 1
+    dates = np.arange(len(grid), dtype=np.int64)
+    dates += np.repeat(first_day - offsets, span)
+
+    out = pd.DataFrame({
+        "date": dates.astype("datetime64[D]").astype("datetime64[ns]"),
+        "demand": grid.astype(df["demand"].dtype) if df["demand"].dtype.kind in "iu" else grid,
+        "imputed": imputed,
+    })
+    del dates, grid
+    if uniques is not None:
+        series_codes = np.repeat(present, span)
+        out.insert(0, SERIES_COL, pd.Categorical.from_codes(series_codes, categories=uniques)
+                   if isinstance(df[SERIES_COL].dtype, pd.CategoricalDtype)
+                   else np.asarray(uniques)[series_codes])
+    report["series"] = len(present)
+    report["rows_out"] = len(out)
+    return out, report
+
+
+def describe_quality(report):
+    """One line naming every repair that was needed, or None."""
+    parts = [
+        f"{report[name]:,} {label}" for name, label in [
+            ("unkeyed_rows", "rows without a date or series id dropped"),
+            ("duplicates", "duplicate days dropped"),
+            ("nan_demand", "missing demand values"),
+            ("negative_demand", "negative demand values"),
+            ("missing_days", "days imputed"),
+            ("empty_series", "series without data dropped"),
+        ] if report[name]
+    ]
+    return "Data quality: " + ", ".join(parts) if parts else None
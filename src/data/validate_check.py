@@ -0,0 +1,67 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.pipeline import daily_pipeline
+from src.utils import config
+
+# ── Validation check ──────────────────────────────────────────
+# Feeds demand files with a NaN and a blank value, and with fractional
+# demand, through the daily pipeline's load and validate stages. The
+# missing values must reach validation (not fail the load), be imputed
+# from the same weekday and flagged, and fractional demand must come
+# out of validation as it went in. A file with no usable demand at all
+# must fail validation with its own error.
+
+DAYS = 28
+
+
+def demand_file(root, name, demand):
+    path = Path(root) / name
+    dates = pd.date_range("2013-01-01", periods=len(demand), freq="D")
+    pd.DataFrame({"date": dates.strftime("%Y-%m-%d"), "demand": demand}).to_csv(path, index=False)
+    return str(path)
+
+
+def load_and_validate(path):
+    config.REAL_DATA_PATH = path
+    raw = daily_pipeline.load_stage()
+    return daily_pipeline.validate_stage(raw)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    demand = rng.integers(1_000, 5_000, DAYS).astype(object)
+    missing = [10, 20]
+    demand[missing[0]] = np.nan
+    demand[missing[1]] = ""
+
+    with tempfile.TemporaryDirectory() as root:
+        df, quality = load_and_validate(demand_file(root, "missing.csv", demand))
+        assert quality["nan_demand"] == len(missing), quality
+        assert df["demand"].dtype == "int32", df["demand"].dtype
+        assert df["imputed"].to_numpy().nonzero()[0].tolist() == missing
+        for day in missing:
+            assert df["demand"].iloc[day] == demand[day - 7]
+        print(f"NaN and blank demand  : {quality['nan_demand']} imputed from the same weekday, "
+              f"demand {df['demand'].dtype}")
+
+        fractional = rng.uniform(1_000, 5_000, DAYS).round(2)
+        df, quality = load_and_validate(demand_file(root, "fractional.csv", fractional))
+        assert df["demand"].dtype == "float32", df["demand"].dtype
+        assert np.allclose(df["demand"], fractional, rtol=1e-6)
+        print(f"Fractional demand     : kept, demand {df['demand'].dtype}")
+
+        try:
+            load_and_validate(demand_file(root, "blank.csv", [""] * DAYS))
+            raise AssertionError("blank demand passed validation")
+        except ValueError as e:
+            assert str(e) == "Input dataset has no usable demand.", e
+            print(f"No usable demand      : {e}")
+    print("Validation check passed.")
+
+
+if __name__ == "__main__":
+    main()
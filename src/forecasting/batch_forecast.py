@@ -0,0 +1,223 @@
+import os
+import resource
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.forecasting.seasonal_naive import seasonal_naive_horizon
+
+# ── Batch forecasting runner ──────────────────────────────────
+# Fits Prophet or SARIMA to thousands of series. Series are split into
+# chunks and fitted in a process pool; each worker runs under an
+# address-space cap, each fit under a timeout, and any failure falls
+# back to seasonal naive. A series too short even for that is recorded
+# as failed, with a NaN forecast, rather than stopping the run. Every
+# finished chunk is checkpointed to its
+# own Parquet file, so an interrupted run resumes with the series that
+# are still missing.
+#
+#   artifacts/batch_forecast/<run_name>/chunk-<first series>.parquet
+
+OUTPUT_DIR = Path("artifacts/batch_forecast")
+
+HORIZON = 28
+CHUNK_SIZE = 25
+FIT_TIMEOUT = 60         # seconds per series
+WORKER_MEMORY_MB = 2048  # address-space cap per worker; None to disable
+MAX_WORKERS = os.cpu_count()
+
+
+class FitTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise FitTimeout()
+
+
+def _init_worker(memory_mb):
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    # Stan and statsmodels log per fit; keep worker output quiet
+    import logging
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    logging.getLogger("prophet").setLevel(logging.WARNING)
+
+
+# ── Models ────────────────────────────────────────────────────
+def _fit_prophet(series, horizon):
+    from src.forecasting.backtest_forecast import train_model, prepare_prophet_format
+    model = train_model(prepare_prophet_format(series))
+    future = model.make_future_dataframe(periods=horizon, include_history=False)
+    return model.predict(future)["yhat"].to_numpy()
+
+
+def _fit_sarima(series, horizon):
+    from src.forecasting.backtest_forecast import train_sarima, forecast_sarima
+    results = train_sarima(series["demand"].to_numpy(dtype=np.float64))
+    return np.asarray(forecast_sarima(results, horizon))
+
+
+MODELS = {
+    "prophet": _fit_prophet,
+    "sarima": _fit_sarima,
+}
+
+
+def forecast_one(series, model, horizon, timeout):
+    """Forecast one series, falling back to seasonal naive on failure
+    (model "failed" and a NaN forecast if that fails too)."""
+    start = time.perf_counter()
+    signal.alarm(timeout)
+    try:
+        forecast = MODELS[model](series, horizon)
+        if not np.all(np.isfinite(forecast)):
+            raise ValueError("non-finite forecast")
+        used, error = model, None
+    except Exception as e:
+        # FitTimeout and MemoryError land here too
+        signal.alarm(0)
+        used, error = "seasonal_naive", type(e).__name__
+        try:
+            forecast, _, _ = seasonal_naive_horizon(series["demand"].to_numpy(), horizon)
+        except Exception as fallback_error:
+            forecast = np.full(horizon, np.nan)
+            used, error = "failed", f"{error}, then {type(fallback_error).__name__}"
+    finally:
+        signal.alarm(0)
+    return forecast, used, error, time.perf_counter() - start
+
+
+def run_chunk(chunk, model, horizon, timeout):
+    """Worker entry point: forecast every series in one chunk."""
+    rows = []
+    for series_id, series in chunk:
+        forecast, used, error, seconds = forecast_one(series, model, horizon, timeout)
+        dates = pd.date_range(series["date"].max() + pd.Timedelta(days=1), periods=horizon)
+        rows.append(pd.DataFrame({
+            "series_id": series_id,
+            "date": dates,
+            "forecast": forecast,
+            "model": used,
+            "error": error,
+            "fit_seconds": seconds,
+        }))
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pd.concat(rows, ignore_index=True), peak_rss_kb
+
+
+# ── Runner ────────────────────────────────────────────────────
+def completed_series(run_dir):
+    """Series already checkpointed by an earlier (partial) run."""
+    done = set()
+    for path in sorted(run_dir.glob("chunk-*.parquet")):
+        done.update(pd.read_parquet(path, columns=["series_id"])["series_id"].unique())
+    return done
+
+
+def run_batch(panel, run_name, model="sarima", horizon=HORIZON, chunk_size=CHUNK_SIZE,
+              max_workers=MAX_WORKERS, timeout=FIT_TIMEOUT, memory_mb=WORKER_MEMORY_MB):
+    """Forecast every series in a long (series_id, date, demand) panel.
+
+    Returns run statistics; forecasts are in the run's checkpoint files
+    (see load_forecasts).
+    """
+    run_dir = OUTPUT_DIR / run_name
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    done = completed_series(run_dir)
+    todo = [
+        (sid, group[["date", "demand"]].reset_index(drop=True))
+        for sid, group in panel.groupby("series_id", sort=True)
+        if sid not in done
+    ]
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+
+    start = time.perf_counter()
+    fitted, fallbacks, failed, peak_rss_kb = 0, 0, 0, 0
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(memory_mb,)) as pool:
+        futures = {
+            pool.submit(run_chunk, chunk, model, horizon, timeout): chunk[0][0]
+            for chunk in chunks
+        }
+        for future in as_completed(futures):
+            result, rss_kb = future.result()
+            # Write-then-rename so a crash never leaves a half checkpoint
+            path = run_dir / f"chunk-{futures[future]}.parquet"
+            tmp_path = path.with_name(path.name + ".tmp")
+            result.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+            per_series = result.drop_duplicates("series_id")
+            fitted += len(per_series)
+            fallbacks += int((per_series["model"] == "seasonal_naive").sum())
+            failed += int((per_series["model"] == "failed").sum())
+            peak_rss_kb = max(peak_rss_kb, rss_kb)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "series": fitted,
+        "skipped": len(done),
+        "fallbacks": fallbacks,
+        "failed": failed,
+        "seconds": elapsed,
+        "series_per_minute": fitted / elapsed * 60 if elapsed else 0.0,
+        "peak_worker_rss_mb": peak_rss_kb / 1024,
+    }
+
+
+def load_forecasts(run_name):
+    paths = sorted((OUTPUT_DIR / run_name).glob("chunk-*.parquet"))
+    return pd.concat([pd.read_parquet(p) for p in paths], ignore_index=True)
+
+
+# ── Scaling benchmark ─────────────────────────────────────────
+NUM_SERIES = 200
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def make_panel(num_series=NUM_SERIES, num_days=730, seed=0):
+    """Synthetic per-store/per-item demand when the raw Kaggle file
+    (data/raw/store_item_demand.csv) isn't available."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2016-01-01", periods=num_days, freq="D")
+    weekly = np.where(dates.weekday < 5, 1.05, 0.9)
+    yearly = 1 + 0.15 * np.sin(2 * np.pi * np.arange(num_days) / 365)
+    level = rng.uniform(20, 200, size=(num_series, 1))
+    demand = level * weekly * yearly * (1 + rng.normal(0, 0.1, (num_series, num_days)))
+    return pd.DataFrame({
+        "series_id": np.repeat([f"s{i:05d}" for i in range(num_series)], num_days),
+        "date": np.tile(dates, num_series),
+        "demand": demand.ravel().round(),
+    })
+
+
+def main():
+    from src.data.preprocess_real_data import RAW_DATA_PATH, load_raw_data, build_series_panel
+
+    if Path(RAW_DATA_PATH).exists():
+        panel = build_series_panel(load_raw_data())
+        panel = panel[panel["series_id"].isin(panel["series_id"].unique()[:NUM_SERIES])]
+    else:
+        panel = make_panel()
+
+    print(f"Forecasting {panel['series_id'].nunique()} series x {HORIZON} days with SARIMA\n")
+    print(f"{'Workers':>8} {'Series/min':>11} {'Fallbacks':>10} {'Failed':>7} {'Peak RSS/worker':>16}")
+    for workers in WORKER_COUNTS:
+        if workers > (os.cpu_count() or 1):
+            break
+        run_name = f"benchmark-{workers}w-{int(time.time())}"
+        stats = run_batch(panel, run_name, model="sarima", max_workers=workers)
+        print(f"{workers:>8} {stats['series_per_minute']:>11.1f} "
+              f"{stats['fallbacks']:>10} {stats['failed']:>7} {stats['peak_worker_rss_mb']:>13.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
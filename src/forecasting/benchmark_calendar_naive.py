@@ -0,0 +1,102 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.forecasting.calendar_naive import (
+    EPOCH, METHODS, baseline_forecasts, cached_forecasts, load_calendar,
+)
+from src.utils import storage
+from src.utils.config import REAL_DATA_PATH, SIMULATED_DATA_PATH
+
+# ── Calendar-aware seasonal naive ─────────────────────────────
+# Accuracy of each baseline on the two datasets after their first
+# EVAL_START days (so every method has a year of history to look up),
+# then the cost of computing them: the whole history for NUM_SERIES
+# series as one 2D array, and a daily run of the pipeline's single
+# series with and without the forecast cache.
+
+EVAL_START = 400
+NUM_SERIES = 1000
+NUM_DAYS = 1826
+DAILY_RUNS = 30
+
+
+def first_day(dates):
+    return int((dates.to_numpy()[0].astype("datetime64[D]") - EPOCH).astype(np.int64))
+
+
+def accuracy(calendar):
+    rows = []
+    for name, path in [("real", REAL_DATA_PATH), ("simulated", SIMULATED_DATA_PATH)]:
+        df = pd.read_csv(path, parse_dates=["date"])
+        demand = df["demand"].to_numpy(dtype=np.float64)
+        forecasts = baseline_forecasts(demand, first_day(df["date"]), calendar)
+        actual = demand[EVAL_START:]
+        for method in METHODS:
+            error = actual - forecasts[method][EVAL_START:]
+            rows.append({"data": name, "method": method,
+                         "MAE": np.abs(error).mean(),
+                         "MAPE %": np.abs(error / actual).mean() * 100})
+    return pd.DataFrame(rows)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        storage.LOCAL_ROOT = Path(root)
+        calendar = load_calendar()
+        print(f"Calendar version {calendar.version}: {len(calendar):,} days, "
+              f"{(calendar.holiday != '').sum()} holidays\n")
+
+        print(accuracy(calendar).round(1).to_string(index=False))
+
+        rng = np.random.default_rng(0)
+        panel = rng.uniform(50, 500, (NUM_SERIES, NUM_DAYS)).round()
+        start = time.perf_counter()
+        baseline_forecasts(panel, first_day(pd.Series(pd.to_datetime(["2013-01-01"]))), calendar)
+        elapsed = time.perf_counter() - start
+        print(f"\nFull history, {NUM_SERIES:,} series x {NUM_DAYS:,} days: {elapsed * 1000:.0f} ms "
+              f"({NUM_SERIES * NUM_DAYS / elapsed / 1e6:.0f}M forecasts/s per method)")
+
+        # The pipeline's daily runs: one more day each time
+        df = pd.read_csv(REAL_DATA_PATH, parse_dates=["date"])
+        demand, day0 = df["demand"].to_numpy(dtype=np.float64), first_day(df["date"])
+        days = range(len(demand) - DAILY_RUNS, len(demand))
+        cached_forecasts(demand[:days[0]], day0, calendar=calendar)
+
+        start = time.perf_counter()
+        for n in days:
+            cached = cached_forecasts(demand[:n + 1], day0, calendar=calendar)
+        with_cache = (time.perf_counter() - start) / DAILY_RUNS
+        start = time.perf_counter()
+        for n in days:
+            baseline_forecasts(demand[:n + 1], day0, calendar, start=n)
+        new_day = (time.perf_counter() - start) / DAILY_RUNS
+        start = time.perf_counter()
+        for n in days:
+            full = baseline_forecasts(demand[:n + 1], day0, calendar)
+        without_cache = (time.perf_counter() - start) / DAILY_RUNS
+        for method in METHODS:
+            assert np.array_equal(cached[method], full[method], equal_nan=True), method
+
+        # A revised day half a year back is picked up from that day on
+        revised = demand.copy()
+        revised[-180] *= 1.5
+        start = time.perf_counter()
+        cached = cached_forecasts(revised, day0, calendar=calendar)
+        with_revision = time.perf_counter() - start
+        full = baseline_forecasts(revised, day0, calendar)
+        for method in METHODS:
+            assert np.array_equal(cached[method], full[method], equal_nan=True), method
+
+        print(f"\nDaily run of one {len(demand):,}-day series (cached forecasts identical):")
+        print(f"  whole history recomputed   {without_cache * 1000:6.2f} ms")
+        print(f"  new day only               {new_day * 1000:6.2f} ms")
+        print(f"  new day + cache read/write {with_cache * 1000:6.2f} ms")
+        print(f"  revised day 180 days back  {with_revision * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
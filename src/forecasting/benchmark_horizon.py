@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.forecasting.forecast_service import build_panel, forecast_panel, clear_cache
+
+# ── Horizon forecast latency ──────────────────────────────────
+# Target: a 28-day forecast with intervals for 1k series in < 10 ms.
+
+NUM_SERIES = 1000
+NUM_DAYS = 1826
+HORIZON = 28
+REPEATS = 20
+
+
+def make_demand(num_series=NUM_SERIES, num_days=NUM_DAYS, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2013-01-01", periods=num_days, freq="D")
+    weekly = np.where(dates.weekday < 5, 1.05, 0.9)
+    level = rng.uniform(20, 200, size=(num_series, 1))
+    demand = level * weekly * (1 + rng.normal(0, 0.1, size=(num_series, num_days)))
+    return pd.DataFrame({
+        "series_id": np.repeat([f"s{i}" for i in range(num_series)], num_days),
+        "date": np.tile(dates, num_series),
+        "demand": demand.ravel().round(),
+    })
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return np.median(times)
+
+
+def main():
+    df = make_demand()
+
+    start = time.perf_counter()
+    panel = build_panel(df)
+    print(f"Built {NUM_SERIES} x {NUM_DAYS} panel in {(time.perf_counter() - start):.2f}s")
+
+    def cold():
+        clear_cache()
+        forecast_panel(panel, horizon=HORIZON)
+
+    cold_ms = timed(cold, REPEATS)
+    forecast_panel(panel, horizon=HORIZON)
+    warm_ms = timed(lambda: forecast_panel(panel, horizon=HORIZON), REPEATS)
+    one_ms = timed(lambda: forecast_panel(panel, ["s42"], horizon=HORIZON), REPEATS)
+
+    print(f"{NUM_SERIES} series x {HORIZON} days, uncached : {cold_ms:.2f} ms")
+    print(f"{NUM_SERIES} series x {HORIZON} days, cached   : {warm_ms:.2f} ms")
+    print(f"1 series x {HORIZON} days, cached      : {one_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import hashlib
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import TH
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, Holiday, USLaborDay, USMartinLutherKingJr, USMemorialDay,
+    USPresidentsDay, USThanksgivingDay,
+)
+from pandas.tseries.offsets import DateOffset, Day, Easter
+
+from src.utils.config import DEFAULT_SERIES_ID, SERIES_COL
+from src.utils.metrics import record_cache
+from src.utils.storage import get_bytes, put_bytes, list_keys
+from src.utils.tenants import tenant_scope
+
+# ── Calendar-aware seasonal naive ─────────────────────────────
+# A family of cheap baselines, all lookups into one series' demand laid
+# out as a date-indexed array (position = days since its first date):
+#
+#   naive7    demand a week earlier (the pipeline's t-7 baseline)
+#   naive364  demand 52 weeks earlier, same weekday
+#   holiday   naive364, but a holiday looks up the same holiday last
+#             year, and a day whose t-364 was a holiday (Easter moves,
+#             fixed-date holidays change weekday) looks one week further
+#             back, so holiday spikes aren't copied onto ordinary days
+#   blend     BLEND_WEIGHT * naive7 + the rest * holiday rescaled by
+#             the year-over-year ratio of the trailing LEVEL_WINDOW days
+#
+# Where last year's lookup falls before the series starts, the holiday
+# and blend forecasts fall back to naive7.
+#
+# The holiday alignment comes from a calendar table (one row per day:
+# holiday name and aligned source day) computed once and kept in
+# storage; its content hash is the calendar version. Forecasts are
+# cached per (series, calendar version) in one block per month, next to
+# the demand they were computed from. A daily run computes only the days
+# after the first one whose demand differs from the cached demand (a
+# new day, or a revised one) and rewrites only the blocks from there:
+#
+#   calendar/holidays.csv
+#   forecast_cache/<calendar version>/<series_id>/<first day>/<YYYY-MM>.bin
+
+CALENDAR_KEY = "calendar/holidays.csv"
+FORECAST_CACHE_PREFIX = "forecast_cache/"
+
+METHODS = ("naive7", "naive364", "holiday", "blend")
+WEEK = 7
+YEAR = 364
+BLEND_WEIGHT = 0.5
+LEVEL_WINDOW = 28
+CALENDAR_START = "2000-01-01"
+CALENDAR_END = "2040-12-31"
+
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+class RetailHolidayCalendar(AbstractHolidayCalendar):
+    """US federal holidays on their actual dates, plus the days retail
+    demand reacts to."""
+    rules = [
+        Holiday("New Year's Day", month=1, day=1),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        Holiday("Easter", month=1, day=1, offset=[Easter()]),
+        USMemorialDay,
+        Holiday("Independence Day", month=7, day=4),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Black Friday", month=11, day=1, offset=[DateOffset(weekday=TH(4)), Day(1)]),
+        Holiday("Christmas Eve", month=12, day=24),
+        Holiday("Christmas", month=12, day=25),
+        Holiday("New Year's Eve", month=12, day=31),
+    ]
+
+
+# ── Calendar table ────────────────────────────────────────────
+def build_calendar(start=CALENDAR_START, end=CALENDAR_END):
+    """One row per day: the holiday on it ("" if none) and the day the
+    holiday lookup reads for it (`source`)."""
+    dates = pd.date_range(start, end, freq="D")
+    holidays = RetailHolidayCalendar().holidays(start, end, return_name=True)
+    names = holidays.reindex(dates).fillna("").to_numpy(dtype=object)
+
+    day = (dates.to_numpy().astype("datetime64[D]") - EPOCH).astype(np.int64)
+    source = day - YEAR
+    # Holidays read the same holiday a year back
+    on_holiday = pd.DataFrame({"name": names, "year": dates.year, "day": day})[names != ""]
+    previous = on_holiday.assign(year=on_holiday["year"] + 1)
+    matched = on_holiday.merge(previous, on=["name", "year"], suffixes=("", "_before"))
+    position = matched["day"].to_numpy() - day[0]
+    source[position] = matched["day_before"].to_numpy()
+
+    # Ordinary days whose t-364 was a holiday read a week further back
+    is_holiday = names != ""
+    shifted = np.flatnonzero(~is_holiday[YEAR:] & is_holiday[:-YEAR]) + YEAR
+    source[shifted] -= WEEK
+
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "holiday": names,
+        "source": (source.astype("datetime64[D]")).astype(str),
+    })
+
+
+class Calendar:
+    """The calendar table as day-number arrays, with its version."""
+
+    def __init__(self, table, version):
+        self.version = version
+        day = pd.to_datetime(table["date"]).to_numpy().astype("datetime64[D]")
+        self.first_day = int((day[0] - EPOCH).astype(np.int64))
+        self.source = (pd.to_datetime(table["source"]).to_numpy().astype("datetime64[D]") - EPOCH).astype(np.int64)
+        self.holiday = table["holiday"].fillna("").to_numpy(dtype=object)
+
+    def __len__(self):
+        return len(self.source)
+
+    def source_day(self, day):
+        """Aligned source day for each day number (day - YEAR outside
+        the table)."""
+        day = np.asarray(day, dtype=np.int64)
+        position = day - self.first_day
+        inside = (position >= 0) & (position < len(self))
+        return np.where(inside, self.source[np.clip(position, 0, len(self) - 1)], day - YEAR)
+
+
+_calendar = None
+
+
+def load_calendar():
+    """The stored calendar table, built and stored on first use. One
+    table serves every tenant."""
+    global _calendar
+    with tenant_scope(None):
+        body = get_bytes(CALENDAR_KEY)
+        if body is None:
+            body = build_calendar().to_csv(index=False).encode("utf-8")
+            put_bytes(CALENDAR_KEY, body)
+    version = hashlib.sha1(body).hexdigest()[:12]
+    if _calendar is None or _calendar.version != version:
+        _calendar = Calendar(pd.read_csv(BytesIO(body), keep_default_na=False), version)
+    return _calendar
+
+
+# ── Forecasts ─────────────────────────────────────────────────
+def _take(values, positions):
+    """values[..., positions], NaN where a position is before the start."""
+    out = values[..., np.maximum(positions, 0)]
+    out[..., positions < 0] = np.nan
+    return out
+
+
+def baseline_forecasts(values, first_day, calendar, start=0):
+    """Every method's forecast for positions start..n-1 of `values`
+    (1D, or 2D series x days sharing first_day), as {method: array}."""
+    values = np.asarray(values, dtype=np.float64)
+    t = np.arange(start, values.shape[-1])
+    source = calendar.source_day(first_day + t) - first_day
+
+    naive7 = _take(values, t - WEEK)
+    holiday = _take(values, source)
+
+    # Year-over-year level: trailing LEVEL_WINDOW days ending at t-1
+    # over the same window a year earlier (sums[i] = total before lo + i)
+    lo = max(start - YEAR - LEVEL_WINDOW, 0)
+    sums = np.concatenate([np.zeros(values.shape[:-1] + (1,)), np.nancumsum(values[..., lo:], axis=-1)], axis=-1)
+    u = t - lo
+    recent = _take(sums, u) - _take(sums, u - LEVEL_WINDOW)
+    year_ago = _take(sums, u - YEAR) - _take(sums, u - YEAR - LEVEL_WINDOW)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(year_ago > 0, recent / year_ago, np.nan)
+    yearly = holiday * ratio
+    blend = np.where(np.isnan(yearly), naive7, BLEND_WEIGHT * naive7 + (1 - BLEND_WEIGHT) * yearly)
+
+    return {
+        "naive7": naive7,
+        "naive364": _take(values, t - YEAR),
+        "holiday": np.where(np.isnan(holiday), naive7, holiday),
+        "blend": blend,
+    }
+
+
+# ── Cache ─────────────────────────────────────────────────────
+# A block is one raw float64 array: demand, then each method's
+# forecasts, over the block's days.
+BLOCK_ROWS = 1 + len(METHODS)
+
+def _cache_prefix(series_id, version, first_day):
+    return f"{FORECAST_CACHE_PREFIX}{version}/{series_id}/{first_day}/"
+
+
+def _block_start(month, first_day):
+    """Position of a block's first day in the series."""
+    day = np.datetime64(month, "D") - EPOCH
+    return max(int(day.astype(np.int64)) - first_day, 0)
+
+
+def _read_cache(series_id, version, first_day):
+    """The cached (demand, {method: forecasts}) from the series' first
+    day up to the first missing or out-of-place block."""
+    prefix = _cache_prefix(series_id, version, first_day)
+    blocks, done = [], 0
+    for key in sorted(list_keys(prefix)):
+        body = get_bytes(key)
+        if body is None or _block_start(key[len(prefix):-len(".bin")], first_day) != done:
+            break
+        blocks.append(np.frombuffer(body, dtype=np.float64).reshape(BLOCK_ROWS, -1))
+        done += blocks[-1].shape[1]
+    cache = np.concatenate(blocks, axis=1) if blocks else np.zeros((BLOCK_ROWS, 0))
+    return cache[0], dict(zip(METHODS, cache[1:]))
+
+
+def _write_cache(series_id, version, first_day, values, forecasts, start):
+    """Rewrite the month blocks holding positions start..n-1."""
+    months = (EPOCH + first_day + np.arange(len(values))).astype("datetime64[M]")
+    bounds = np.flatnonzero(np.r_[True, months[1:] != months[:-1], True])
+    prefix = _cache_prefix(series_id, version, first_day)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if hi <= start:
+            continue
+        block = np.stack([values[lo:hi]] + [forecasts[method][lo:hi] for method in METHODS])
+        put_bytes(f"{prefix}{months[lo]}.bin", block.astype(np.float64).tobytes())
+
+
+def cached_forecasts(values, first_day, series_id=DEFAULT_SERIES_ID, calendar=None):
+    """baseline_forecasts for the whole of `values` (one series), reusing
+    the cached days and computing only those from the first day whose
+    demand is new or changed. A series whose first day changes starts a
+    new cache."""
+    calendar = calendar or load_calendar()
+    values = np.asarray(values, dtype=np.float64)
+    cached_values, cached = _read_cache(series_id, calendar.version, first_day)
+
+    n = min(len(cached_values), len(values))
+    same = (cached_values[:n] == values[:n]) | (np.isnan(cached_values[:n]) & np.isnan(values[:n]))
+    # Recomputed from the first changed day itself (though its forecast
+    # only reads earlier days) so its block stores the new demand
+    done = n if same.all() else int(np.argmin(same))
+    record_cache("baseline_forecast", done >= len(values))
+    if done < len(values):
+        new = baseline_forecasts(values, first_day, calendar, start=done)
+        cached = {method: np.concatenate([cached[method][:done], new[method]]) for method in METHODS}
+        _write_cache(series_id, calendar.version, first_day, values, cached, done)
+    return {method: cached[method][:len(values)] for method in METHODS}
+
+
+def calendar_naive_forecast(df, method="naive7"):
+    """df with a `forecast` column from one of METHODS. df is one series
+    on a complete daily calendar (see src.data.validate)."""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}.")
+    df = df.copy()
+    day = df["date"].to_numpy().astype("datetime64[D]")
+    first_day = int((day[0] - EPOCH).astype(np.int64))
+    if len(day) > 1 and (np.diff(day).astype(np.int64) != 1).any():
+        raise ValueError("Dates must be consecutive days; run validate_demand first.")
+    series_id = str(df[SERIES_COL].iloc[0]) if SERIES_COL in df else DEFAULT_SERIES_ID
+    df["forecast"] = cached_forecasts(df["demand"].to_numpy(), first_day, series_id)[method]
+    return df
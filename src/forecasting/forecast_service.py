@@ -0,0 +1,109 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.forecasting.seasonal_naive import seasonal_naive_horizon
+from src.utils.config import SERIES_COL, DEFAULT_SERIES_ID
+from src.utils.metrics import record_cache
+from src.utils.tenants import current_tenant
+
+# ── Horizon forecast service ──────────────────────────────────
+# Demand is pivoted once into a dense (series x day) panel; forecasts
+# for any subset of series are then one vectorized seasonal-naive call.
+# Each series' forecast is cached per (tenant, data version, series,
+# as-of date), always at MAX_HORIZON steps, so shorter horizons are just
+# a slice; a panel built from updated demand never hits the old entries.
+
+MAX_HORIZON = 28
+SEASON_LENGTH = 7
+RESIDUAL_WINDOW = 364
+CACHE_SIZE = 100_000
+
+_forecast_cache = OrderedDict()
+
+
+def build_panel(df, version=None):
+    """Pivot long demand data (date, demand[, series_id]) into a dense
+    series x day matrix on a complete daily calendar. `version` marks
+    the demand data it was built from."""
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    if SERIES_COL not in df.columns:
+        df[SERIES_COL] = DEFAULT_SERIES_ID
+
+    wide = df.pivot_table(index=SERIES_COL, columns="date", values="demand", aggfunc="last")
+    dates = pd.date_range(wide.columns.min(), wide.columns.max(), freq="D")
+    wide = wide.reindex(columns=dates)
+
+    series_ids = wide.index.astype(str).to_numpy()
+    return {
+        "series_ids": series_ids,
+        "row": {sid: i for i, sid in enumerate(series_ids)},
+        "dates": dates,
+        "values": wide.to_numpy(dtype=np.float64),
+        "version": version,
+    }
+
+
+def _cache_put(key, value):
+    _forecast_cache[key] = value
+    if len(_forecast_cache) > CACHE_SIZE:
+        _forecast_cache.popitem(last=False)
+
+
+def clear_cache():
+    _forecast_cache.clear()
+
+
+def forecast_panel(panel, series_ids=None, as_of=None, horizon=MAX_HORIZON, level=0.95):
+    """Forecast the next `horizon` days after as_of for many series.
+
+    Returns a dict with the forecast dates and (series x horizon)
+    forecast / lower / upper arrays, rows ordered like series_ids.
+    """
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}.")
+
+    dates = panel["dates"]
+    as_of = dates[-1] if as_of is None else pd.Timestamp(as_of)
+    if as_of < dates[0] or as_of > dates[-1]:
+        raise ValueError(f"as_of {as_of.date()} is outside the data range.")
+    end = dates.get_loc(as_of) + 1
+
+    if series_ids is None:
+        series_ids = panel["series_ids"]
+    unknown = [sid for sid in series_ids if sid not in panel["row"]]
+    if unknown:
+        raise KeyError(f"Unknown series: {', '.join(map(str, unknown[:5]))}")
+
+    as_of_str = as_of.strftime("%Y-%m-%d")
+    tenant_id = current_tenant()
+    keys = [(tenant_id, panel["version"], sid, as_of_str, level) for sid in series_ids]
+    missing = [k for k in keys if k not in _forecast_cache]
+    record_cache("forecast", True, len(keys) - len(missing))
+    record_cache("forecast", False, len(missing))
+
+    if missing:
+        # Only the trailing window is needed; slice columns before rows
+        # so we never copy the full history
+        start = max(0, end - RESIDUAL_WINDOW - SEASON_LENGTH)
+        rows = [panel["row"][k[2]] for k in missing]
+        values = panel["values"][:, start:end][rows]
+        forecast, lower, upper = seasonal_naive_horizon(
+            values, MAX_HORIZON, SEASON_LENGTH, level, RESIDUAL_WINDOW
+        )
+        # One (3 x MAX_HORIZON) block per series keeps assembly to one stack
+        block = np.stack([forecast, lower, upper], axis=1)
+        for i, key in enumerate(missing):
+            _cache_put(key, block[i])
+
+    result = np.stack([_forecast_cache[k] for k in keys])[:, :, :horizon]
+    return {
+        "as_of": as_of_str,
+        "dates": pd.date_range(as_of + pd.Timedelta(days=1), periods=horizon, freq="D"),
+        "series_ids": list(series_ids),
+        "forecast": result[:, 0],
+        "lower": result[:, 1],
+        "upper": result[:, 2],
+    }
@@ -1,7 +1,42 @@
+import numpy as np
 import pandas as pd
+from statistics import NormalDist
 
 
 def seasonal_naive_forecast(df, season_length=7):
     df = df.copy()
     df["forecast"] = df["demand"].shift(season_length)
     return df
+
+
+def seasonal_naive_horizon(values, horizon=28, season_length=7, level=0.95,
+                           residual_window=364):
+    """Multi-step seasonal naive forecast with residual-based intervals.
+
+    values is a 1D array (one series) or 2D array (series x time) whose
+    last column is the as-of date. Step h repeats the value from the last
+    observed season, and its interval widens with the number of seasons
+    ahead: sigma * sqrt(k + 1), k = (h - 1) // season_length, where sigma
+    is the std of the in-sample t - season_length residuals over the last
+    residual_window days. Returns (forecast, lower, upper), each with
+    shape (..., horizon).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    if n < season_length + 2:
+        raise ValueError(f"Need at least {season_length + 2} observations, got {n}.")
+
+    steps = np.arange(horizon)
+    forecast = values[..., n - season_length + steps % season_length]
+
+    recent = values[..., -(residual_window + season_length):]
+    residuals = recent[..., season_length:] - recent[..., :-season_length]
+    if np.isnan(residuals).any():
+        sigma = np.nanstd(residuals, axis=-1, ddof=1)
+    else:
+        sigma = residuals.std(axis=-1, ddof=1)
+
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    widths = z * sigma[..., None] * np.sqrt(steps // season_length + 1)
+
+    return forecast, forecast - widths, forecast + widths
@@ -0,0 +1,97 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils import storage
+from src.ingestion.micro_batch import IngestProcessor, MicroBatcher
+
+# ── Ingestion throughput and latency ──────────────────────────
+# Streams NUM_DAYS days of demand for NUM_SERIES series through the
+# micro-batcher, with and without persisting raw points, outputs and
+# state to local storage. Sustained throughput is measured with the
+# producer submitting as fast as it can; end-to-end latency (submit to
+# scored) is measured with the producer paced at PACED_RATE points/s so
+# queueing behind the firehose doesn't dominate.
+
+NUM_SERIES = 1000
+NUM_DAYS = 365
+SERIES_PER_REQUEST = 100
+PACED_RATE = 50_000
+
+
+def make_requests(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2016-01-01", periods=NUM_DAYS, freq="D")
+    series_ids = np.array([f"store{i // 50}-item{i % 50}" for i in range(NUM_SERIES)])
+    level = rng.uniform(20, 200, size=NUM_SERIES)
+
+    requests = []
+    for date in dates:
+        weekly = 1.05 if date.weekday() < 5 else 0.9
+        demand = (level * weekly * (1 + rng.normal(0, 0.1, NUM_SERIES))).round()
+        for start in range(0, NUM_SERIES, SERIES_PER_REQUEST):
+            requests.append(pd.DataFrame({
+                "series_id": series_ids[start:start + SERIES_PER_REQUEST],
+                "date": date,
+                "demand": demand[start:start + SERIES_PER_REQUEST],
+            }))
+    return requests
+
+
+def run(requests, persist, rate=None):
+    # Fresh storage per run so state from an earlier run isn't reloaded
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.LOCAL_ROOT = Path(tmp)
+        return _run(requests, persist, rate)
+
+
+def _run(requests, persist, rate):
+    processor = IngestProcessor(persist=persist)
+    batcher = MicroBatcher(processor.process)
+
+    latencies = []
+
+    def record(submitted_at):
+        return lambda _: latencies.append(time.perf_counter() - submitted_at)
+
+    start = time.perf_counter()
+    futures = []
+    for i, points in enumerate(requests):
+        if rate is not None:
+            # Open-loop pacing: request i is due at i * size / rate
+            delay = start + i * SERIES_PER_REQUEST / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        future = batcher.submit(points)
+        future.add_done_callback(record(time.perf_counter()))
+        futures.append(future)
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - start
+    batcher.close()
+
+    total = sum(len(p) for p in requests)
+    return total / elapsed, np.array(latencies) * 1000
+
+
+def main():
+    requests = make_requests()
+    total = sum(len(p) for p in requests)
+    print(f"{total:,} points ({NUM_SERIES} series x {NUM_DAYS} days) "
+          f"in {len(requests):,} requests\n")
+
+    for persist in (False, True):
+        label = "score + persist" if persist else "score only"
+        rate, _ = run(requests, persist)
+        _, latencies = run(requests[:len(requests) // 4], persist, rate=PACED_RATE)
+        print(f"{label:<16} sustained {rate:>10,.0f} points/s   "
+              f"latency at {PACED_RATE:,}/s: "
+              f"p50 {np.percentile(latencies, 50):.0f} ms, "
+              f"p99 {np.percentile(latencies, 99):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
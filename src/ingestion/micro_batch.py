@@ -0,0 +1,195 @@
+import copy
+import json
+import threading
+import time
+from concurrent.futures import Future
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+from src.anomaly.anomaly_index import update_anomaly_index
+from src.ingestion.online_scorer import OnlineScorer
+from src.utils.storage import put_bytes, get_bytes, update_bytes
+
+# ── Streaming ingestion ───────────────────────────────────────
+# Demand points arrive over HTTP (POST /ingest) or from an append-only
+# NDJSON file. A MicroBatcher buffers them and hands each batch to an
+# IngestProcessor, which scores it with the persisted per-series state
+# and writes the raw points, the scored rows and the new state (and adds
+# any anomalies to the shared anomaly index):
+#
+#   ingest/raw/<batch_id>.parquet
+#   ingest/risk/<batch_id>.parquet
+#   ingest/scorer_state.npz
+
+INGEST_PREFIX = "ingest"
+RAW_PREFIX = f"{INGEST_PREFIX}/raw/"
+RISK_PREFIX = f"{INGEST_PREFIX}/risk/"
+STATE_KEY = f"{INGEST_PREFIX}/scorer_state.npz"
+
+MAX_BATCH_SIZE = 50_000
+MAX_BATCH_DELAY = 0.25  # seconds a point may wait for its batch to fill
+
+
+def _to_parquet(df):
+    buffer = BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+class IngestProcessor:
+    def __init__(self, season_length=7, window=30, persist=True):
+        self.season_length = season_length
+        self.window = window
+        self.persist = persist
+        # The state bytes self.scorer was loaded from or saved as
+        self._state = get_bytes(STATE_KEY) if persist else None
+        self.scorer = self._load(self._state)
+        self._lock = threading.Lock()
+
+    def _load(self, body):
+        if body is None:
+            return OnlineScorer(self.season_length, self.window)
+        return OnlineScorer.from_bytes(body)
+
+    def process(self, points):
+        """Score one batch and persist raw points, outputs and state.
+
+        Every API worker has its own processor, so the state is swapped
+        with a compare-and-swap: the batch is scored against the latest
+        saved state (reloaded if another worker saved since) and scored
+        again if another save lands first.
+        """
+        with self._lock:
+            if not self.persist:
+                return self.scorer.score(points)
+
+            attempt = {}
+
+            def score(body):
+                scorer = copy.deepcopy(self.scorer) if body == self._state else self._load(body)
+                attempt["scorer"], attempt["result"] = scorer, scorer.score(points)
+                return scorer.to_bytes()
+
+            self._state = update_bytes(STATE_KEY, score)
+            self.scorer = attempt["scorer"]
+            scored, rejected = attempt["result"]
+            # Zero-padded nanoseconds keep segment keys in arrival order
+            batch_id = f"{time.time_ns():020d}"
+            put_bytes(f"{RAW_PREFIX}{batch_id}.parquet", _to_parquet(points))
+            put_bytes(f"{RISK_PREFIX}{batch_id}.parquet", _to_parquet(scored))
+            update_anomaly_index(scored)
+        return scored, rejected
+
+
+class MicroBatcher:
+    """Buffer submitted points and process them in batches.
+
+    A batch is flushed once it holds max_batch_size points or its oldest
+    point has waited max_delay seconds. submit() returns a Future that
+    resolves to the batch's scored frame and the submission's own
+    rejected points, indexed by their position in what was submitted.
+    """
+
+    def __init__(self, process, max_batch_size=MAX_BATCH_SIZE, max_delay=MAX_BATCH_DELAY):
+        self._process = process
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending = []
+        self._pending_rows = 0
+        self._oldest = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, points):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed.")
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._pending.append((points, future))
+            self._pending_rows += len(points)
+            self._cond.notify()
+        return future
+
+    def close(self):
+        """Process whatever is buffered, then stop the worker thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _take_batch(self):
+        with self._cond:
+            while True:
+                if self._pending and (
+                    self._closed
+                    or self._pending_rows >= self.max_batch_size
+                    or time.monotonic() - self._oldest >= self.max_delay
+                ):
+                    batch = self._pending
+                    self._pending, self._pending_rows, self._oldest = [], 0, None
+                    return batch
+                if self._closed:
+                    return None
+                timeout = None if not self._pending else max(
+                    0.0, self.max_delay - (time.monotonic() - self._oldest)
+                )
+                self._cond.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            futures = [future for _, future in batch]
+            try:
+                result = self._process(pd.concat([p for p, _ in batch], ignore_index=True))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                scored, rejected = result
+                # The batch is the submissions end to end, so each one's
+                # rejected points are a range of the batch positions
+                start = 0
+                for points, future in batch:
+                    end = start + len(points)
+                    mine = rejected[(rejected.index >= start) & (rejected.index < end)]
+                    future.set_result((scored, mine.set_axis(mine.index - start)))
+                    start = end
+
+
+# ── File-tail consumer ────────────────────────────────────────
+def tail_file(path, batcher, poll_interval=1.0, stop_event=None):
+    """Follow an append-only NDJSON file of demand points.
+
+    Each line is {"series_id": ..., "date": "YYYY-MM-DD", "demand": ...}.
+    The byte offset of the last fully processed line is kept in
+    <path>.offset, so a restarted consumer resumes where it left off
+    (at-least-once; duplicate points are rejected by the scorer).
+    """
+    path = Path(path)
+    offset_path = path.with_name(path.name + ".offset")
+    offset = int(offset_path.read_text()) if offset_path.exists() else 0
+    stop_event = stop_event or threading.Event()
+
+    while not stop_event.is_set():
+        if path.exists():
+            with open(path, "rb") as f:
+                f.seek(offset)
+                chunk = f.read()
+            # Only consume complete lines; a partial last line waits
+            end = chunk.rfind(b"\n") + 1
+            if end:
+                records = [json.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+                if records:
+                    batcher.submit(pd.DataFrame.from_records(records)).result()
+                offset += end
+                offset_path.write_text(str(offset))
+                continue
+        stop_event.wait(poll_interval)
@@ -0,0 +1,224 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from src.risk.compute_risk import assign_risk_array
+from src.utils.schema import apply_schema, SCORED_SCHEMA
+
+# ── Online scorer ─────────────────────────────────────────────
+# The daily pipeline's seasonal naive (t - season_length) + rolling
+# z-score, maintained incrementally for many series at once. Like the
+# pipeline after validate_demand, it works by calendar day, not by
+# position: each series keeps its last demand on each day of the season
+# (slot date % season_length), so the baseline is the same weekday's
+# last observed demand, and a missing day is scored as validation would
+# impute it, from that same value, adding a zero residual to the window.
+# Each series also keeps its last window residuals with running sums.
+# All of it is stored as rows of shared numpy arrays, so a micro-batch
+# updates every series it touches in one vectorized step. The state
+# round-trips through bytes so it can be persisted between batches and
+# process restarts.
+
+NO_DAY = np.iinfo(np.int64).min
+
+
+class OnlineScorer:
+    def __init__(self, season_length=7, window=30, capacity=1024):
+        self.season_length = season_length
+        self.window = window
+        self.series_ids = []
+        self.index = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        # Last demand, and its day, per slot of the season
+        self.season_demand = np.zeros((capacity, self.season_length))
+        self.season_day = np.full((capacity, self.season_length), NO_DAY)
+        self.residual_ring = np.zeros((capacity, self.window))
+        self.residual_count = np.zeros(capacity, dtype=np.int64)
+        self.residual_sum = np.zeros(capacity)
+        self.residual_sumsq = np.zeros(capacity)
+        # Days since epoch of each series' last accepted point
+        self.last_day = np.full(capacity, NO_DAY)
+
+    def _grow(self, capacity):
+        arrays = {
+            name: getattr(self, name)
+            for name in ("season_demand", "season_day", "residual_ring", "residual_count",
+                         "residual_sum", "residual_sumsq", "last_day")
+        }
+        self._allocate(capacity)
+        for name, old in arrays.items():
+            getattr(self, name)[:len(old)] = old
+
+    def rows_for(self, series_ids):
+        """Row index for each series id, registering new series."""
+        rows = np.empty(len(series_ids), dtype=np.int64)
+        for i, sid in enumerate(series_ids):
+            row = self.index.get(sid)
+            if row is None:
+                row = len(self.series_ids)
+                self.index[sid] = row
+                self.series_ids.append(sid)
+            rows[i] = row
+        if len(self.series_ids) > len(self.last_day):
+            self._grow(max(len(self.series_ids), 2 * len(self.last_day)))
+        return rows
+
+    def _push(self, rows, residuals):
+        """Add one residual to the window of each of `rows` (unique)."""
+        w = self.window
+        wpos = self.residual_count[rows] % w
+        evicted = np.where(self.residual_count[rows] >= w, self.residual_ring[rows, wpos], 0.0)
+        self.residual_sum[rows] += residuals - evicted
+        self.residual_sumsq[rows] += residuals * residuals - evicted * evicted
+        self.residual_ring[rows, wpos] = residuals
+        self.residual_count[rows] += 1
+
+    def _fill_gaps(self, rows, days):
+        """Score the days missing before each point as imputed: their
+        demand is the seasonal forecast, so their residual is zero. Only
+        the last `window` of them can still be in the window."""
+        m = self.season_length
+        started = self.last_day[rows] != NO_DAY
+        gap = np.minimum(np.where(started, days - self.last_day[rows] - 1, 0), self.window)
+        for k in range(int(gap.max(initial=0)), 0, -1):
+            sel = gap >= k
+            r, missing = rows[sel], days[sel] - k
+            r = r[self.season_day[r, missing % m] != NO_DAY]
+            self._push(r, np.zeros(len(r)))
+
+    def _step(self, rows, days, demand):
+        """Score one point for each of `rows` (which must be unique)."""
+        m, w = self.season_length, self.window
+        self._fill_gaps(rows, days)
+
+        slot = days % m
+        forecast = np.where(self.season_day[rows, slot] != NO_DAY, self.season_demand[rows, slot], np.nan)
+        self.season_demand[rows, slot] = demand
+        self.season_day[rows, slot] = days
+        self.last_day[rows] = days
+
+        residual = demand - forecast
+        has_residual = ~np.isnan(residual)
+        r = rows[has_residual]
+        self._push(r, residual[has_residual])
+
+        mean = np.full(len(rows), np.nan)
+        std = np.full(len(rows), np.nan)
+        full = self.residual_count[r] >= w
+        idx = np.flatnonzero(has_residual)[full]
+        mean[idx] = self.residual_sum[r[full]] / w
+        var = (self.residual_sumsq[r[full]] - w * mean[idx] ** 2) / (w - 1)
+        std[idx] = np.sqrt(np.maximum(var, 0.0))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (residual - mean) / std
+        return forecast, residual, mean, std, z
+
+    def score(self, points):
+        """Score a batch of points (series_id, date, demand).
+
+        Points are applied per series in date order; a batch may hold
+        several days for the same series. Points not newer than the last
+        accepted date for their series are rejected. Returns (scored,
+        rejected) frames; scored includes warm-up rows with NaN z_score.
+        """
+        points = points.reset_index(drop=True)
+        series_ids = points["series_id"].astype(str).to_numpy()
+        days = pd.to_datetime(points["date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+        demand = points["demand"].to_numpy(dtype=np.float64)
+        rows = self.rows_for(series_ids)
+
+        order = np.lexsort((days, rows))
+        rows, days, demand = rows[order], days[order], demand[order]
+        # Rank of each point within its series: round k applies the
+        # k-th point of every series in one vectorized step
+        starts = np.r_[0, np.flatnonzero(np.diff(rows)) + 1]
+        rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+
+        out = {k: np.full(len(rows), np.nan) for k in ("forecast", "residual", "mean", "std", "z")}
+        accepted = np.zeros(len(rows), dtype=bool)
+        for k in range(rank.max() + 1 if len(rank) else 0):
+            sel = np.flatnonzero(rank == k)
+            sel = sel[days[sel] > self.last_day[rows[sel]]]
+            if len(sel) == 0:
+                continue
+            results = self._step(rows[sel], days[sel], demand[sel])
+            for key, values in zip(out, results):
+                out[key][sel] = values
+            accepted[sel] = True
+
+        original = order[accepted]
+        scored = pd.DataFrame({
+            "series_id": series_ids[original],
+            "date": days[accepted].astype("datetime64[D]"),
+            "demand": demand[accepted],
+            "forecast": out["forecast"][accepted],
+            "residual": out["residual"][accepted],
+            "rolling_mean": out["mean"][accepted],
+            "rolling_std": out["std"][accepted],
+            "z_score": out["z"][accepted],
+        })
+        scored["date"] = scored["date"].astype("datetime64[ns]")
+        scored["risk_level"] = np.where(
+            np.isfinite(scored["z_score"]), assign_risk_array(scored["z_score"]), None
+        )
+        scored["anomaly_flag"] = (scored["z_score"].abs() >= 2).astype(int)
+
+        return apply_schema(scored, SCORED_SCHEMA), points.iloc[order[~accepted]]
+
+    # ── Persistence ───────────────────────────────────────────
+    def to_bytes(self):
+        n = len(self.series_ids)
+        buffer = BytesIO()
+        np.savez_compressed(
+            buffer,
+            season_length=self.season_length,
+            window=self.window,
+            series_ids=np.array(self.series_ids, dtype=str),
+            season_demand=self.season_demand[:n],
+            season_day=self.season_day[:n],
+            residual_ring=self.residual_ring[:n],
+            residual_count=self.residual_count[:n],
+            last_day=self.last_day[:n],
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, body):
+        data = np.load(BytesIO(body))
+        series_ids = data["series_ids"].tolist()
+        scorer = cls(int(data["season_length"]), int(data["window"]),
+                     capacity=max(len(series_ids), 1024))
+        scorer.series_ids = series_ids
+        scorer.index = {sid: i for i, sid in enumerate(series_ids)}
+        n = len(series_ids)
+        for name in ("residual_ring", "residual_count", "last_day"):
+            getattr(scorer, name)[:n] = data[name]
+        if "season_day" in data:
+            scorer.season_demand[:n] = data["season_demand"]
+            scorer.season_day[:n] = data["season_day"]
+        else:
+            scorer._from_positional(data["demand_ring"], data["demand_count"])
+
+        # Running sums are rebuilt exactly from the residual rings
+        filled = np.minimum(scorer.residual_count[:n], scorer.window)
+        mask = np.arange(scorer.window) < filled[:, None]
+        ring = np.where(mask, scorer.residual_ring[:n], 0.0)
+        scorer.residual_sum[:n] = ring.sum(axis=1)
+        scorer.residual_sumsq[:n] = (ring * ring).sum(axis=1)
+        return scorer
+
+    def _from_positional(self, demand_ring, demand_count):
+        """Load state saved before the scorer was calendar-aware: a ring
+        of each series' last season_length points, taken to be the
+        consecutive days up to its last day."""
+        m = self.season_length
+        rows = np.arange(len(demand_count))
+        for age in range(m):
+            has = demand_count > age
+            day = self.last_day[rows[has]] - age
+            self.season_demand[rows[has], day % m] = demand_ring[rows[has], (demand_count[has] - 1 - age) % m]
+            self.season_day[rows[has], day % m] = day
@@ -0,0 +1,81 @@
+import io
+import os
+from contextlib import redirect_stdout
+
+# Measure against the in-memory S3 stand-in
+os.environ["USE_S3"] = "true"
+os.environ.setdefault("S3_BUCKET", "local-benchmark")
+
+import pandas as pd
+
+from src.utils import config
+from src.utils import risk_store
+from src.utils.local_s3 import LocalS3Client
+from src.forecasting.seasonal_naive import seasonal_naive_forecast
+from src.anomaly.residual_anomaly import compute_residual, compute_rolling_z_score
+from src.risk.compute_risk import assign_risk
+
+# ── Bytes written per daily run ───────────────────────────────
+# Replays every daily run over the real dataset twice: once with the
+# old full-history rewrite of daily_risk_output.csv, once with the
+# partitioned store (one-row partition + manifest + monthly compaction).
+
+REPORT_DAYS = [1, 30, 365, 730, 1095, 1460]
+
+
+def score_history():
+    df = pd.read_csv(config.REAL_DATA_PATH)
+    df["date"] = pd.to_datetime(df["date"])
+    df = seasonal_naive_forecast(df).dropna(subset=["forecast"])
+    df = compute_rolling_z_score(compute_residual(df), window=30)
+    df = df.dropna(subset=["z_score"]).reset_index(drop=True)
+    df["risk_level"] = df["z_score"].apply(assign_risk)
+    df["anomaly_flag"] = (df["z_score"].abs() >= 2).astype(int)
+    return df
+
+
+def replay(df, partitioned):
+    s3 = LocalS3Client()
+    config.set_s3_client(s3)
+
+    per_run = []
+    for i in range(len(df)):
+        before = s3.bytes_written
+        latest_row = df.iloc[i:i + 1]
+        if partitioned:
+            date_str = latest_row["date"].iloc[0].strftime("%Y-%m-%d")
+            risk_store.write_partition(latest_row, date_str)
+            risk_store.publish_partition(date_str)
+        else:
+            s3.put_object(Bucket=config.S3_BUCKET, Key="daily_risk_output.csv",
+                          Body=df.iloc[:i + 1].to_csv(index=False))
+        per_run.append(s3.bytes_written - before)
+    return per_run, s3
+
+
+def main():
+    df = score_history()
+
+    with redirect_stdout(io.StringIO()):
+        legacy, _ = replay(df, partitioned=False)
+        partitioned, s3 = replay(df, partitioned=True)
+
+    print(f"Replayed {len(df)} daily runs\n")
+    print(f"{'Run':>6} {'Full rewrite (B)':>18} {'Partitioned (B)':>17}")
+    for day in REPORT_DAYS:
+        if day <= len(df):
+            print(f"{day:>6} {legacy[day - 1]:>18,} {partitioned[day - 1]:>17,}")
+
+    print(f"\nTotal bytes written, full rewrite : {sum(legacy):,}")
+    print(f"Total bytes written, partitioned  : {sum(partitioned):,}")
+    print(f"Reduction                         : {sum(legacy) / sum(partitioned):.1f}x")
+
+    manifest = risk_store.load_manifest()
+    formats = pd.Series([p["format"] for p in manifest["partitions"]]).value_counts()
+    print(f"\nPartitions in manifest: {formats.to_dict()}")
+    print(f"Rows readable         : {len(risk_store.read_history())}")
+    print(f"S3 requests           : {dict(s3.request_counts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from api.app import app
+from src.pipeline.portfolio import run_portfolio
+from src.utils import config, storage
+from src.utils.tenants import register_tenant
+
+# ── Portfolio throughput ──────────────────────────────────────
+# Registers NUM_TENANTS tenants in a temporary local store, each with
+# its own rescaled and noised copy of the real demand data, then times
+# portfolio runs (one daily step per tenant) at each pool size in
+# WORKERS, and tenant-scoped API reads across every tenant. The first
+# run is the cold one: it builds each tenant's forecast cache.
+
+NUM_TENANTS = 1000
+WORKERS = [1, 4, 8]
+
+
+def register(rng):
+    demand = pd.read_csv(config.REAL_DATA_PATH)
+    for i in range(NUM_TENANTS):
+        scale = rng.uniform(0.1, 10)
+        noise = rng.normal(1, 0.05, len(demand))
+        tenant = demand.assign(demand=(demand["demand"] * scale * noise).round().astype(int))
+        register_tenant(f"tenant-{i:04d}", tenant.to_csv(index=False))
+
+
+def timed_run(max_workers):
+    start = time.perf_counter()
+    results = run_portfolio(max_workers=max_workers)
+    elapsed = time.perf_counter() - start
+    failed = [r for r in results if r["status"] != "ok"]
+    assert not failed, failed[:3]
+    return elapsed, np.median([r["seconds"] for r in results])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        storage.LOCAL_ROOT = root
+        config.CURSOR_PATH = root / "cursor.json"
+        config.CURSOR_LOCK_PATH = root / "cursor.lock"
+
+        start = time.perf_counter()
+        register(np.random.default_rng(0))
+        print(f"Registered {NUM_TENANTS:,} tenants in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'Run':<14} {'Workers':>7} {'Seconds':>8} {'Tenants/s':>10} {'Median tenant':>14}")
+        elapsed, median = timed_run(max(WORKERS))
+        print(f"{'cold':<14} {max(WORKERS):>7} {elapsed:>8.1f} {NUM_TENANTS / elapsed:>10.1f} {median * 1000:>11.0f} ms")
+        for workers in WORKERS:
+            elapsed, median = timed_run(workers)
+            print(f"{'warm':<14} {workers:>7} {elapsed:>8.1f} {NUM_TENANTS / elapsed:>10.1f} {median * 1000:>11.0f} ms")
+
+        # Every tenant's latest reading through the tenant-scoped routes
+        client = TestClient(app)
+        start = time.perf_counter()
+        for i in range(NUM_TENANTS):
+            response = client.get(f"/tenants/tenant-{i:04d}/latest-risk")
+            assert response.status_code == 200, response.text
+        elapsed = time.perf_counter() - start
+        print(f"\nAPI: /tenants/<id>/latest-risk for {NUM_TENANTS:,} tenants, "
+              f"{NUM_TENANTS / elapsed:,.0f} requests/s")
+        assert client.get("/tenants/unknown/latest-risk").status_code == 404
+
+
+if __name__ == "__main__":
+    main()
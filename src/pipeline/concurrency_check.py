@@ -0,0 +1,72 @@
+import io
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+# Point the pipeline at the in-memory S3 stand-in before it is imported
+os.environ["USE_S3"] = "true"
+os.environ.setdefault("S3_BUCKET", "local-concurrency-check")
+
+import pandas as pd
+
+from src.utils import config
+from src.utils.local_s3 import LocalS3Client
+from src.pipeline.daily_pipeline import main as run_pipeline
+from src.utils.risk_store import read_history
+
+# ── Concurrency check ─────────────────────────────────────────
+# Fires many overlapping pipeline invocations (as EventBridge retries
+# plus manual runs would) against one local S3 bucket, then checks the
+# cursor advanced exactly once per processed day: no gaps, no duplicates.
+
+ROUNDS = 40
+CONCURRENT_RUNS = 16
+
+
+def main():
+    s3 = LocalS3Client()
+    config.set_s3_client(s3)
+
+    demand = pd.read_csv(config.REAL_DATA_PATH)
+    s3.put_object(
+        Bucket=config.S3_BUCKET,
+        Key="real_retail_demand.csv",
+        Body=demand.to_csv(index=False),
+    )
+
+    processed = []
+    with redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=CONCURRENT_RUNS) as pool:
+            for _ in range(ROUNDS):
+                futures = [pool.submit(run_pipeline) for _ in range(CONCURRENT_RUNS)]
+                processed += [f.result() for f in futures]
+
+    processed = [d for d in processed if d is not None]
+    counts = Counter(processed)
+    duplicates = sorted(d for d, n in counts.items() if n > 1)
+
+    dates = pd.to_datetime(demand["date"]).sort_values().dt.strftime("%Y-%m-%d")
+    expected = dates.iloc[36:36 + len(counts)].tolist()
+    gaps = sorted(set(expected) - set(counts))
+
+    cursor = config.read_cursor()
+    history = read_history()
+    output_dates = history["date"].dt.strftime("%Y-%m-%d").tolist()
+
+    print(f"Invocations        : {ROUNDS * CONCURRENT_RUNS}")
+    print(f"Days processed     : {len(counts)}")
+    print(f"Cursor             : {cursor}")
+    print(f"Duplicates         : {duplicates or 'none'}")
+    print(f"Gaps               : {gaps or 'none'}")
+    print(f"S3 requests        : {dict(s3.request_counts)}")
+
+    assert not duplicates, "A day was processed more than once."
+    assert not gaps, "A day was skipped."
+    assert cursor == expected[-1], "Cursor does not match the last processed day."
+    assert output_dates == expected, "Risk history does not match processed days."
+    print("Concurrency check passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+import base64
+import contextvars
+import hashlib
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from src.utils.metrics import record_cache
+from src.utils.storage import delete_key, update_bytes
+
+# ── Stage graph ───────────────────────────────────────────────
+# A pipeline is a list of stages, each a plain function with named
+# inputs and outputs. Stages run in waves: every stage whose inputs
+# (and `after` stages) are ready runs in the same wave, on a small
+# thread pool, so independent stages overlap.
+#
+# Every value gets a content hash, and each stage run a key hashing its
+# name, function, params, version and input hashes. A stage with
+# cache=True keeps its outputs under that key in memory (the last
+# STAGE_CACHE_SIZE across stages and tenants), so a run in the same
+# process whose inputs are unchanged reuses them instead of
+# recomputing. Nothing is written to storage for it.
+#
+# With a checkpoint name, a failed run is resumed by the next run with
+# that name. Two kinds of stage record their results for this:
+# resume=True stages (which read outside state, like the cursor) and
+# effect=True stages (which write it). On resume those are skipped and
+# their outputs restored; the rest rerun, cheaply when cached. So a run
+# that advanced the cursor and then failed to publish publishes that
+# same day, rather than moving on to the next. Results are recorded
+# after each effect and on failure, in one object per checkpoint:
+#
+#   checkpoints/<name>.json  owner, status, heartbeat, finished stages
+#                            with their keys and outputs
+#
+# The checkpoint is data only (see _encode), never pickled, and meant
+# for small values: a resumable stage should output a date, a version,
+# a state object or the rows that are new, not a whole history.
+#
+# A run that died without recording its failure is resumed once its
+# heartbeat is STALE_SECONDS old; a run that finds the checkpoint held
+# by a live run goes ahead without one.
+
+CHECKPOINT_PREFIX = "checkpoints/"
+STAGE_CACHE_SIZE = 32
+STALE_SECONDS = 900
+MAX_WORKERS = 4
+
+
+class StopPipeline(Exception):
+    """Raised by a stage to end the run early with `status` (not a
+    failure: the checkpoint is cleared)."""
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class Stage:
+    def __init__(self, name, fn, inputs=(), outputs=(), params=None, cache=False, resume=False,
+                 effect=False, after=(), version=1):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.params = dict(params or {})
+        self.cache = cache
+        self.resume = resume or effect
+        self.effect = effect
+        self.after = tuple(after)
+        self.version = version
+
+    def key(self, input_hash):
+        """Content key of this stage run; input_hash(name) hashes an
+        input."""
+        identity = [self.name, _function_id(self.fn), self.version,
+                    self.params, [input_hash(name) for name in self.inputs]]
+        return hashlib.sha1(json.dumps(identity, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def __call__(self, values):
+        result = self.fn(*(values[name] for name in self.inputs), **self.params)
+        if len(self.outputs) == 0:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        return dict(zip(self.outputs, result))
+
+
+def _function_id(fn):
+    # Stages defined in a module run with `python -m` keep their key
+    module = fn.__module__
+    if module == "__main__":
+        spec = getattr(sys.modules["__main__"], "__spec__", None)
+        module = spec.name if spec is not None else module
+    return f"{module}.{fn.__qualname__}"
+
+
+def _update(digest, values):
+    """Feed one column or index to digest."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        digest.update(values.codes.tobytes() if hasattr(values, "codes") else values.cat.codes.to_numpy().tobytes())
+        _update(digest, values.dtype.categories)
+        return
+    array = values.to_numpy()
+    if array.dtype.kind in "biufcmM":
+        digest.update(np.ascontiguousarray(array).tobytes())
+    else:
+        digest.update(pd.util.hash_array(array.astype(object)).tobytes())
+
+
+def content_hash(value):
+    digest = hashlib.sha1()
+    if isinstance(value, pd.DataFrame):
+        digest.update(json.dumps([list(map(str, value.columns)), list(map(str, value.dtypes))]).encode("utf-8"))
+        _update(digest, value.index)
+        for column in range(value.shape[1]):
+            _update(digest, value.iloc[:, column])
+    else:
+        digest.update(json.dumps(_encode(value), sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+# ── Checkpoint values ─────────────────────────────────────────
+# JSON, with tagged forms for what JSON lacks: frames (as Parquet),
+# timestamps, tuples, and objects with to_dict/from_dict (as their
+# state). An object is only rebuilt if its class's module is already
+# loaded, so a checkpoint can't make the pipeline import anything.
+def _encode(value):
+    if isinstance(value, pd.DataFrame):
+        buffer = BytesIO()
+        value.to_parquet(buffer)
+        return {"__frame__": base64.b64encode(buffer.getvalue()).decode("ascii")}
+    if isinstance(value, pd.Timestamp):
+        return {"__timestamp__": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _encode(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "to_dict") and hasattr(type(value), "from_dict"):
+        cls = type(value)
+        return {"__object__": f"{cls.__module__}:{cls.__qualname__}", "state": _encode(value.to_dict())}
+    raise TypeError(f"Can't checkpoint a {type(value).__name__}.")
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__frame__" in value:
+        return pd.read_parquet(BytesIO(base64.b64decode(value["__frame__"])))
+    if "__timestamp__" in value:
+        return pd.Timestamp(value["__timestamp__"])
+    if "__tuple__" in value:
+        return tuple(_decode(v) for v in value["__tuple__"])
+    if "__object__" in value:
+        module, _, name = value["__object__"].partition(":")
+        cls = getattr(sys.modules.get(module), name, None)
+        if not hasattr(cls, "from_dict"):
+            raise ValueError(f"Can't restore a {value['__object__']} from a checkpoint.")
+        return cls.from_dict(_decode(value["state"]))
+    return {k: _decode(v) for k, v in value.items()}
+
+
+def _dump(state):
+    return json.dumps(_encode(state), separators=(",", ":"))
+
+
+def _load(body):
+    return _decode(json.loads(body)) if body else None
+
+
+# Cached stage outputs by stage key, most recently used last
+_stage_cache = OrderedDict()
+_stage_cache_lock = threading.Lock()
+
+
+def _cached_outputs(key):
+    with _stage_cache_lock:
+        outputs = _stage_cache.get(key)
+        if outputs is not None:
+            _stage_cache.move_to_end(key)
+        return outputs
+
+
+def _cache_outputs(key, outputs):
+    with _stage_cache_lock:
+        _stage_cache[key] = outputs
+        _stage_cache.move_to_end(key)
+        while len(_stage_cache) > STAGE_CACHE_SIZE:
+            _stage_cache.popitem(last=False)
+
+
+# One pool per process for parallel waves, shared by every run (and
+# tenant); stages never wait on other stages, so it cannot deadlock.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="stage")
+        return _pool
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = list(stages)
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Stage names must be unique.")
+        self.producer = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in self.producer:
+                    raise ValueError(f"{output!r} is produced by both {self.producer[output]} and {stage.name}.")
+                self.producer[output] = stage.name
+        for stage in self.stages:
+            unknown = [name for name in stage.after if name not in names]
+            if unknown:
+                raise ValueError(f"{stage.name} runs after unknown stage {unknown[0]!r}.")
+
+    def replace(self, name, **changes):
+        """A copy with stage `name` rebuilt with `changes` (fn, params,
+        cache, ...), e.g. to swap the forecaster."""
+        stages = []
+        for stage in self.stages:
+            if stage.name == name:
+                fields = {**vars(stage), **changes}
+                stage = Stage(**fields)
+            stages.append(stage)
+        if all(stage.name != name for stage in self.stages):
+            raise KeyError(f"No stage named {name!r}.")
+        return Pipeline(stages)
+
+    def waves(self, inputs=()):
+        """Stages grouped into waves; each wave only needs values and
+        stages from the waves before it."""
+        ready, done, waves = set(inputs), set(), []
+        remaining = list(self.stages)
+        while remaining:
+            wave = [s for s in remaining
+                    if all(name in ready for name in s.inputs) and all(name in done for name in s.after)]
+            if not wave:
+                missing = sorted({name for s in remaining for name in s.inputs if name not in ready
+                                  and name not in self.producer})
+                raise ValueError(f"Unsatisfiable stages {[s.name for s in remaining]}"
+                                 + (f"; missing inputs {missing}" if missing else " (cycle)"))
+            waves.append(wave)
+            for stage in wave:
+                ready.update(stage.outputs)
+                done.add(stage.name)
+            remaining = [s for s in remaining if s.name not in done]
+        return waves
+
+    # ── Running ───────────────────────────────────────────────
+    def run(self, inputs=None, checkpoint=None, metrics=None):
+        """Run every stage. Returns (status, values), status "ok" or a
+        StopPipeline status; a failure is recorded and re-raised."""
+        run = _Run(self, dict(inputs or {}), checkpoint, metrics)
+        return run.execute()
+
+
+class _Run:
+    def __init__(self, pipeline, inputs, checkpoint, metrics):
+        self.pipeline = pipeline
+        self.metrics = metrics
+        self.owner = uuid.uuid4().hex
+        self.state_key = None if checkpoint is None else f"{CHECKPOINT_PREFIX}{checkpoint}.json"
+        self.claimed = False
+        self.finished = {}   # stage -> (key, outputs), of a failed run being resumed
+        self.pending = {}    # stage -> (key, outputs), finished but not yet recorded
+        self.recorded = {}
+        if self.state_key is not None:
+            self._resume()
+        self.values = dict(inputs)
+        self.hashes = {}
+
+    # ── Checkpoint ────────────────────────────────────────────
+    def _resume(self):
+        """Take over the checkpoint if it holds a failed or stale run."""
+        def claim(body):
+            state = _load(body)
+            if state is None or (state["status"] == "running"
+                                 and time.time() - state["heartbeat"] < STALE_SECONDS):
+                return None
+            self.finished = state["finished"]
+            self.recorded = dict(self.finished)
+            return self._state("running")
+
+        body = update_bytes(self.state_key, claim)
+        if body is not None and _load(body)["owner"] == self.owner:
+            self.claimed = True
+        elif body is not None:
+            self.state_key = None   # a live run holds it
+        if not self.claimed:
+            self.finished, self.recorded = {}, {}
+
+    def _state(self, status):
+        return _dump({"owner": self.owner, "status": status, "heartbeat": time.time(),
+                      "finished": {**self.recorded, **self.pending}})
+
+    def _flush(self, status="running"):
+        """Record pending results (claiming the checkpoint on first use)."""
+        if self.state_key is None or (not self.pending and status == "running"):
+            return
+
+        def record(body):
+            state = _load(body)
+            if self.claimed:
+                if state is None or state["owner"] != self.owner:
+                    return None
+            elif state is not None and time.time() - state["heartbeat"] < STALE_SECONDS:
+                return None
+            return self._state(status)
+
+        body = update_bytes(self.state_key, record)
+        if body is None or _load(body)["owner"] != self.owner:
+            self.state_key = None   # lost it to another run; carry on without
+            return
+        self.claimed = True
+        self.recorded.update(self.pending)
+        self.pending.clear()
+
+    def _clear(self):
+        if self.state_key is not None and self.claimed:
+            delete_key(self.state_key)
+
+    # ── Stages ────────────────────────────────────────────────
+    def _timed(self, stage):
+        return nullcontext() if self.metrics is None else self.metrics.stage(stage.name)
+
+    def _hash(self, name):
+        # Only keyed stages need hashes, so values are hashed on demand
+        if name not in self.hashes:
+            self.hashes[name] = content_hash(self.values[name])
+        return self.hashes[name]
+
+    def _run_stage(self, stage):
+        """(key, outputs) of one stage, from a checkpoint, the cache or
+        a run. Stages that are neither cached nor checkpointed have no
+        key."""
+        keyed = stage.cache or (stage.resume and self.state_key is not None)
+        key = stage.key(self._hash) if keyed else None
+        finished = self.finished.get(stage.name)
+        if key is not None and stage.resume and finished is not None and finished[0] == key:
+            return finished
+        if stage.cache:
+            cached = _cached_outputs(key)
+            record_cache("stage", cached is not None)
+            if cached is not None:
+                return key, cached
+        with self._timed(stage):
+            outputs = stage(self.values)
+        if stage.cache:
+            _cache_outputs(key, outputs)
+        return key, outputs
+
+    def _finish(self, stage, key, outputs):
+        self.values.update(outputs)
+        if key is not None and stage.resume and self.recorded.get(stage.name, (None,))[0] != key:
+            self.pending[stage.name] = (key, outputs)
+
+    def _run_wave(self, wave):
+        if len(wave) == 1:
+            self._finish(wave[0], *self._run_stage(wave[0]))
+            return
+        # Workers see the caller's context (the tenant)
+        futures = [_executor().submit(contextvars.copy_context().run, self._run_stage, stage) for stage in wave]
+        # Keep every stage that finished before raising, so a resume
+        # skips them
+        error = None
+        for stage, future in zip(wave, futures):
+            try:
+                self._finish(stage, *future.result())
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def execute(self):
+        status = "ok"
+        try:
+            waves = self.pipeline.waves(self.values)
+            for i, wave in enumerate(waves):
+                self._run_wave(wave)
+                # Record after each effect (bar the last: the run is done)
+                if i < len(waves) - 1 and any(stage.effect for stage in wave):
+                    self._flush()
+        except StopPipeline as stop:
+            status = stop.status
+        except Exception:
+            self._flush("failed")
+            raise
+        self._clear()
+        return status, self.values
@@ -1,97 +1,239 @@
-import json
-import os
 import pandas as pd
-import boto3
-from pathlib import Path
-from src.utils.config import read_demand_data, read_cursor, write_cursor, USE_S3, S3_BUCKET
-from src.forecasting.seasonal_naive import seasonal_naive_forecast
-from src.anomaly.residual_anomaly import compute_residual, compute_rolling_z_score
-from src.risk.compute_risk import assign_risk
-
-
-def save_to_s3(df, key):
-    """Save a dataframe as CSV directly to S3."""
-    s3 = boto3.client("s3")
-    s3.put_object(
-        Bucket=S3_BUCKET,
-        Key=key,
-        Body=df.to_csv(index=False)
-    )
-    print(f"Saved {key} to S3.")
-
-
-def save_outputs(df, latest_row):
-    """Save pipeline outputs either locally or to S3."""
-    if USE_S3:
-        save_to_s3(df, "daily_risk_output.csv")
-        save_to_s3(latest_row, "latest_risk.csv")
-    else:
-        # Local development
-        Path("artifacts").mkdir(exist_ok=True)
-        df.to_csv("artifacts/daily_risk_output.csv", index=False)
-        latest_row.to_csv("artifacts/latest_risk.csv", index=False)
-        print("Saved outputs locally.")
-
-
-def main():
-    # Load data
-
+from src.utils.config import (
+    read_demand_data,
+    read_store_item_sales,
+    read_cursor_state,
+    write_cursor,
+    CursorConflictError,
+    BASELINE_METHOD,
+    RISK_SCORER,
+    CHANGE_POINT_RESET,
+    USE_S3,
+)
+from src.data.validate import validate_demand, describe_quality
+from src.forecasting.calendar_naive import calendar_naive_forecast
+from src.forecasting.sarima import sarima_forecast
+from src.anomaly.residual_anomaly import compute_residual
+from src.anomaly.change_point import score_with_change_points, save_detector
+from src.anomaly.rolling_stats import rolling_stats, WINDOWS, Z_COLUMNS
+from src.anomaly.quantile_sketch import score_with_digest, save_digest
+from src.risk.compute_risk import assign_risk, assign_tail_risk, TAIL_PROBABILITIES
+from src.utils.schema import apply_schema, compact_demand
+from src.utils.risk_store import write_partition, publish_partition
+from src.utils.risk_release import publish_release
+from src.anomaly.anomaly_index import update_anomaly_index
+from src.data.aggregation_cube import refresh_cube
+from src.utils.metrics import PipelineRun
+from src.pipeline.dag import Pipeline, Stage, StopPipeline
+from src.utils.storage import put_bytes
+from src.utils.tenants import tenant_config
+
+
+def save_outputs(latest_row):
+    """Save the latest reading for the dashboard, locally or to S3
+    (under the active tenant's prefix)."""
+    put_bytes("latest_risk.csv", latest_row.to_csv(index=False))
+
+
+# ── Stages ────────────────────────────────────────────────────
+# The daily step as a stage graph (see src.pipeline.dag). Validation and
+# the forecast are cached; the cursor and detector reads are restored
+# and the writes skipped when a failed run is resumed.
+def load_stage():
     df = read_demand_data()
-
     if df.empty:
         raise ValueError("Input dataset is empty.")
+    return df
+
+
+def validate_stage(raw):
+    # One row per calendar day, so shift(7) and the rolling window line
+    # up with dates; gaps are imputed and flagged, and only then is
+    # demand narrowed
+    df, quality = validate_demand(raw)
+    if df.empty:
+        raise ValueError("Input dataset has no usable demand.")
+    return compact_demand(df), quality
 
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date")
 
-    # ── Read cursor ───────────────────────────────────────────
-    # Check what date we last processed
-    last_processed = read_cursor()
+def cursor_stage(demand):
+    """The next date to process and the cursor version it was read at."""
+    last_processed, cursor_version = read_cursor_state()
 
     if last_processed is None:
         # First ever run — start from the earliest possible valid date
         # We need at least 7 rows for seasonal naive + 30 rows for rolling z-score
         # So we start from row 37 (index 36)
-        cursor_date = df["date"].iloc[36]
-    else:
-        # Find the next date after last processed
-        last_date = pd.Timestamp(last_processed)
-        remaining = df[df["date"] > last_date]
-
-        if remaining.empty:
-            print("Pipeline has reached the end of the dataset. No new data to process.")
-            return
-        cursor_date = remaining["date"].iloc[0]
-    # ── Filter data up to cursor date ─────────────────────────
-    # This simulates "we only know data up to today"
-    df = df[df["date"] <= cursor_date]
+        return demand["date"].iloc[36], cursor_version
 
-    # ── Forecast ─────────────────────────────────────────────
-    df = seasonal_naive_forecast(df)
-    df = df.dropna(subset=["forecast"])
+    # Find the next date after last processed
+    remaining = demand[demand["date"] > pd.Timestamp(last_processed)]
+    if remaining.empty:
+        raise StopPipeline("caught_up")
+    return remaining["date"].iloc[0], cursor_version
 
-    # Residual
-    df = compute_residual(df)
 
-    # Rolling Z-score
-    df = compute_rolling_z_score(df, window=30)
-    df = df.dropna(subset=["z_score"])
-
-    # Risk assignment
-    df["risk_level"] = df["z_score"].apply(assign_risk)
-    df["anomaly_flag"] = (df["z_score"].abs() >= 2).astype(int)
-
-    # ── Save outputs ──────────────────────────────────────────
-    latest_row = df.iloc[-1:]
-    save_outputs(df, latest_row)
-
-    # ── Advance cursor ────────────────────────────────────────
-    write_cursor(str(cursor_date.date()))
-
-    print(f"Pipeline ran for date: {cursor_date.date()}")
-    print(f"Risk level: {df.iloc[-1]['risk_level']}")
-    print(f"Z-score: {df.iloc[-1]['z_score']:.4f}")
-    print("Daily risk monitoring completed successfully.")
+def window_stage(demand, cursor_date):
+    # This simulates "we only know data up to today"
+    return demand[demand["date"] <= cursor_date]
+
+
+def residual_stage(forecasted):
+    return compute_residual(forecasted.dropna(subset=["forecast"]))
+
+
+def score_stage(residuals, window=30, reset_baseline=CHANGE_POINT_RESET):
+    # Rolling Z-score; a change-point detector runs alongside it, flags
+    # regime shifts and, if configured, resets the rolling baseline.
+    # Only the newest scored row is kept, so the checkpoint stays small
+    df, detector = score_with_change_points(residuals, window=window, reset_baseline=reset_baseline)
+    return df.dropna(subset=["z_score"]).iloc[-1:], detector
+
+
+def window_stats_stage(residuals):
+    """Plain rolling z-scores over each of WINDOWS (z_7, z_30, z_90) by
+    date; only the widest window's worth of residuals is needed for the
+    newest day."""
+    tail = residuals.tail(max(WINDOWS))
+    stats = rolling_stats(tail, stats=("z",), quantiles=())
+    return stats.set_index("date")[Z_COLUMNS]
+
+
+def tail_stage(residuals):
+    """Empirical tail probability of the newest residual by date, from
+    the persisted digest, and the digest to save."""
+    df, digest = score_with_digest(residuals)
+    return df.set_index("date")[["tail_probability"]].iloc[-1:], digest
+
+
+def risk_stage(scored, window_z, tails, scorer=RISK_SCORER):
+    """The scored latest day, with its risk level, anomaly flag,
+    multi-window z-scores and tail probability."""
+    latest = scored.iloc[-1:].join(window_z, on="date").join(tails, on="date")
+    latest["risk_level"] = latest["z_score"].apply(assign_risk)
+    latest["anomaly_flag"] = (latest["z_score"].abs() >= 2).astype(int)
+    if scorer == "quantile":
+        # The z-score still decides until the digest has enough points
+        p = latest["tail_probability"].dropna()
+        latest.loc[p.index, "risk_level"] = p.apply(assign_tail_risk)
+        latest.loc[p.index, "anomaly_flag"] = (p <= TAIL_PROBABILITIES[1]).astype(int)
+    return apply_schema(latest)
+
+
+def write_stage(latest_row, cursor_date):
+    # Idempotent: a retry rewrites the same partition
+    write_partition(latest_row, str(cursor_date.date()))
+
+
+def advance_stage(cursor_date, cursor_version):
+    # Compare-and-swap: if another run already advanced the cursor
+    # from the version we read, it owns this date and we stop here.
+    processed_date = str(cursor_date.date())
+    try:
+        write_cursor(processed_date, expected_version=cursor_version)
+    except CursorConflictError:
+        raise StopPipeline("conflict")
+    return processed_date
+
+
+def forecast_stage(method):
+    """The forecast stage for a BASELINE_METHOD: "sarima", or one of the
+    calendar-aware seasonal naive methods (cached per series, so only
+    the new day is computed)."""
+    if method == "sarima":
+        return Stage("forecast", sarima_forecast, ["history"], ["forecasted"], cache=True)
+    return Stage("forecast", calendar_naive_forecast, ["history"], ["forecasted"],
+                 params={"method": method}, cache=True)
+
+
+def cube_stage(processed_date):
+    """Bring the aggregation cube up to the processed date, if raw
+    store/item sales are available."""
+    raw = read_store_item_sales()
+    if raw is not None:
+        raw = raw[raw["date"] <= pd.Timestamp(processed_date)]
+    if raw is not None and not raw.empty:
+        refresh_cube(raw)
+
+
+def daily_stages(method=BASELINE_METHOD, scorer=RISK_SCORER, reset_baseline=CHANGE_POINT_RESET):
+    # Only the new day is published: earlier rows are unchanged because
+    # every run recomputes the same deterministic history. The stages
+    # after the cursor swap are independent and run in parallel, except
+    # the release, which makes their outputs visible to the API.
+    return Pipeline([
+        Stage("load", load_stage, [], ["raw"]),
+        Stage("validate", validate_stage, ["raw"], ["demand", "quality"], cache=True),
+        Stage("cursor", cursor_stage, ["demand"], ["cursor_date", "cursor_version"], resume=True),
+        Stage("window", window_stage, ["demand", "cursor_date"], ["history"]),
+        forecast_stage(method),
+        Stage("residual", residual_stage, ["forecasted"], ["residuals"]),
+        Stage("score", score_stage, ["residuals"], ["scored", "detector"],
+              params={"reset_baseline": reset_baseline}, resume=True),
+        Stage("window_stats", window_stats_stage, ["residuals"], ["window_z"]),
+        Stage("tail", tail_stage, ["residuals"], ["tails", "digest"], resume=True),
+        Stage("risk", risk_stage, ["scored", "window_z", "tails"], ["latest_row"], params={"scorer": scorer}),
+        Stage("write", write_stage, ["latest_row", "cursor_date"], effect=True),
+        Stage("advance", advance_stage, ["cursor_date", "cursor_version"], ["processed_date"],
+              effect=True, after=["write"]),
+        Stage("publish", publish_partition, ["processed_date"], effect=True),
+        Stage("anomaly_index", update_anomaly_index, ["latest_row"], effect=True, after=["advance"]),
+        Stage("save_detector", save_detector, ["detector"], effect=True, after=["advance"]),
+        Stage("save_digest", save_digest, ["digest"], effect=True, after=["advance"]),
+        Stage("save_outputs", save_outputs, ["latest_row"], effect=True, after=["advance"]),
+        Stage("cube", cube_stage, ["processed_date"], effect=True),
+        Stage("release", publish_release, ["latest_row", "processed_date"], effect=True,
+              after=["publish", "save_outputs"]),
+    ])
+
+
+def run(metrics, log=print):
+    """One daily step for the active tenant. Returns (processed date or
+    None, run status) and times each stage in `metrics`. A failed step
+    is resumed by the next run."""
+    # A tenant's config may pick its own baseline, scorer and
+    # change-point reset
+    config = tenant_config()
+    method = config.get("baseline_method", BASELINE_METHOD)
+    scorer = config.get("risk_scorer", RISK_SCORER)
+    reset_baseline = config.get("change_point_reset", CHANGE_POINT_RESET)
+    status, values = daily_stages(method, scorer, reset_baseline).run(checkpoint="daily", metrics=metrics)
+
+    if describe_quality(values["quality"]):
+        log(describe_quality(values["quality"]))
+    if status == "caught_up":
+        log("Pipeline has reached the end of the dataset. No new data to process.")
+        return None, status
+    if status == "conflict":
+        log(f"Another run already processed {values['cursor_date'].date()}. Skipping.")
+        return None, status
+
+    latest = values["latest_row"].iloc[-1]
+    log("Saved latest_risk.csv to S3." if USE_S3 else "Saved outputs locally.")
+    log(f"Pipeline ran for date: {values['processed_date']}")
+    log(f"Risk level: {latest['risk_level']}")
+    log(f"Z-score: {latest['z_score']:.4f}")
+    if latest["change_point"]:
+        log(f"Regime change detected, starting {values['detector'].change_points[-1]['date']}.")
+    log("Daily risk monitoring completed successfully.")
+    return values["processed_date"], status
+
+
+def run_step(log=print):
+    """run() with its stage timings and outcome saved to storage for the
+    API's /metrics. Returns (processed date or None, run status)."""
+    metrics = PipelineRun()
+    try:
+        processed_date, status = run(metrics, log)
+    except Exception:
+        metrics.save("failed")
+        raise
+    metrics.save(status, processed_date)
+    return processed_date, status
+
+
+def main(log=print):
+    return run_step(log)[0]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,335 @@
+import http.client
+import io
+import json
+import os
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Point the pipeline and API at the in-memory S3 stand-in before they
+# are imported
+os.environ["USE_S3"] = "true"
+os.environ.setdefault("S3_BUCKET", "local-load-test")
+
+import numpy as np
+import pandas as pd
+import uvicorn
+
+import lambda_handler
+from api.app import app
+from src.utils import config
+from src.utils.local_s3 import LocalS3Client
+from src.utils.risk_store import read_history
+
+# ── End-to-end load test ──────────────────────────────────────
+# The deployed system on one machine: an accelerated clock stands in
+# for EventBridge and fires lambda_handler.handler once per simulated
+# day (at most LAMBDA_CONCURRENCY at a time; a run that overruns its day
+# delays the next, reported as start delay), the API is served by
+# uvicorn on a local port, and both share one LocalS3Client bucket.
+# API_CLIENTS threads meanwhile request a seeded mix of ROUTES over HTTP
+# for the whole run.
+#
+# Once the clock has covered the dataset (about five simulated years)
+# the history must hold every day exactly once and no request may have
+# failed. The report gives pipeline durations, API latency percentiles
+# per route and S3 requests per invocation and per API request, overall
+# and per simulated year (a request counts towards the day the pipeline
+# had reached), and is saved to LOAD_TEST_REPORT. With
+# LOAD_TEST_BASELINE set to an earlier report, the run fails if any of
+# them regressed beyond TOLERANCE.
+
+SECONDS_PER_DAY = 0.1         # real seconds per simulated day
+# Reserved concurrency of the function. Above 1, runs that overlap
+# conflict on the cursor and one of them processes nothing, so the
+# clock runs on (up to MAX_EXTRA_DAYS) until the dataset is covered.
+LAMBDA_CONCURRENCY = 1
+API_CLIENTS = 2
+THINK_SECONDS = 0.05          # pause between one client's requests
+SEED = 0
+# (path, weight): mostly the dashboard's cheap reads
+ROUTES = [
+    ("/latest-risk", 30),
+    ("/risk-history?limit=30", 20),
+    ("/rolling-stats", 10),
+    ("/anomalies?limit=10", 10),
+    ("/anomalies/counts", 5),
+    ("/forecast?horizon=7", 5),
+    ("/metrics", 10),
+    ("/", 5),
+    ("/export?format=csv", 5),
+]
+REPORT_PATH = Path(os.environ.get("LOAD_TEST_REPORT", "load_test_report.json"))
+BASELINE_PATH = os.environ.get("LOAD_TEST_BASELINE")
+TOLERANCE = {"seconds": 1.5, "requests": 1.1}
+MAX_EXTRA_DAYS = 100
+
+
+# ── S3 stand-in, attributed ───────────────────────────────────
+class AttributedS3Client:
+    """A LocalS3Client that also counts requests by source: "pipeline"
+    for Lambda invocations (and their stage pool), "api" for the rest."""
+
+    def __init__(self, client):
+        self.client = client
+        self.exceptions = client.exceptions
+        self.counts = defaultdict(Counter)
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def call(*args, **kwargs):
+            thread = threading.current_thread().name
+            source = "pipeline" if thread.startswith(("lambda", "stage")) else "api"
+            self.counts[source][name] += 1
+            return method(*args, **kwargs)
+        return call
+
+
+# ── Simulated EventBridge ─────────────────────────────────────
+class Schedule:
+    """Fires the Lambda handler once per simulated day on an accelerated
+    clock, recording each invocation."""
+
+    def __init__(self, start_day, seconds_per_day=SECONDS_PER_DAY):
+        self.start_day = pd.Timestamp(start_day)
+        self.seconds_per_day = seconds_per_day
+        self.invocations = []
+        # Simulated day of the latest finished invocation: what the
+        # API is serving
+        self.current_day = self.start_day
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(LAMBDA_CONCURRENCY, thread_name_prefix="lambda")
+        self._started = time.perf_counter()
+
+    def _invoke(self, day, scheduled):
+        event = {"source": "aws.events", "detail-type": "Scheduled Event", "time": f"{day.date()}T00:00:00Z"}
+        start = time.perf_counter()
+        response = lambda_handler.handler(event, None)
+        with self._lock:
+            self.invocations.append({
+                "day": day, "status": response["statusCode"],
+                "seconds": time.perf_counter() - start,
+                "delay": start - scheduled,
+            })
+            self.current_day = max(self.current_day, day)
+
+    def run(self, days, done=lambda: False):
+        """Fire `days` daily invocations, then (once those have finished)
+        keep firing until done(), at most MAX_EXTRA_DAYS more. Returns
+        the number of simulated days."""
+        futures = []
+        tick = 0
+        while tick < days or (not done() and tick < days + MAX_EXTRA_DAYS):
+            scheduled = self._started + tick * self.seconds_per_day
+            time.sleep(max(scheduled - time.perf_counter(), 0))
+            futures.append(self._pool.submit(self._invoke, self.start_day + pd.Timedelta(days=tick), scheduled))
+            tick += 1
+            if tick >= days:
+                wait(futures)
+        self._pool.shutdown(wait=True)
+        return tick
+
+
+# ── API traffic ───────────────────────────────────────────────
+class Traffic:
+    """API_CLIENTS threads requesting a weighted random mix of ROUTES
+    until stopped, each with its own seeded generator."""
+
+    def __init__(self, base_url, schedule):
+        self.base_url = base_url
+        self.schedule = schedule
+        self.requests = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._client, args=(random.Random(SEED + i),), name=f"client-{i}")
+            for i in range(API_CLIENTS)
+        ]
+
+    def _client(self, rng):
+        paths, weights = zip(*ROUTES)
+        while not self._stop.is_set():
+            path = rng.choices(paths, weights)[0]
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(self.base_url + path, timeout=30) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (OSError, http.client.HTTPException):
+                # Refused, timed out or cut off mid-body
+                status = 0
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.requests.append({"route": path.split("?")[0], "status": status, "seconds": seconds,
+                                      "day": self.schedule.current_day})
+            self._stop.wait(THINK_SECONDS)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_api():
+    """Run the API with uvicorn on a background thread; returns
+    (server, thread, base url)."""
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           access_log=False))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+# ── Report ────────────────────────────────────────────────────
+def percentiles(seconds):
+    if len(seconds) == 0:
+        return {"count": 0}
+    ms = np.asarray(seconds) * 1000
+    return {"count": len(ms), **{f"p{p}_ms": round(float(np.percentile(ms, p)), 2) for p in (50, 95, 99)}}
+
+
+def build_report(schedule, traffic, s3, elapsed, days):
+    runs = pd.DataFrame(schedule.invocations)
+    requests = pd.DataFrame(traffic.requests)
+    runs["year"] = runs["day"].dt.year
+    requests["year"] = requests["day"].dt.year
+
+    pipeline_requests = s3.counts["pipeline"]
+    api_requests = s3.counts["api"]
+    return {
+        "simulated_days": days,
+        "elapsed_seconds": round(elapsed, 1),
+        "pipeline": {
+            "invocations": len(runs),
+            "failed": int((runs["status"] != 200).sum()),
+            "duration": percentiles(runs["seconds"]),
+            "start_delay": percentiles(runs["delay"]),
+            "s3_requests_per_invocation": {op: round(n / len(runs), 2) for op, n in sorted(pipeline_requests.items())},
+        },
+        "api": {
+            "requests": len(requests),
+            "requests_per_second": round(len(requests) / elapsed, 1),
+            "statuses": {str(k): int(v) for k, v in sorted(Counter(requests["status"]).items())},
+            "latency": percentiles(requests["seconds"]),
+            "routes": {route: percentiles(group["seconds"]) for route, group in requests.groupby("route")},
+            "s3_requests_per_request": {op: round(n / len(requests), 2) for op, n in sorted(api_requests.items())},
+        },
+        "years": {
+            str(year): {
+                "pipeline_duration": percentiles(runs.loc[runs["year"] == year, "seconds"]),
+                "api_latency": percentiles(requests.loc[requests["year"] == year, "seconds"]),
+            }
+            for year in sorted(runs["year"].unique())
+        },
+    }
+
+
+def print_report(report):
+    pipeline, api = report["pipeline"], report["api"]
+    print(f"Simulated {report['simulated_days']:,} days in {report['elapsed_seconds']}s\n")
+    print(f"Pipeline: {pipeline['invocations']:,} invocations, {pipeline['failed']} failed")
+    print(f"  duration       p50 {pipeline['duration']['p50_ms']:>8.1f} ms   p95 {pipeline['duration']['p95_ms']:>8.1f} ms"
+          f"   p99 {pipeline['duration']['p99_ms']:>8.1f} ms")
+    print(f"  start delay    p50 {pipeline['start_delay']['p50_ms']:>8.1f} ms   p95 {pipeline['start_delay']['p95_ms']:>8.1f} ms")
+    print(f"  S3 requests per invocation: {pipeline['s3_requests_per_invocation']}\n")
+
+    print(f"API: {api['requests']:,} requests ({api['requests_per_second']}/s), statuses {api['statuses']}")
+    print(f"  {'Route':<18} {'Count':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, stats in sorted(api["routes"].items()):
+        print(f"  {route:<18} {stats['count']:>7,} {stats['p50_ms']:>6.1f} ms {stats['p95_ms']:>6.1f} ms"
+              f" {stats['p99_ms']:>6.1f} ms")
+    print(f"  S3 requests per request: {api['s3_requests_per_request']}\n")
+
+    print(f"{'Year':<6} {'Runs':>6} {'Run p50':>10} {'Run p95':>10} {'Requests':>9} {'API p50':>10} {'API p95':>10}")
+    for year, stats in report["years"].items():
+        run, latency = stats["pipeline_duration"], stats["api_latency"]
+        print(f"{year:<6} {run['count']:>6,} {run['p50_ms']:>7.1f} ms {run['p95_ms']:>7.1f} ms "
+              f"{latency['count']:>9,} {latency.get('p50_ms', float('nan')):>7.1f} ms "
+              f"{latency.get('p95_ms', float('nan')):>7.1f} ms")
+
+
+def regressions(report, baseline):
+    """Metrics that got worse than baseline by more than TOLERANCE."""
+    checks = [("pipeline p95", report["pipeline"]["duration"]["p95_ms"],
+               baseline["pipeline"]["duration"]["p95_ms"], TOLERANCE["seconds"]),
+              ("API p95", report["api"]["latency"]["p95_ms"],
+               baseline["api"]["latency"]["p95_ms"], TOLERANCE["seconds"])]
+    for route, stats in report["api"]["routes"].items():
+        before = baseline["api"]["routes"].get(route)
+        if before and before["count"]:
+            checks.append((f"{route} p95", stats["p95_ms"], before["p95_ms"], TOLERANCE["seconds"]))
+    for side, key in (("pipeline", "s3_requests_per_invocation"), ("api", "s3_requests_per_request")):
+        for op, n in report[side][key].items():
+            before = baseline[side][key].get(op)
+            if before:
+                checks.append((f"{side} {op} per call", n, before, TOLERANCE["requests"]))
+    return [(name, now, before) for name, now, before, limit in checks if now > before * limit]
+
+
+def main():
+    s3 = AttributedS3Client(LocalS3Client())
+    config.set_s3_client(s3)
+    demand = pd.read_csv(config.REAL_DATA_PATH)
+    s3.client.put_object(Bucket=config.S3_BUCKET, Key="real_retail_demand.csv", Body=demand.to_csv(index=False))
+    dates = pd.to_datetime(demand["date"]).sort_values().reset_index(drop=True)
+    # The first run scores the 37th day (see cursor_stage)
+    expected = dates.iloc[36:].dt.strftime("%Y-%m-%d").tolist()
+
+    server, server_thread, base_url = serve_api()
+    schedule = Schedule(expected[0])
+    traffic = Traffic(base_url, schedule)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        traffic.start()
+        days = schedule.run(len(expected), done=lambda: config.read_cursor() == expected[-1])
+        traffic.stop()
+    elapsed = time.perf_counter() - start
+    server.should_exit = True
+    server_thread.join()
+
+    report = build_report(schedule, traffic, s3, elapsed, days)
+    print_report(report)
+    REPORT_PATH.write_text(json.dumps(report, indent=2))
+    print(f"\nReport saved to {REPORT_PATH}")
+
+    history = read_history()
+    processed = history["date"].dt.strftime("%Y-%m-%d").tolist()
+    assert report["pipeline"]["failed"] == 0, "Pipeline invocations failed."
+    assert processed == expected, "Risk history does not hold every day exactly once."
+    assert config.read_cursor() == expected[-1], "Cursor did not reach the last day."
+    broken = sum(n for status, n in report["api"]["statuses"].items() if status == "0" or status >= "500")
+    assert broken == 0, f"{broken} API requests failed or were cut off."
+
+    if BASELINE_PATH:
+        regressed = regressions(report, json.loads(Path(BASELINE_PATH).read_text()))
+        for name, now, before in regressed:
+            print(f"Regression: {name} {now} (baseline {before})")
+        assert not regressed, f"{len(regressed)} metrics regressed against {BASELINE_PATH}."
+    print("Load test passed.")
+
+
+if __name__ == "__main__":
+    main()
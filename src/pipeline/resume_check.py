@@ -0,0 +1,90 @@
+import json
+import tempfile
+from pathlib import Path
+
+from src.anomaly.anomaly_index import load_anomaly_index
+from src.pipeline import daily_pipeline
+from src.utils import config, storage
+from src.utils.metrics import PIPELINE_METRICS_KEY
+from src.utils.risk_store import read_history
+from src.utils.risk_release import load_pointer
+
+# ── Resume check ──────────────────────────────────────────────
+# Makes each stage of the daily pipeline fail in turn, on the fourth
+# day of a fresh store, then runs the pipeline again. The rerun must
+# process that same day, skip the stages the failed run finished and
+# leave exactly the history, cursor and anomaly index of a run that
+# never failed.
+
+DAYS = 4
+
+
+class StageFailure(Exception):
+    pass
+
+
+def fail(*args, **kwargs):
+    raise StageFailure()
+
+
+def quiet(*args):
+    pass
+
+
+def snapshot():
+    history = read_history()
+    anomalies = load_anomaly_index()
+    return {
+        "history": history.to_csv(index=False),
+        "cursor": config.read_cursor(),
+        "anomalies": anomalies.frame().to_csv(index=False),
+        "latest": storage.get_bytes("latest_risk.csv"),
+        # Versions differ between runs; the date released must not
+        "release": (load_pointer() or {}).get("date"),
+    }
+
+
+def run_days(root, fail_stage=None):
+    """Run DAYS days into root, failing fail_stage once on the last day.
+    Returns (snapshot, stages computed by the rerun)."""
+    storage.LOCAL_ROOT = root
+    config.CURSOR_PATH = root / "cursor.json"
+    config.CURSOR_LOCK_PATH = root / "cursor.lock"
+    for _ in range(DAYS - 1):
+        daily_pipeline.main(quiet)
+    rerun = None
+    if fail_stage is not None:
+        build = daily_pipeline.daily_stages
+        daily_pipeline.daily_stages = lambda *args: build(*args).replace(fail_stage, fn=fail)
+        try:
+            daily_pipeline.main(quiet)
+            raise AssertionError(f"{fail_stage} did not fail")
+        except StageFailure:
+            pass
+        finally:
+            daily_pipeline.daily_stages = build
+    processed = daily_pipeline.main(quiet)
+    if fail_stage is not None:
+        rerun = list(json.loads(storage.get_bytes(PIPELINE_METRICS_KEY))["stages"])
+    return processed, snapshot(), rerun
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        expected_date, expected, _ = run_days(Path(root))
+
+    stages = [stage.name for stage in daily_pipeline.daily_stages().stages]
+    print(f"Reference run processed {expected_date}\n")
+    print(f"{'Failed stage':<15} Stages computed by the rerun")
+    for stage in stages:
+        with tempfile.TemporaryDirectory() as root:
+            processed, result, rerun = run_days(Path(root), stage)
+        assert processed == expected_date, f"{stage}: rerun processed {processed}"
+        for name, value in expected.items():
+            assert result[name] == value, f"{stage}: {name} differs"
+        print(f"{stage:<15} {', '.join(rerun)}")
+    print("\nResume check passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,8 @@
+import numpy as np
+
+RISK_LEVELS = np.array(["LOW", "MEDIUM", "HIGH", "CRITICAL"])
+
+
 def assign_risk(z):
     if abs(z) < 1:
         return "LOW"
@@ -7,3 +12,31 @@ def assign_risk(z):
         return "HIGH"
     else:
         return "CRITICAL"
+
+
+def assign_risk_array(z):
+    """Vectorized assign_risk over an array of z-scores."""
+    return RISK_LEVELS[np.searchsorted([1, 2, 3], np.abs(z), side="right")]
+
+
+# ── Tail probabilities ────────────────────────────────────────
+# Two-sided normal tail probabilities at |z| = 1, 2 and 3, so an
+# empirical tail probability (src.anomaly.quantile_sketch) gets the
+# level of the z-score it would be under a Gaussian.
+TAIL_PROBABILITIES = np.array([0.3173, 0.0455, 0.0027])
+
+
+def assign_tail_risk(p):
+    if p > TAIL_PROBABILITIES[0]:
+        return "LOW"
+    elif p > TAIL_PROBABILITIES[1]:
+        return "MEDIUM"
+    elif p > TAIL_PROBABILITIES[2]:
+        return "HIGH"
+    else:
+        return "CRITICAL"
+
+
+def assign_tail_risk_array(p):
+    """Vectorized assign_tail_risk over an array of tail probabilities."""
+    return RISK_LEVELS[np.searchsorted(-TAIL_PROBABILITIES, -np.asarray(p), side="right")]
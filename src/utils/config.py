@@ -1,14 +1,31 @@
+import fcntl
 import json
 import os
+import time
 import boto3
 import pandas as pd
+from botocore.exceptions import ClientError
+from contextlib import contextmanager
+from io import BytesIO
 from pathlib import Path
 
+from src.utils.metrics import record_load
+from src.utils.schema import apply_schema, DEMAND_SCHEMA
+from src.utils.tenants import current_tenant, namespaced, tenant_config
+
 # ── Data paths ────────────────────────────────────────────────
 USE_SIMULATED_DATA = False
 
 SIMULATED_DATA_PATH = "data/simulated/demand_with_shocks.csv"
 REAL_DATA_PATH = "data/raw/real_retail_demand.csv"
+# Raw store/item sales the aggregation cube is built from (optional)
+STORE_ITEM_DATA_PATH = "data/raw/store_item_demand.csv"
+STORE_ITEM_KEY = "store_item_demand.csv"
+
+# Multi-series data carries a series_id column; the aggregated
+# single-series dataset is treated as one series called "total".
+SERIES_COL = "series_id"
+DEFAULT_SERIES_ID = "total"
 
 
 # ── S3 config ─────────────────────────────────────────────────
@@ -20,13 +37,31 @@ REAL_DATA_PATH = "data/raw/real_retail_demand.csv"
 
 S3_BUCKET = os.environ.get("S3_BUCKET")
 USE_S3 = os.environ.get("USE_S3", "false").lower() == "true"
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+
+
+# ── Forecast config ───────────────────────────────────────────
+# Baseline the daily pipeline scores residuals against; one of
+# src.forecasting.calendar_naive.METHODS.
+BASELINE_METHOD = os.environ.get("BASELINE_METHOD", "naive7")
+
+# What sets the risk level and anomaly flag: "zscore" (the rolling
+# z-score) or "quantile" (the empirical tail probability from
+# src.anomaly.quantile_sketch). Both are always stored.
+RISK_SCORER = os.environ.get("RISK_SCORER", "zscore")
+
+# Whether a detected change point (src.anomaly.change_point) also resets
+# the rolling baseline the z-score is computed against. Off by default:
+# change points are then only flagged.
+CHANGE_POINT_RESET = os.environ.get("CHANGE_POINT_RESET", "false").lower() == "true"
 
 
 # ── Cursor config ─────────────────────────────────────────────
 # Tracks which date the pipeline last processed.
-# Right now this is a local JSON file.
-# Later we'll swap this for S3 — the read/write functions stay the same.
+# Local JSON file in development, cursor.json in S3 on AWS.
+CURSOR_KEY = "cursor.json"
 CURSOR_PATH = Path("artifacts/cursor.json")
+CURSOR_LOCK_PATH = Path("artifacts/cursor.lock")
 LATEST_RISK_PATH = Path("artifacts/latest_risk.csv")
 
 
@@ -35,54 +70,202 @@ def get_data_path():
 
 
 def read_demand_data():
-    """Read demand CSV from S3 or local depending on environment."""
+    """Read demand CSV from S3 or local depending on environment; a
+    tenant's from its input key in storage."""
+    start = time.perf_counter()
+    if current_tenant() is not None:
+        from src.utils.storage import get_bytes
+        input_key = tenant_config()["input_key"]
+        body = get_bytes(input_key)
+        if body is None:
+            raise FileNotFoundError(f"No demand data at {namespaced(input_key)}.")
+        return apply_schema(pd.read_csv(BytesIO(body)), DEMAND_SCHEMA)
     if USE_S3:
-        s3 = boto3.client("s3")
+        s3 = get_s3_client()
         obj = s3.get_object(Bucket=S3_BUCKET, Key="real_retail_demand.csv")
-        return pd.read_csv(obj["Body"])
+        df = pd.read_csv(obj["Body"])
+        size = obj["ContentLength"]
     else:
-        return pd.read_csv(get_data_path())
+        df = pd.read_csv(get_data_path())
+        size = os.path.getsize(get_data_path())
+    record_load("demand", time.perf_counter() - start, size)
+    return apply_schema(df, DEMAND_SCHEMA)
 
 
-def read_cursor():
-    """Return the last processed date as a string (YYYY-MM-DD).
-    If no cursor sexists yet, return None so the pipeline knows its
-    the the first run ever"""
-    """Read last processed date.
-    Uses S3 if USE_S3=true, otherwise reads local file."""
-
+def read_store_item_sales():
+    """Raw store/item sales for the aggregation cube, from S3 or local
+    depending on environment (a tenant's from its sales_key), or None
+    where there are none."""
+    if current_tenant() is not None:
+        from src.utils.storage import get_bytes
+        key = tenant_config().get("sales_key")
+        body = None if key is None else get_bytes(key)
+        return None if body is None else pd.read_csv(BytesIO(body), parse_dates=["date"])
     if USE_S3:
-        s3 = boto3.client("s3")
+        s3 = get_s3_client()
         try:
-            obj = s3.get_object(Bucket=S3_BUCKET, Key="cursor.json")
-            data = json.loads(obj["Body"].read().decode("utf-8"))
-            return data.get("last_processed_date")
+            obj = s3.get_object(Bucket=S3_BUCKET, Key=STORE_ITEM_KEY)
         except s3.exceptions.NoSuchKey:
-            # First ever run, cursor doesn't exist yet
             return None
-    else:
-        # Local Development
-        if not CURSOR_PATH.exists():
+        return pd.read_csv(obj["Body"], parse_dates=["date"])
+    if not os.path.exists(STORE_ITEM_DATA_PATH):
+        return None
+    return pd.read_csv(STORE_ITEM_DATA_PATH, parse_dates=["date"])
+
+
+def demand_data_version():
+    """Cheap change marker for the demand input read_demand_data reads
+    (ETag or mtime and size), or None if it doesn't exist."""
+    if current_tenant() is not None:
+        from src.utils.storage import object_version
+        return object_version(tenant_config()["input_key"])
+    if USE_S3:
+        try:
+            return get_s3_client().head_object(Bucket=S3_BUCKET, Key="real_retail_demand.csv")["ETag"]
+        except ClientError:
             return None
-        with open(CURSOR_PATH, "r") as f:
-            data = json.load(f)
-            return data.get("last_processed_date")
+    path = Path(get_data_path())
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+# ── S3 client ─────────────────────────────────────────────────
+# One shared client per process (boto3 clients are thread-safe).
+# Tests and local harnesses can swap in src.utils.local_s3.LocalS3Client.
+_s3_client = None
+
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL)
+    return _s3_client
+
+
+def set_s3_client(client):
+    global _s3_client
+    _s3_client = client
+
+
+# ── Cursor ────────────────────────────────────────────────────
+# The cursor is versioned and only ever advanced with compare-and-swap:
+# a run reads (date, version), does its work, then writes the new date
+# only if the version is unchanged. On S3 the version is the object's
+# ETag (conditional put); locally it is a counter in the file, checked
+# under a file lock and replaced with an atomic rename. Overlapping
+# EventBridge retries or manual runs can therefore never double-advance
+# or skip a day — the loser gets a CursorConflictError. Each tenant has
+# its own cursor under its prefix.
+
 
+# Error codes S3 returns when an IfMatch / IfNoneMatch put loses a race
+CONDITIONAL_WRITE_CONFLICTS = ("PreconditionFailed", "ConditionalRequestConflict")
 
-def write_cursor(date_str):
-    """Save the last processed date so the next run knows wjere to continue. """
-    """Save last processed date.
-    Uses S3 if USE_S3=true, otherwise writes local file."""
+
+class CursorConflictError(Exception):
+    """Raised when the cursor changed between our read and our write."""
+
+
+@contextmanager
+def local_file_lock(lock_path):
+    """Exclusive lock across processes (and threads) on this machine."""
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _local_cursor_paths():
+    """(cursor, lock) paths for the active tenant."""
+    if current_tenant() is None:
+        return CURSOR_PATH, CURSOR_LOCK_PATH
+    return (CURSOR_PATH.parent / namespaced(CURSOR_PATH.name),
+            CURSOR_LOCK_PATH.parent / namespaced(CURSOR_LOCK_PATH.name))
+
+
+def _read_local_cursor():
+    cursor_path, _ = _local_cursor_paths()
+    if not cursor_path.exists():
+        return None, None
+    with open(cursor_path, "r") as f:
+        data = json.load(f)
+    return data.get("last_processed_date"), data.get("version", 0)
+
+
+def read_cursor_state():
+    """Return (last_processed_date, version).
+
+    Both are None if no cursor exists yet (first ever run). Pass the
+    version back to write_cursor to advance it safely.
+    """
     if USE_S3:
-        s3 = boto3.client("s3")
-        s3.put_object(
-            Bucket=S3_BUCKET,
-            Key="cursor.json",
-            Body=json.dumps({"last_processed_date": date_str})
+        s3 = get_s3_client()
+        try:
+            obj = s3.get_object(Bucket=S3_BUCKET, Key=namespaced(CURSOR_KEY))
+        except s3.exceptions.NoSuchKey:
+            return None, None
+        data = json.loads(obj["Body"].read().decode("utf-8"))
+        return data.get("last_processed_date"), obj["ETag"]
+    else:
+        return _read_local_cursor()
+
+
+def read_cursor():
+    """Return the last processed date as a string (YYYY-MM-DD), or None
+    if the pipeline has never run."""
+    return read_cursor_state()[0]
+
+
+def write_cursor(date_str, expected_version=None):
+    """Advance the cursor to date_str if it is still at expected_version.
+
+    expected_version=None means "no cursor exists yet". Raises
+    CursorConflictError if another run got there first.
+    """
+    if USE_S3:
+        s3 = get_s3_client()
+        # The cursor only moves forward, so every body (and therefore
+        # every ETag) is distinct — no ABA between read and write.
+        condition = (
+            {"IfNoneMatch": "*"} if expected_version is None
+            else {"IfMatch": expected_version}
         )
+        try:
+            s3.put_object(
+                Bucket=S3_BUCKET,
+                Key=namespaced(CURSOR_KEY),
+                Body=json.dumps({"last_processed_date": date_str}),
+                **condition
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in CONDITIONAL_WRITE_CONFLICTS:
+                raise CursorConflictError(
+                    f"Cursor changed while advancing to {date_str}."
+                ) from e
+            raise
 
     else:
         # Local development
-        CURSOR_PATH.parent.mkdir(exist_ok=True)
-        with open(CURSOR_PATH, "w") as f:
-            json.dump({"last_processed_date": date_str}, f)
+        cursor_path, lock_path = _local_cursor_paths()
+        with local_file_lock(lock_path):
+            _, current_version = _read_local_cursor()
+            if current_version != expected_version:
+                raise CursorConflictError(
+                    f"Cursor changed while advancing to {date_str}."
+                )
+            cursor_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cursor_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "last_processed_date": date_str,
+                    "version": (current_version or 0) + 1,
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, cursor_path)
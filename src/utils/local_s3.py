@@ -0,0 +1,126 @@
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from io import BytesIO
+
+from botocore.exceptions import ClientError
+
+
+# ── Local S3 stand-in ─────────────────────────────────────────
+# An in-memory object store that answers the subset of the boto3 S3
+# client API this project uses, including conditional writes
+# (IfMatch / IfNoneMatch). Swap it in with
+# src.utils.config.set_s3_client(LocalS3Client()) to run the pipeline
+# and API locally, concurrently, without AWS.
+
+
+class _NoSuchKey(ClientError):
+    pass
+
+
+class _Exceptions:
+    NoSuchKey = _NoSuchKey
+    ClientError = ClientError
+
+
+def _error(code, message, status):
+    return {
+        "Error": {"Code": code, "Message": message},
+        "ResponseMetadata": {"HTTPStatusCode": status},
+    }
+
+
+class LocalS3Client:
+    exceptions = _Exceptions
+
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.Lock()
+        # Per-operation request counts and bytes moved, for benchmarks
+        self.request_counts = Counter()
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        Body = bytes(Body)
+        etag = f'"{hashlib.md5(Body).hexdigest()}"'
+
+        with self._lock:
+            self.request_counts["PutObject"] += 1
+            current = self._objects.get((Bucket, Key))
+
+            if IfNoneMatch == "*" and current is not None:
+                raise ClientError(
+                    _error("PreconditionFailed", "Object already exists", 412),
+                    "PutObject",
+                )
+            if IfMatch is not None and (current is None or current["ETag"] != IfMatch):
+                raise ClientError(
+                    _error("PreconditionFailed", "ETag does not match", 412),
+                    "PutObject",
+                )
+
+            self._objects[(Bucket, Key)] = {
+                "Body": Body,
+                "ETag": etag,
+                "LastModified": datetime.now(timezone.utc),
+            }
+            self.bytes_written += len(Body)
+
+        return {"ETag": etag}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            self.request_counts["GetObject"] += 1
+            obj = self._objects.get((Bucket, Key))
+            if obj is None:
+                raise _NoSuchKey(
+                    _error("NoSuchKey", "The specified key does not exist.", 404),
+                    "GetObject",
+                )
+            self.bytes_read += len(obj["Body"])
+
+        return {
+            "Body": BytesIO(obj["Body"]),
+            "ETag": obj["ETag"],
+            "ContentLength": len(obj["Body"]),
+            "LastModified": obj["LastModified"],
+        }
+
+    def head_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            self.request_counts["HeadObject"] += 1
+            obj = self._objects.get((Bucket, Key))
+        if obj is None:
+            raise ClientError(_error("404", "Not Found", 404), "HeadObject")
+        return {
+            "ETag": obj["ETag"],
+            "ContentLength": len(obj["Body"]),
+            "LastModified": obj["LastModified"],
+        }
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            self.request_counts["DeleteObject"] += 1
+            self._objects.pop((Bucket, Key), None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        with self._lock:
+            self.request_counts["ListObjectsV2"] += 1
+            contents = [
+                {
+                    "Key": key,
+                    "Size": len(obj["Body"]),
+                    "ETag": obj["ETag"],
+                    "LastModified": obj["LastModified"],
+                }
+                for (bucket, key), obj in sorted(self._objects.items())
+                if bucket == Bucket and key.startswith(Prefix)
+            ]
+        return {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False}
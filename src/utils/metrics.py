@@ -0,0 +1,289 @@
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# ── Metrics registry ──────────────────────────────────────────
+# A small in-process registry of counters, gauges and histograms,
+# rendered in the Prometheus text format by the API's /metrics route.
+# Recording is a dict lookup for the label values plus an add under a
+# per-series lock, so it can sit on every request and storage read.
+#
+# Gauges may take a `collect` callback that yields (label values, value)
+# pairs at scrape time, for numbers that live in storage rather than in
+# this process (pipeline runs, history size, current risk levels). The
+# daily pipeline runs as its own process, so it saves its run's stage
+# timings to PIPELINE_METRICS_KEY and the API exports them from there.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PIPELINE_METRICS_KEY = "metrics/pipeline.json"
+
+# Seconds; request handlers, storage reads and pipeline stages all fit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values):
+        """The series for these label values (in labelnames order)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}.")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        return _Value()
+
+    def _samples(self):
+        """(name suffix, label pairs, value) for every series."""
+        for values, child in list(self._children.items()):
+            yield "", tuple(zip(self.labelnames, values)), child.value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, pairs, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(pairs)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), registry=None, collect=None):
+        super().__init__(name, help, labelnames, registry)
+        self.collect = collect
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def _samples(self):
+        if self.collect is None:
+            yield from super()._samples()
+            return
+        for values, value in self.collect():
+            yield "", tuple(zip(self.labelnames, values)), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            pairs = tuple(zip(self.labelnames, values))
+            counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield "_bucket", pairs + (("le", _format_value(bound)),), cumulative
+            yield "_sum", pairs, total
+            yield "_count", pairs, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self.metrics[metric.name] = metric
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ── Shared metrics ────────────────────────────────────────────
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template, method and status.",
+    ("route", "method", "status"))
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time from request to response headers, by route template.",
+    ("route",))
+DATA_LOAD_SECONDS = Histogram(
+    "data_load_seconds", "Time to read one object or input file, by source.", ("source",))
+DATA_LOAD_BYTES = Counter(
+    "data_load_bytes_total", "Bytes read from storage and input files, by source.", ("source",))
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+
+
+def _hit_ratios():
+    totals = {}
+    for (cache, result), child in list(CACHE_REQUESTS._children.items()):
+        hits, lookups = totals.get(cache, (0.0, 0.0))
+        totals[cache] = (hits + (child.value if result == "hit" else 0.0), lookups + child.value)
+    for cache, (hits, lookups) in sorted(totals.items()):
+        if lookups:
+            yield (cache,), hits / lookups
+
+
+CACHE_HIT_RATIO = Gauge(
+    "cache_hit_ratio", "Share of cache lookups served from the cache since start.", ("cache",),
+    collect=_hit_ratios)
+
+
+def record_load(source, seconds, size):
+    DATA_LOAD_SECONDS.labels(source).observe(seconds)
+    DATA_LOAD_BYTES.labels(source).inc(size)
+
+
+def record_cache(cache, hit, count=1):
+    if count:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+# ── Pipeline runs ─────────────────────────────────────────────
+class PipelineRun:
+    """Wall-clock stage timings of one pipeline run, saved to storage
+    when the run ends."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def save(self, status, processed_date=None):
+        from src.utils.storage import put_bytes
+        put_bytes(PIPELINE_METRICS_KEY, json.dumps({
+            "started": self.started,
+            "finished": time.time(),
+            "duration": time.perf_counter() - self._start,
+            "status": status,
+            "processed_date": processed_date,
+            "stages": self.stages,
+        }))
+
+
+def _last_pipeline_run():
+    from src.utils.storage import get_bytes
+    body = get_bytes(PIPELINE_METRICS_KEY)
+    return json.loads(body) if body else None
+
+
+def _pipeline_samples(field):
+    def collect():
+        run = _last_pipeline_run()
+        if run is not None:
+            yield (run["status"],), run[field]
+    return collect
+
+
+def _stage_samples():
+    run = _last_pipeline_run()
+    for stage, seconds in (run or {}).get("stages", {}).items():
+        yield (stage,), seconds
+
+
+PIPELINE_LAST_RUN = Gauge(
+    "pipeline_last_run_timestamp_seconds", "Unix time the last pipeline run finished, by its status.",
+    ("status",), collect=_pipeline_samples("finished"))
+PIPELINE_LAST_DURATION = Gauge(
+    "pipeline_last_run_duration_seconds", "Duration of the last pipeline run, by its status.",
+    ("status",), collect=_pipeline_samples("duration"))
+PIPELINE_STAGE_SECONDS = Gauge(
+    "pipeline_stage_duration_seconds", "Duration of each stage of the last pipeline run.",
+    ("stage",), collect=_stage_samples)
@@ -0,0 +1,125 @@
+import json
+import time
+from io import BytesIO
+
+import pandas as pd
+
+from src.utils.config import read_cursor
+from src.utils.risk_store import list_partitions, read_partitions, READ_ATTEMPTS
+from src.utils.schema import apply_schema
+from src.utils.storage import put_bytes, get_bytes, update_bytes, delete_key, list_keys, object_version
+
+# ── Versioned risk releases ───────────────────────────────────
+# What the API serves, the latest reading and the scored history, is
+# published by each run as a release: an immutable document under its
+# own version holding the latest reading and the history partitions as
+# of that run. Only then is it made current, by swapping one small
+# pointer object. Whoever follows the pointer gets a whole, consistent
+# release while the next run is rewriting the objects underneath, and
+# API workers can load a new release in the background before serving
+# it (see api.releases).
+#
+#   releases/current.json
+#   releases/v/01700000000000000000.json
+
+RELEASE_PREFIX = "releases"
+CURRENT_RELEASE_KEY = f"{RELEASE_PREFIX}/current.json"
+VERSIONS_PREFIX = f"{RELEASE_PREFIX}/v/"
+# Superseded releases kept for workers that are still loading them
+KEEP_RELEASES = 3
+
+
+class Release:
+    """One loaded release: the latest reading, the history up to it,
+    and the partition frames the history was built from."""
+
+    def __init__(self, version, date, latest, history, frames):
+        self.version = version
+        self.date = date
+        self.latest = latest
+        self.history = history
+        self.frames = frames
+
+
+# ── Publishing ────────────────────────────────────────────────
+def publish_release(latest_row, processed_date):
+    """Publish a run's outputs as a new release and make it current.
+
+    Runs after the day's partition is in the manifest. Returns the
+    version.
+    """
+    # Zero-padded nanoseconds keep version keys in publish order
+    version = f"{time.time_ns():020d}"
+    key = f"{VERSIONS_PREFIX}{version}.json"
+    put_bytes(key, json.dumps({
+        "version": version,
+        "date": processed_date,
+        "latest": latest_row.to_csv(index=False),
+        "partitions": list_partitions(end=processed_date),
+    }, separators=(",", ":")))
+
+    last_processed = read_cursor()
+
+    def swap(body):
+        current = json.loads(body) if body else None
+        # A run finishing after a newer one leaves the newer release,
+        # unless that one is ahead of the cursor (it was reset)
+        if current is not None and processed_date < current["date"] <= last_processed:
+            return None
+        return json.dumps({"version": version, "date": processed_date, "key": key})
+
+    update_bytes(CURRENT_RELEASE_KEY, swap)
+    prune_releases()
+    return version
+
+
+def prune_releases(keep=KEEP_RELEASES):
+    """Delete all but the `keep` newest releases (and the current one)."""
+    current = load_pointer()
+    for key in sorted(list_keys(VERSIONS_PREFIX))[:-keep]:
+        if current is None or key != current["key"]:
+            delete_key(key)
+
+
+# ── Loading ───────────────────────────────────────────────────
+def load_pointer():
+    """The current release's pointer ({version, date, key}), or None if
+    nothing has been published."""
+    body = get_bytes(CURRENT_RELEASE_KEY)
+    return json.loads(body) if body else None
+
+
+def current_release_version():
+    """Cheap change marker for the release pointer, or None."""
+    return object_version(CURRENT_RELEASE_KEY)
+
+
+def load_release(previous=None):
+    """The current release, or None if nothing has been published.
+
+    History partitions already in `previous` (an earlier Release) are
+    reused rather than read again. A daily partition the run compacted
+    after listing it (or a later run did) is read from its month's
+    Parquet file. If the release itself is gone (pruned by a newer run)
+    the pointer is read again.
+    """
+    frames = {} if previous is None else dict(previous.frames)
+    for _ in range(READ_ATTEMPTS):
+        pointer = load_pointer()
+        if pointer is None:
+            return None
+        body = get_bytes(pointer["key"])
+        if body is None:
+            continue
+        release = json.loads(body)
+        history = read_partitions(release["partitions"], frames, fallback=True) if release["partitions"] else None
+        if release["partitions"] and history is None:
+            continue
+        if history is not None:
+            history = history[history["date"] <= pd.Timestamp(release["date"])].reset_index(drop=True)
+        # Drop frames of partitions this release no longer lists
+        listed = {(p["key"], p["bytes"]) for p in release["partitions"]}
+        frames = {part: frame for part, frame in frames.items() if part in listed}
+        latest = apply_schema(pd.read_csv(BytesIO(release["latest"].encode("utf-8"))))
+        return Release(release["version"], release["date"], latest, history, frames)
+    raise RuntimeError("Risk release changed on every read attempt.")
@@ -0,0 +1,373 @@
+import json
+from datetime import datetime, timezone
+from io import BytesIO
+
+import pandas as pd
+import pyarrow.parquet as pq
+from src.utils.schema import apply_schema
+from src.utils.storage import put_bytes, get_bytes, update_bytes, delete_key, list_keys, object_version
+from src.utils.tenants import namespaced
+
+# ── Partitioned risk history ──────────────────────────────────
+# The scored history is stored as small per-day CSV partitions that
+# are compacted into one Parquet file per month once the month is
+# complete. A manifest lists every partition with its date range, so
+# readers fetch only the partitions they need and each daily run
+# writes one row plus the manifest instead of the whole history.
+#
+#   risk_history/manifest.json
+#   risk_history/daily/2017-12-30.csv
+#   risk_history/monthly/2017-11.parquet
+#
+# Deployments from before partitioning kept the whole history in one
+# daily_risk_output.csv. Until the first run after an upgrade splits
+# it into partitions (migrate_legacy_history), readers see it as the
+# only partition.
+
+RISK_HISTORY_PREFIX = "risk_history"
+MANIFEST_KEY = f"{RISK_HISTORY_PREFIX}/manifest.json"
+DAILY_PREFIX = f"{RISK_HISTORY_PREFIX}/daily/"
+MONTHLY_PREFIX = f"{RISK_HISTORY_PREFIX}/monthly/"
+LEGACY_HISTORY_KEY = "daily_risk_output.csv"
+READ_ATTEMPTS = 3
+
+
+# ── Manifest ──────────────────────────────────────────────────
+def load_manifest():
+    """Return the manifest dict, or None if nothing has been written."""
+    body = get_bytes(MANIFEST_KEY)
+    if body is None:
+        return _legacy_manifest()
+    return json.loads(body.decode("utf-8"))
+
+
+# Legacy manifests by namespaced key: (object version, manifest), so
+# the legacy file is only read again when it changes
+_legacy_manifests = {}
+
+
+def _legacy_manifest():
+    """A manifest listing the legacy single-file history, or None."""
+    version = object_version(LEGACY_HISTORY_KEY)
+    if version is None:
+        return None
+    cached = _legacy_manifests.get(namespaced(LEGACY_HISTORY_KEY))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    body = get_bytes(LEGACY_HISTORY_KEY)
+    if body is None:
+        return None
+    manifest = _read_legacy_manifest(body)
+    _legacy_manifests[namespaced(LEGACY_HISTORY_KEY)] = (version, manifest)
+    return manifest
+
+
+def _read_legacy_manifest(body):
+    dates = pd.to_datetime(pd.read_csv(BytesIO(body), usecols=["date"])["date"])
+    if dates.empty:
+        return None
+    return _manifest_body([{
+        "key": LEGACY_HISTORY_KEY,
+        "start": dates.min().strftime("%Y-%m-%d"),
+        "end": dates.max().strftime("%Y-%m-%d"),
+        "rows": len(dates),
+        "bytes": len(body),
+        "format": "csv",
+    }])
+
+
+def _manifest_body(partitions):
+    return {
+        "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "partitions": sorted(partitions, key=lambda p: p["start"]),
+    }
+
+
+def _update_manifest(update):
+    """Read-modify-write the manifest without losing concurrent updates.
+
+    update(partitions) returns the new partition list, or None to leave
+    the manifest as it is.
+    """
+    def update_body(body):
+        manifest = json.loads(body.decode("utf-8")) if body else {"partitions": []}
+        partitions = update(manifest["partitions"])
+        if partitions is None:
+            return None
+        return json.dumps(_manifest_body(partitions), separators=(",", ":"))
+
+    body = update_bytes(MANIFEST_KEY, update_body)
+    return json.loads(body) if body else {"partitions": []}
+
+
+def _daily_entry(key, size):
+    date = key[len(DAILY_PREFIX):].removesuffix(".csv")
+    return {"key": key, "start": date, "end": date, "rows": 1,
+            "bytes": size, "format": "csv"}
+
+
+def _compacted_months(partitions):
+    return {p["start"][:7] for p in partitions if p["format"] == "parquet"}
+
+
+# ── Writers ───────────────────────────────────────────────────
+def write_partition(df, date_str):
+    """Write the scored rows for one processed date.
+
+    Keyed by date, so retries and overlapping runs rewrite identical
+    content. The partition becomes visible to readers once
+    publish_partition adds it to the manifest.
+    """
+    return put_bytes(f"{DAILY_PREFIX}{date_str}.csv", apply_schema(df).to_csv(index=False))
+
+
+def publish_partition(date_str):
+    """Add every daily partition up to date_str to the manifest and
+    compact months that are complete."""
+    migrate_legacy_history()
+    # Listing (rather than adding one entry) also picks up any partition
+    # whose run died between the cursor swap and this write.
+    listed = [
+        _daily_entry(key, size)
+        for key, size in list_keys(DAILY_PREFIX).items()
+        if key.endswith(".csv") and key[len(DAILY_PREFIX):] <= f"{date_str}.csv"
+    ]
+
+    def add_daily(partitions):
+        compacted = _compacted_months(partitions)
+        known = {p["key"] for p in partitions}
+        new = [
+            p for p in listed
+            if p["key"] not in known and p["start"][:7] not in compacted
+        ]
+        return partitions + new if new else None
+
+    manifest = _update_manifest(add_daily)
+    compacted = _compacted_months(manifest["partitions"])
+
+    # A late retry can rewrite a day that was already compacted
+    for p in listed:
+        if p["start"][:7] in compacted:
+            delete_key(p["key"])
+
+    current_month = date_str[:7]
+    complete = sorted({
+        p["start"][:7] for p in manifest["partitions"]
+        if p["format"] == "csv" and p["start"][:7] < current_month
+    })
+    for month in complete:
+        manifest = compact_month(month)
+    return manifest
+
+
+def _write_monthly(month, df):
+    """Write a month's rows as one Parquet partition; returns its
+    manifest entry."""
+    df = df.sort_values("date").reset_index(drop=True)
+    buffer = BytesIO()
+    df.to_parquet(buffer, index=False)
+    key = f"{MONTHLY_PREFIX}{month}.parquet"
+    return {
+        "key": key,
+        "start": df["date"].min().strftime("%Y-%m-%d"),
+        "end": df["date"].max().strftime("%Y-%m-%d"),
+        "rows": len(df),
+        "bytes": put_bytes(key, buffer.getvalue()),
+        "format": "parquet",
+    }
+
+
+def migrate_legacy_history():
+    """Split a legacy daily_risk_output.csv into partitions, once.
+
+    Does nothing once a manifest exists. Complete months become Parquet
+    partitions and the last month daily ones, so the next run's day
+    joins it as usual. The legacy file is left in place.
+    """
+    if object_version(MANIFEST_KEY) is not None:
+        return
+    body = get_bytes(LEGACY_HISTORY_KEY)
+    if body is None:
+        return
+    df = apply_schema(pd.read_csv(BytesIO(body)))
+    if df.empty:
+        return
+
+    months = df["date"].dt.strftime("%Y-%m")
+    last_month = months.max()
+    entries = []
+    for month, rows in df.groupby(months):
+        if month < last_month:
+            entries.append(_write_monthly(month, rows))
+            continue
+        for date_str, row in rows.groupby(rows["date"].dt.strftime("%Y-%m-%d")):
+            key = f"{DAILY_PREFIX}{date_str}.csv"
+            entries.append(_daily_entry(key, write_partition(row, date_str)))
+
+    # Another run may have migrated (or published) meanwhile
+    _update_manifest(lambda partitions: None if partitions else entries)
+
+
+def compact_month(month):
+    """Merge a month's daily CSVs into one Parquet file."""
+    manifest = load_manifest()
+    daily = [
+        p for p in manifest["partitions"]
+        if p["format"] == "csv" and p["start"][:7] == month
+    ]
+    frames = [_read_partition(p) for p in daily]
+    if not daily or any(f is None for f in frames):
+        # Nothing to do, or another run is compacting this month
+        return manifest
+
+    entry = _write_monthly(month, pd.concat(frames, ignore_index=True))
+
+    def swap_in_monthly(partitions):
+        if month in _compacted_months(partitions):
+            return None
+        return [
+            p for p in partitions
+            if not (p["format"] == "csv" and p["start"][:7] == month)
+        ] + [entry]
+
+    manifest = _update_manifest(swap_in_monthly)
+
+    # Only delete the daily files once the manifest no longer points at them
+    for p in daily:
+        delete_key(p["key"])
+    return manifest
+
+
+# ── Readers ───────────────────────────────────────────────────
+def list_partitions(start=None, end=None, manifest=None):
+    """Manifest entries overlapping the [start, end] date range."""
+    manifest = manifest or load_manifest()
+    if manifest is None:
+        return []
+    start = str(start)[:10] if start is not None else None
+    end = str(end)[:10] if end is not None else None
+    return [
+        p for p in manifest["partitions"]
+        if (start is None or p["end"] >= start) and (end is None or p["start"] <= end)
+    ]
+
+
+def _read_partition(partition):
+    body = get_bytes(partition["key"])
+    if body is None:
+        return None
+    if partition["format"] == "parquet":
+        df = pd.read_parquet(BytesIO(body))
+    else:
+        df = pd.read_csv(BytesIO(body))
+    return apply_schema(df)
+
+
+def iter_partition(partition, chunk_rows):
+    """Yield one partition's rows in frames of at most chunk_rows.
+
+    Parquet partitions are decoded one row batch at a time. Raises
+    KeyError if the partition no longer exists (compacted away).
+    """
+    body = get_bytes(partition["key"])
+    if body is None:
+        raise KeyError(partition["key"])
+    if partition["format"] != "parquet":
+        df = apply_schema(pd.read_csv(BytesIO(body)))
+        for i in range(0, len(df), chunk_rows):
+            yield df.iloc[i:i + chunk_rows]
+        return
+    for batch in pq.ParquetFile(BytesIO(body)).iter_batches(batch_size=chunk_rows):
+        yield apply_schema(batch.to_pandas())
+
+
+def _read_cached(partition, frames):
+    part = (partition["key"], partition["bytes"])
+    if part not in frames:
+        frame = _read_partition(partition)
+        if frame is None:
+            return None
+        frames[part] = frame
+    return frames[part]
+
+
+def _read_compacted(partition, frames):
+    """The rows of a daily partition that was compacted away, from the
+    current manifest's partitions covering its dates, or None."""
+    start, end = pd.Timestamp(partition["start"]), pd.Timestamp(partition["end"])
+    rows = []
+    for replacement in list_partitions(start, end):
+        if replacement["key"] == partition["key"]:
+            continue
+        df = _read_cached(replacement, frames)
+        if df is None:
+            return None
+        rows.append(df[(df["date"] >= start) & (df["date"] <= end)])
+    return pd.concat(rows, ignore_index=True) if rows else None
+
+
+def read_partitions(partitions, frames=None, fallback=False):
+    """The rows of the given manifest entries in date order, or None if
+    any of them no longer exists.
+
+    frames maps (key, bytes) of partitions to frames already read; a
+    listed partition is only ever rewritten with the same rows, so those
+    are reused instead of re-read. Every frame read is added to it.
+    With fallback, a daily partition compacted since the entries were
+    listed is read from its month's Parquet file instead.
+    """
+    frames = {} if frames is None else frames
+    selected = []
+    for p in partitions:
+        df = _read_cached(p, frames)
+        if df is None and fallback and p["format"] == "csv":
+            df = _read_compacted(p, frames)
+        if df is None:
+            return None
+        selected.append(df)
+    df = pd.concat(selected, ignore_index=True)
+    return df.sort_values("date").reset_index(drop=True)
+
+
+def _read_partitions(select):
+    """Read the partitions chosen by select(manifest).
+
+    If a partition disappears under us (a compaction swapped it out
+    after we read the manifest) we re-read the manifest and try again.
+    """
+    for _ in range(READ_ATTEMPTS):
+        partitions = select(load_manifest())
+        if not partitions:
+            return None
+        df = read_partitions(partitions)
+        if df is not None:
+            return df
+    raise RuntimeError("Risk history changed on every read attempt.")
+
+
+def read_history(start=None, end=None):
+    """Scored history between start and end (inclusive), or None."""
+    df = _read_partitions(lambda m: list_partitions(start, end, m))
+    if df is None:
+        return None
+    if start is not None:
+        df = df[df["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["date"] <= pd.Timestamp(end)]
+    return df.reset_index(drop=True)
+
+
+def read_tail(n):
+    """The last n scored rows, reading only the newest partitions."""
+    def newest(manifest):
+        # At least one, so n <= 0 still gives an (empty) frame
+        selected, rows = [], 0
+        for p in reversed(list_partitions(manifest=manifest)):
+            if rows >= n and selected:
+                break
+            selected.append(p)
+            rows += p["rows"]
+        return selected
+
+    df = _read_partitions(newest)
+    return None if df is None else df.tail(max(n, 0)).reset_index(drop=True)
@@ -0,0 +1,140 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.risk.compute_risk import RISK_LEVELS
+
+# ── Canonical dtypes ──────────────────────────────────────────
+# Every frame of scored risk rows is cast to these dtypes when it is
+# read or written, so the pipeline, API and plots all hold the same
+# compact representation: real dates instead of strings, 32-bit numbers
+# (z-scores and demand don't need float64), an ordered categorical risk
+# level and a one-byte anomaly flag. Scoring itself still runs in
+# float64; only its outputs are narrowed.
+
+RISK_LEVEL_DTYPE = pd.CategoricalDtype(RISK_LEVELS, ordered=True)
+
+# Raw demand is read as float64 so blank or NaN values reach validation
+# (and fractional demand isn't truncated); compact_demand narrows it
+# once the gaps are imputed.
+DEMAND_SCHEMA = {
+    "date": "datetime64[ns]",
+    "demand": "float64",
+}
+
+RISK_HISTORY_SCHEMA = {
+    "date": "datetime64[ns]",
+    "demand": "int32",
+    "forecast": "float32",
+    "residual": "float32",
+    "rolling_mean": "float32",
+    "rolling_std": "float32",
+    "z_score": "float32",
+    "risk_level": RISK_LEVEL_DTYPE,
+    "anomaly_flag": "uint8",
+    "change_point": "uint8",
+    "imputed": "uint8",
+    # Plain rolling z-scores per window (src.anomaly.rolling_stats);
+    # missing from rows scored before they were added
+    "z_7": "float32",
+    "z_30": "float32",
+    "z_90": "float32",
+    # Empirical two-sided tail probability (src.anomaly.quantile_sketch)
+    "tail_probability": "float32",
+}
+
+# Streamed points may carry fractional demand
+SCORED_SCHEMA = {**RISK_HISTORY_SCHEMA, "demand": "float32"}
+
+
+def apply_schema(df, schema=RISK_HISTORY_SCHEMA):
+    """Cast the schema columns present in df to their canonical dtypes.
+
+    Columns not in the schema are left as they are. Returns a new frame
+    (or df itself when nothing needs casting).
+    """
+    casts = {}
+    for column, dtype in schema.items():
+        if column not in df or df[column].dtype == dtype:
+            continue
+        if column == "date":
+            casts[column] = pd.to_datetime(df[column]).astype(dtype)
+        elif dtype == "uint8":
+            # Flags added after older partitions were written read as 0 there
+            casts[column] = df[column].fillna(0).astype(dtype)
+        else:
+            casts[column] = df[column].astype(dtype)
+    return df.assign(**casts) if casts else df
+
+
+def compact_demand(df):
+    """Narrow validated demand to int32, or float32 if any of it is
+    fractional."""
+    whole = (df["demand"] % 1 == 0).all()
+    return df.assign(demand=df["demand"].astype("int32" if whole else "float32"))
+
+
+def to_records(df):
+    """JSON-ready records. float32 values keep their shortest decimal
+    form instead of widening to float64 digits, and NaN becomes None."""
+    out = df.copy()
+    for column in out.columns:
+        if out[column].dtype == np.float32:
+            out[column] = out[column].astype(str).astype(np.float64)
+    return json.loads(out.to_json(orient="records", date_format="iso"))
+
+
+def bytes_per_row(df):
+    """In-memory size of df per row, counting Python objects in full."""
+    return df.memory_usage(deep=True, index=False).sum() / max(len(df), 1)
+
+
+# ── Memory check ──────────────────────────────────────────────
+MAX_BYTES_PER_ROW = 40
+MIN_REDUCTION = 3.0
+NUM_ROWS = 1_000_000
+
+
+def make_untyped_history(num_rows=NUM_ROWS, seed=0):
+    """A risk history as it used to be held after a CSV read: string
+    dates and risk levels, int64/float64 numbers."""
+    rng = np.random.default_rng(seed)
+    # Five years of days, repeated as for many series
+    days = pd.date_range("2013-01-01", "2017-12-31", freq="D").strftime("%Y-%m-%d")
+    dates = np.resize(days.to_numpy(dtype=object), num_rows)
+    demand = rng.integers(10_000, 40_000, num_rows)
+    forecast = demand + rng.normal(0, 2000, num_rows).round()
+    z = rng.standard_t(5, num_rows)
+    return pd.DataFrame({
+        "date": dates,
+        "demand": demand.astype(np.int64),
+        "forecast": forecast,
+        "residual": demand - forecast,
+        "rolling_mean": rng.normal(0, 500, num_rows),
+        "rolling_std": rng.uniform(500, 3000, num_rows),
+        "z_score": z,
+        "risk_level": RISK_LEVELS[np.searchsorted([1, 2, 3], np.abs(z), side="right")].astype(object),
+        "anomaly_flag": (np.abs(z) >= 2).astype(np.int64),
+    })
+
+
+def main():
+    untyped = make_untyped_history()
+    typed = apply_schema(untyped)
+
+    before, after = bytes_per_row(untyped), bytes_per_row(typed)
+    print(f"Rows          : {len(typed):,}")
+    print(f"Untyped       : {before:.1f} bytes/row")
+    print(f"Canonical     : {after:.1f} bytes/row ({before / after:.1f}x smaller)")
+    for column in typed.columns:
+        print(f"  {column:<14} {str(typed[column].dtype):<16} "
+              f"{typed[column].memory_usage(deep=True, index=False) / len(typed):5.1f} B")
+
+    assert after <= MAX_BYTES_PER_ROW, f"{after:.1f} bytes/row exceeds {MAX_BYTES_PER_ROW}"
+    assert before / after >= MIN_REDUCTION, f"only {before / after:.1f}x smaller"
+    print("Memory check passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+from src.utils.config import (
+    get_s3_client,
+    local_file_lock,
+    CONDITIONAL_WRITE_CONFLICTS,
+    USE_S3,
+    S3_BUCKET,
+)
+from src.utils.metrics import record_load
+from src.utils.tenants import namespaced
+
+# ── Object storage ────────────────────────────────────────────
+# Minimal key/value helpers over S3 (USE_S3=true) or a local directory,
+# shared by every module that persists outputs or state. Keys are
+# relative to the active tenant's prefix (see src.utils.tenants), so
+# callers never build tenant paths themselves.
+
+LOCAL_ROOT = Path("artifacts")
+
+
+def _put(full_key, body):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if USE_S3:
+        get_s3_client().put_object(Bucket=S3_BUCKET, Key=full_key, Body=body)
+    else:
+        path = LOCAL_ROOT / full_key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temp name so concurrent writers never share a file
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(body)
+        os.replace(tmp_path, path)
+    return len(body)
+
+
+def _get(full_key):
+    if USE_S3:
+        s3 = get_s3_client()
+        try:
+            return s3.get_object(Bucket=S3_BUCKET, Key=full_key)["Body"].read()
+        except s3.exceptions.NoSuchKey:
+            return None
+    path = LOCAL_ROOT / full_key
+    return path.read_bytes() if path.exists() else None
+
+
+def put_bytes(key, body):
+    """Write body under key, atomically for local files; returns its size."""
+    return _put(namespaced(key), body)
+
+
+def _source(key):
+    """Metrics label for a key: its first path segment."""
+    return key.split("/", 1)[0].rsplit(".", 1)[0]
+
+
+def get_bytes(key):
+    """Return the object's bytes, or None if it doesn't exist."""
+    start = time.perf_counter()
+    body = _get(namespaced(key))
+    if body is not None:
+        record_load(_source(key), time.perf_counter() - start, len(body))
+    return body
+
+
+def object_version(key):
+    """Cheap change marker for an object (ETag or mtime), or None."""
+    key = namespaced(key)
+    if USE_S3:
+        try:
+            return get_s3_client().head_object(Bucket=S3_BUCKET, Key=key)["ETag"]
+        except ClientError:
+            return None
+    path = LOCAL_ROOT / key
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def update_bytes(key, update):
+    """Read-modify-write one object without losing concurrent updates.
+
+    update(body) gets the current bytes (None if the object doesn't
+    exist) and returns the new bytes, or None to leave it as it is.
+    Returns the stored body. Locally this runs under a file lock next
+    to the object; on S3 it is a conditional put retried until it wins.
+    """
+    key = namespaced(key)
+    if not USE_S3:
+        with local_file_lock(LOCAL_ROOT / f"{key}.lock"):
+            body = _get(key)
+            new_body = update(body)
+            if new_body is None:
+                return body
+            _put(key, new_body)
+            return new_body
+
+    s3 = get_s3_client()
+    while True:
+        try:
+            obj = s3.get_object(Bucket=S3_BUCKET, Key=key)
+            body = obj["Body"].read()
+            condition = {"IfMatch": obj["ETag"]}
+        except s3.exceptions.NoSuchKey:
+            body = None
+            condition = {"IfNoneMatch": "*"}
+
+        new_body = update(body)
+        if new_body is None:
+            return body
+        if isinstance(new_body, str):
+            new_body = new_body.encode("utf-8")
+        try:
+            s3.put_object(Bucket=S3_BUCKET, Key=key, Body=new_body, **condition)
+            return new_body
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in CONDITIONAL_WRITE_CONFLICTS:
+                raise
+
+
+def delete_key(key):
+    key = namespaced(key)
+    if USE_S3:
+        get_s3_client().delete_object(Bucket=S3_BUCKET, Key=key)
+    else:
+        (LOCAL_ROOT / key).unlink(missing_ok=True)
+
+
+def list_keys(prefix):
+    """Return {key: size} for every object under prefix."""
+    full_prefix = namespaced(prefix)
+    strip = len(full_prefix) - len(prefix)
+    if USE_S3:
+        s3 = get_s3_client()
+        list_kwargs = {"Bucket": S3_BUCKET, "Prefix": full_prefix}
+        objects = {}
+        while True:
+            page = s3.list_objects_v2(**list_kwargs)
+            for obj in page.get("Contents", []):
+                objects[obj["Key"][strip:]] = obj["Size"]
+            if not page.get("IsTruncated"):
+                return objects
+            list_kwargs["ContinuationToken"] = page["NextContinuationToken"]
+    directory = LOCAL_ROOT / full_prefix
+    if not directory.exists():
+        return {}
+    return {
+        f"{prefix}{path.name}": path.stat().st_size
+        for path in sorted(directory.iterdir())
+        if not path.name.endswith(".tmp")
+    }
@@ -0,0 +1,98 @@
+import json
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# ── Tenants ───────────────────────────────────────────────────
+# One deployment can serve many independent datasets ("tenants"). Each
+# tenant's objects live under its own prefix, with the same layout a
+# single-tenant deployment has at the root:
+#
+#   tenants/index.json                   registered tenant ids
+#   tenants/<id>/config.json             input key and pipeline settings
+#   tenants/<id>/input/demand.csv        demand input
+#   tenants/<id>/cursor.json, risk_history/, anomalies/, ...
+#
+# The active tenant is a context variable: storage and the cursor
+# prefix every key with it, so the pipeline, risk store and API code
+# run unchanged inside tenant_scope(). It follows asyncio tasks and
+# FastAPI's threadpool; worker threads set it themselves. Outside any
+# scope keys are unprefixed, which is the single-tenant layout.
+
+TENANTS_PREFIX = "tenants/"
+TENANT_INDEX_KEY = f"{TENANTS_PREFIX}index.json"
+TENANT_CONFIG_KEY = "config.json"
+DEFAULT_INPUT_KEY = "input/demand.csv"
+
+TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+_tenant = ContextVar("tenant", default=None)
+
+
+def check_tenant_id(tenant_id):
+    if not isinstance(tenant_id, str) or not TENANT_ID.match(tenant_id):
+        raise ValueError(f"Invalid tenant id {tenant_id!r}: use 1-64 of a-z, 0-9, '-' and '_'.")
+    return tenant_id
+
+
+def current_tenant():
+    """The active tenant id, or None for the unprefixed layout."""
+    return _tenant.get()
+
+
+@contextmanager
+def tenant_scope(tenant_id):
+    """Run the block against tenant_id's objects (None: the unprefixed,
+    shared layout)."""
+    token = _tenant.set(None if tenant_id is None else check_tenant_id(tenant_id))
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def namespaced(key):
+    """key inside the active tenant's prefix."""
+    tenant_id = _tenant.get()
+    return key if tenant_id is None else f"{TENANTS_PREFIX}{tenant_id}/{key}"
+
+
+# ── Registry ──────────────────────────────────────────────────
+# Storage imports this module, so it is imported where it is used.
+def list_tenants():
+    """Registered tenant ids, sorted."""
+    from src.utils.storage import get_bytes
+    with tenant_scope(None):
+        body = get_bytes(TENANT_INDEX_KEY)
+    return sorted(json.loads(body)["tenants"]) if body else []
+
+
+def register_tenant(tenant_id, demand_csv, config=None):
+    """Create or replace a tenant's input and config and add it to the
+    index (safe to run concurrently)."""
+    from src.utils.storage import put_bytes, update_bytes
+    check_tenant_id(tenant_id)
+    config = {"input_key": DEFAULT_INPUT_KEY, **(config or {})}
+    with tenant_scope(tenant_id):
+        put_bytes(config["input_key"], demand_csv)
+        put_bytes(TENANT_CONFIG_KEY, json.dumps(config))
+
+    def add(body):
+        index = json.loads(body) if body else {"tenants": {}}
+        if tenant_id in index["tenants"]:
+            return None
+        index["tenants"][tenant_id] = {"registered_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+        return json.dumps(index)
+
+    with tenant_scope(None):
+        update_bytes(TENANT_INDEX_KEY, add)
+
+
+def tenant_config():
+    """The active tenant's config, or {} outside a tenant."""
+    from src.utils.storage import get_bytes
+    if _tenant.get() is None:
+        return {}
+    body = get_bytes(TENANT_CONFIG_KEY)
+    return {"input_key": DEFAULT_INPUT_KEY, **(json.loads(body) if body else {})}